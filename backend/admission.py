@@ -0,0 +1,229 @@
+"""Controle de admissão por categoria do registry.
+
+Cada categoria tem um número máximo de conversões simultâneas e um peso
+estimado de CPU e memória. Uma conversão só começa quando cabe no limite da
+própria categoria e no orçamento global; caso contrário espera numa fila
+limitada da categoria. Com a fila cheia a requisição é recusada
+(`AdmissionRejected`, que main.py transforma em 429 com `Retry-After`).
+
+Categorias leves (Config, Dados, Legenda…) têm filas e vagas próprias, então
+uma rajada de vídeos não atrasa uma conversão de YAML.
+"""
+import asyncio
+import itertools
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from converters.registry import CATEGORIES
+import metrics
+
+
+@dataclass(frozen=True)
+class Budget:
+    slots: int                # conversões simultâneas da categoria
+    cpu: float                # núcleos estimados por conversão
+    memory_mb: float          # memória base estimada por conversão
+    memory_per_input: float = 0.0  # MB adicionais por MB de entrada
+
+
+_CPUS = os.cpu_count() or 1
+
+# Categorias pesadas (subprocessos, decodificação de mídia, dataframes). As demais
+# usam DEFAULT_BUDGET.
+CATEGORY_BUDGETS: dict[str, Budget] = {
+    "Vídeo":        Budget(slots=max(1, _CPUS // 4), cpu=2.0, memory_mb=512),
+    "Áudio":        Budget(slots=max(2, _CPUS // 2), cpu=1.0, memory_mb=128),
+    "Imagem":       Budget(slots=_CPUS, cpu=1.0, memory_mb=96, memory_per_input=10),
+    "RAW":          Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=512),
+    "HDR":          Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=256, memory_per_input=6),
+    "Adobe":        Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=256, memory_per_input=8),
+    "3D":           Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=256, memory_per_input=10),
+    "CAD":          Budget(slots=max(1, _CPUS // 4), cpu=1.0, memory_mb=1024),
+    "Apresentação": Budget(slots=2, cpu=1.0, memory_mb=512),
+    "Office":       Budget(slots=2, cpu=1.0, memory_mb=512),
+    "OpenDocument": Budget(slots=2, cpu=1.0, memory_mb=512),
+    "Documento":    Budget(slots=_CPUS, cpu=1.0, memory_mb=256, memory_per_input=4),
+    "Notebook":     Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=256),
+    "Dados":        Budget(slots=_CPUS, cpu=1.0, memory_mb=128, memory_per_input=6),
+    "BigData":      Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=256, memory_per_input=6),
+    "Científico":   Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=256, memory_per_input=4),
+    "Médico":       Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=128, memory_per_input=4),
+    "Arquivo":      Budget(slots=max(1, _CPUS // 2), cpu=1.0, memory_mb=128),
+}
+DEFAULT_BUDGET = Budget(slots=_CPUS * 2, cpu=0.25, memory_mb=32, memory_per_input=2)
+
+
+def _default_memory_mb() -> float:
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        return total / (1024 * 1024) / 2
+    except (ValueError, OSError, AttributeError):
+        return 4096.0
+
+
+CPU_BUDGET = float(os.environ.get("CONVERTUDO_CPU_BUDGET", _CPUS))
+MEMORY_BUDGET_MB = float(os.environ.get("CONVERTUDO_MEMORY_BUDGET_MB", _default_memory_mb()))
+MAX_WAITING = int(os.environ.get("CONVERTUDO_ADMISSION_QUEUE", "32"))
+
+ADMISSION_ACTIVE = metrics.Gauge(
+    "convertudo_admission_active",
+    "Conversões admitidas e em andamento por categoria.",
+    ("category",),
+)
+ADMISSION_WAITING = metrics.Gauge(
+    "convertudo_admission_waiting",
+    "Conversões aguardando admissão por categoria.",
+    ("category",),
+)
+ADMISSION_REJECTED = metrics.Counter(
+    "convertudo_admission_rejected_total",
+    "Conversões recusadas com 429 por fila cheia.",
+    ("category",),
+)
+ADMISSION_WAIT_SECONDS = metrics.Histogram(
+    "convertudo_admission_wait_seconds",
+    "Tempo de espera na fila de admissão.",
+    ("category",),
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, category: str, retry_after: int):
+        super().__init__(f"Fila de '{category}' cheia, tente novamente em {retry_after}s")
+        self.category = category
+        self.retry_after = retry_after
+
+
+class Grant:
+    """Reserva de recursos de uma conversão admitida."""
+
+    def __init__(self, category: str, cpu: float, memory_mb: float):
+        self.category = category
+        self.cpu = cpu
+        self.memory_mb = memory_mb
+        self.started = time.monotonic()
+
+
+class AdmissionController:
+    def __init__(self, cpu_budget: float = CPU_BUDGET, memory_budget_mb: float = MEMORY_BUDGET_MB,
+                 max_waiting: int = MAX_WAITING):
+        self.cpu_budget = cpu_budget
+        self.memory_budget_mb = memory_budget_mb
+        self.max_waiting = max_waiting
+        self.budgets = {cat: CATEGORY_BUDGETS.get(cat, DEFAULT_BUDGET) for cat in CATEGORIES}
+        self._active: dict[str, int] = {cat: 0 for cat in self.budgets}
+        self._waiting: dict[str, deque] = {cat: deque() for cat in self.budgets}
+        self._cpu_used = 0.0
+        self._memory_used = 0.0
+        self._running = 0
+        # Duração média (EWMA) das conversões por categoria, para o Retry-After
+        self._avg_seconds: dict[str, float] = {cat: 5.0 for cat in self.budgets}
+        self._tickets = itertools.count()
+
+    def budget(self, category: str) -> Budget:
+        return self.budgets.get(category, DEFAULT_BUDGET)
+
+    def _cost(self, category: str, input_bytes: int) -> tuple[float, float]:
+        b = self.budget(category)
+        memory = b.memory_mb + b.memory_per_input * input_bytes / (1024 * 1024)
+        # Uma conversão maior que o orçamento inteiro ainda pode rodar sozinha
+        return min(b.cpu, self.cpu_budget), min(memory, self.memory_budget_mb)
+
+    def _fits(self, category: str, cpu: float, memory: float) -> bool:
+        if self._active.get(category, 0) >= self.budget(category).slots:
+            return False
+        if self._running == 0:
+            return True
+        return (self._cpu_used + cpu <= self.cpu_budget
+                and self._memory_used + memory <= self.memory_budget_mb)
+
+    def _grant(self, category: str, cpu: float, memory: float) -> Grant:
+        self._active[category] = self._active.get(category, 0) + 1
+        self._cpu_used += cpu
+        self._memory_used += memory
+        self._running += 1
+        ADMISSION_ACTIVE.inc(category=category)
+        return Grant(category, cpu, memory)
+
+    def retry_after(self, category: str) -> int:
+        b = self.budget(category)
+        waiting = len(self._waiting.get(category, ()))
+        estimate = self._avg_seconds.get(category, 5.0) * (waiting + 1) / max(1, b.slots)
+        return max(1, min(300, math.ceil(estimate)))
+
+    async def acquire(self, category: str, input_bytes: int = 0) -> Grant:
+        cpu, memory = self._cost(category, input_bytes)
+        queue = self._waiting.setdefault(category, deque())
+        self._active.setdefault(category, 0)
+
+        if not queue and self._fits(category, cpu, memory):
+            ADMISSION_WAIT_SECONDS.observe(0.0, category=category)
+            return self._grant(category, cpu, memory)
+
+        if len(queue) >= self.max_waiting:
+            ADMISSION_REJECTED.inc(category=category)
+            raise AdmissionRejected(category, self.retry_after(category))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (next(self._tickets), cpu, memory, future)
+        queue.append(entry)
+        ADMISSION_WAITING.inc(category=category)
+        start = time.monotonic()
+        try:
+            grant = await future
+        except asyncio.CancelledError:
+            if entry in queue:
+                queue.remove(entry)
+                ADMISSION_WAITING.dec(category=category)
+            elif future.done() and not future.cancelled():
+                # Admitido no mesmo instante do cancelamento: devolver a vaga
+                self.release(future.result())
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, category=category)
+        return grant
+
+    def try_acquire(self, category: str, input_bytes: int = 0) -> Grant | None:
+        """Admite na hora se couber, sem entrar na fila; None caso contrário.
+
+        Usado para vagas extras de um job que já tem uma (lote de imagens):
+        nunca passa na frente de quem está esperando na categoria.
+        """
+        cpu, memory = self._cost(category, input_bytes)
+        if self._waiting.get(category) or not self._fits(category, cpu, memory):
+            return None
+        return self._grant(category, cpu, memory)
+
+    def release(self, grant: Grant) -> None:
+        category = grant.category
+        self._active[category] -= 1
+        self._cpu_used -= grant.cpu
+        self._memory_used -= grant.memory_mb
+        self._running -= 1
+        ADMISSION_ACTIVE.dec(category=category)
+
+        elapsed = time.monotonic() - grant.started
+        self._avg_seconds[category] = 0.8 * self._avg_seconds.get(category, elapsed) + 0.2 * elapsed
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admite os primeiros da fila de cada categoria, por ordem de chegada, enquanto couberem."""
+        progressed = True
+        while progressed:
+            progressed = False
+            heads = sorted((q[0][0], cat) for cat, q in self._waiting.items() if q)
+            for _, category in heads:
+                queue = self._waiting[category]
+                _, cpu, memory, future = queue[0]
+                if future.done():
+                    queue.popleft()
+                    ADMISSION_WAITING.dec(category=category)
+                    progressed = True
+                    continue
+                if self._fits(category, cpu, memory):
+                    queue.popleft()
+                    ADMISSION_WAITING.dec(category=category)
+                    future.set_result(self._grant(category, cpu, memory))
+                    progressed = True
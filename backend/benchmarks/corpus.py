@@ -0,0 +1,664 @@
+"""Corpus sintético e determinístico para os benchmarks.
+
+Cada gerador recebe o caminho de saída, um fator de escala e um
+`random.Random` já semeado; a mesma (extensão, escala) sempre produz os
+mesmos bytes. Geradores que dependem de bibliotecas opcionais levantam
+`ImportError` e o caso é marcado como ignorado pelo runner.
+"""
+import csv
+import gzip
+import io
+import json
+import mailbox
+import math
+import random
+import sqlite3
+import struct
+import tarfile
+import wave
+import zipfile
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Callable
+
+# Fator de escala por tamanho; cada gerador converte em linhas, páginas, pixels…
+SIZES: dict[str, int] = {"small": 1, "medium": 8, "large": 64}
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua convertudo arquivo "
+         "formato dados imagem vídeo áudio").split()
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _records(rng: random.Random, n: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "name": f"{rng.choice(WORDS)}_{i}",
+            "value": round(rng.uniform(-1000, 1000), 4),
+            "count": rng.randint(0, 10_000),
+            "active": rng.random() < 0.5,
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+        for i in range(n)
+    ]
+
+
+# --- Dados tabulares / BigData ---
+
+def gen_csv(path: Path, scale: int, rng: random.Random) -> None:
+    rows = _records(rng, 2000 * scale)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def gen_json(path: Path, scale: int, rng: random.Random) -> None:
+    path.write_text(json.dumps(_records(rng, 2000 * scale)), encoding="utf-8")
+
+
+def gen_jsonl(path: Path, scale: int, rng: random.Random) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for row in _records(rng, 2000 * scale):
+            f.write(json.dumps(row) + "\n")
+
+
+def _arrow_table(rng: random.Random, n: int):
+    import pyarrow as pa
+    return pa.Table.from_pylist(_records(rng, n))
+
+
+def gen_parquet(path: Path, scale: int, rng: random.Random) -> None:
+    import pyarrow.parquet as pq
+    pq.write_table(_arrow_table(rng, 5000 * scale), path)
+
+
+def gen_feather(path: Path, scale: int, rng: random.Random) -> None:
+    import pyarrow.feather as feather
+    feather.write_feather(_arrow_table(rng, 5000 * scale), path)
+
+
+def gen_xlsx(path: Path, scale: int, rng: random.Random) -> None:
+    import openpyxl
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    rows = _records(rng, 500 * scale)
+    ws.append(list(rows[0]))
+    for row in rows:
+        ws.append(list(row.values()))
+    wb.save(path)
+
+
+def gen_hdf5(path: Path, scale: int, rng: random.Random) -> None:
+    import h5py
+    n = 10_000 * scale
+    with h5py.File(path, "w") as f:
+        f.create_dataset("values", data=[rng.uniform(0, 1) for _ in range(n)])
+        f.create_dataset("matrix", data=[[rng.randint(0, 255) for _ in range(8)]
+                                         for _ in range(n // 8)])
+
+
+def gen_sqlite(path: Path, scale: int, rng: random.Random) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE items (id INTEGER, name TEXT, value REAL, "
+                     "count INTEGER, active INTEGER, date TEXT)")
+        conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)",
+                         [tuple(r.values()) for r in _records(rng, 2000 * scale)])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def gen_sql(path: Path, scale: int, rng: random.Random) -> None:
+    lines = ["CREATE TABLE items (id INTEGER, name TEXT, value REAL);"]
+    for r in _records(rng, 2000 * scale):
+        lines.append(f"INSERT INTO items VALUES ({r['id']}, '{r['name']}', {r['value']});")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+# --- Config ---
+
+def gen_yaml(path: Path, scale: int, rng: random.Random) -> None:
+    lines = ["items:"]
+    for r in _records(rng, 200 * scale):
+        lines.append(f"  - id: {r['id']}")
+        lines.append(f"    name: {r['name']}")
+        lines.append(f"    value: {r['value']}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def gen_toml(path: Path, scale: int, rng: random.Random) -> None:
+    lines = []
+    for r in _records(rng, 200 * scale):
+        lines += ["[[items]]", f"id = {r['id']}", f'name = "{r["name"]}"', f"value = {r['value']}", ""]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def gen_xml(path: Path, scale: int, rng: random.Random) -> None:
+    items = "".join(
+        f"<item><id>{r['id']}</id><name>{r['name']}</name><value>{r['value']}</value></item>"
+        for r in _records(rng, 200 * scale)
+    )
+    path.write_text(f"<?xml version='1.0'?><items>{items}</items>", encoding="utf-8")
+
+
+def gen_ini(path: Path, scale: int, rng: random.Random) -> None:
+    lines = []
+    for r in _records(rng, 100 * scale):
+        lines += [f"[item{r['id']}]", f"name = {r['name']}", f"value = {r['value']}", ""]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def gen_env(path: Path, scale: int, rng: random.Random) -> None:
+    lines = [f"KEY_{i}={rng.choice(WORDS)}_{rng.randint(0, 999)}" for i in range(300 * scale)]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+# --- Documentos / texto ---
+
+def gen_txt(path: Path, scale: int, rng: random.Random) -> None:
+    paras = [_sentence(rng, rng.randint(20, 60)) for _ in range(100 * scale)]
+    path.write_text("\n\n".join(paras), encoding="utf-8")
+
+
+def gen_md(path: Path, scale: int, rng: random.Random) -> None:
+    parts = []
+    for i in range(20 * scale):
+        parts.append(f"## Seção {i}\n\n{_sentence(rng, 40)}\n\n- {_sentence(rng, 5)}\n- {_sentence(rng, 5)}")
+    path.write_text("# Benchmark\n\n" + "\n\n".join(parts), encoding="utf-8")
+
+
+def gen_html(path: Path, scale: int, rng: random.Random) -> None:
+    body = "".join(f"<h2>Seção {i}</h2><p>{_sentence(rng, 40)}</p>" for i in range(20 * scale))
+    path.write_text(f"<!DOCTYPE html><html><body><h1>Benchmark</h1>{body}</body></html>",
+                    encoding="utf-8")
+
+
+def gen_pdf(path: Path, scale: int, rng: random.Random) -> None:
+    """PDF multipágina escrito à mão (Helvetica, sem dependências)."""
+    pages = 4 * scale
+    objects: list[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog = add(b"")  # preenchido depois
+    pages_id = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for p in range(pages):
+        lines = [f"Pagina {p + 1}"] + [_sentence(rng, 10) for _ in range(40)]
+        text = "BT /F1 10 Tf 50 800 Td 14 TL " + " ".join(
+            "(" + line.encode("ascii", "replace").decode().replace("(", "").replace(")", "") + ") '"
+            for line in lines
+        ) + " ET"
+        stream = text.encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (i, obj))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, catalog, xref))
+    path.write_bytes(out.getvalue())
+
+
+def gen_docx(path: Path, scale: int, rng: random.Random) -> None:
+    import docx
+    doc = docx.Document()
+    for i in range(20 * scale):
+        doc.add_heading(f"Seção {i}", level=2)
+        doc.add_paragraph(_sentence(rng, 60))
+    doc.save(path)
+
+
+def gen_rtf(path: Path, scale: int, rng: random.Random) -> None:
+    paras = "".join(f"\\par {_sentence(rng, 40)}" for _ in range(50 * scale))
+    path.write_text("{\\rtf1\\ansi\\deff0 {\\fonttbl {\\f0 Helvetica;}}" + paras + "}",
+                    encoding="ascii", errors="replace")
+
+
+def gen_py(path: Path, scale: int, rng: random.Random) -> None:
+    funcs = [
+        f"def func_{i}(x, y={rng.randint(0, 9)}):\n    \"\"\"{_sentence(rng, 6)}\"\"\"\n"
+        f"    return x * {rng.randint(1, 99)} + y\n"
+        for i in range(200 * scale)
+    ]
+    path.write_text("\n\n".join(funcs), encoding="utf-8")
+
+
+def gen_ipynb(path: Path, scale: int, rng: random.Random) -> None:
+    cells = []
+    for i in range(10 * scale):
+        cells.append({"cell_type": "markdown", "metadata": {}, "source": [f"## Célula {i}\n", _sentence(rng)]})
+        cells.append({"cell_type": "code", "metadata": {}, "execution_count": None,
+                      "outputs": [], "source": [f"x = {rng.randint(0, 100)}\n", "print(x)"]})
+    nb = {"nbformat": 4, "nbformat_minor": 5, "cells": cells,
+          "metadata": {"kernelspec": {"name": "python3", "display_name": "Python 3", "language": "python"}}}
+    path.write_text(json.dumps(nb), encoding="utf-8")
+
+
+# --- Imagens ---
+
+def _pil_image(scale: int, rng: random.Random, mode: str = "RGB"):
+    from PIL import Image, ImageChops
+    side = int(512 * math.sqrt(scale))
+    gradient = Image.linear_gradient("L").resize((side, side))
+    noise = Image.frombytes("L", (side, side), rng.randbytes(side * side))
+    bands = [gradient, gradient.rotate(90), ImageChops.blend(gradient, noise, 0.3)]
+    if mode == "RGBA":
+        bands.append(gradient.rotate(180))
+    return Image.merge(mode, bands)
+
+
+def _gen_image(fmt: str, mode: str = "RGB") -> Callable:
+    def gen(path: Path, scale: int, rng: random.Random) -> None:
+        img = _pil_image(scale, rng, mode)
+        if fmt == "GIF":
+            img = img.convert("P")
+        img.save(path, format=fmt)
+    return gen
+
+
+def gen_tiff_multipage(path: Path, scale: int, rng: random.Random) -> None:
+    pages = [_pil_image(1, rng) for _ in range(2 * scale)]
+    pages[0].save(path, format="TIFF", save_all=True, append_images=pages[1:])
+
+
+def gen_svg(path: Path, scale: int, rng: random.Random) -> None:
+    shapes = "".join(
+        f'<circle cx="{rng.randint(0, 1000)}" cy="{rng.randint(0, 1000)}" r="{rng.randint(2, 40)}" '
+        f'fill="#{rng.randint(0, 0xFFFFFF):06x}"/>'
+        for _ in range(500 * scale)
+    )
+    path.write_text(f'<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="1000">{shapes}</svg>',
+                    encoding="utf-8")
+
+
+def gen_dxf(path: Path, scale: int, rng: random.Random) -> None:
+    """DXF R12 mínimo (apenas seção ENTITIES) com linhas e círculos."""
+    out = ["0", "SECTION", "2", "ENTITIES"]
+    for _ in range(1000 * scale):
+        if rng.random() < 0.7:
+            out += ["0", "LINE", "8", "0",
+                    "10", f"{rng.uniform(0, 1000):.3f}", "20", f"{rng.uniform(0, 1000):.3f}", "30", "0.0",
+                    "11", f"{rng.uniform(0, 1000):.3f}", "21", f"{rng.uniform(0, 1000):.3f}", "31", "0.0"]
+        else:
+            out += ["0", "CIRCLE", "8", "0",
+                    "10", f"{rng.uniform(0, 1000):.3f}", "20", f"{rng.uniform(0, 1000):.3f}", "30", "0.0",
+                    "40", f"{rng.uniform(1, 50):.3f}"]
+    out += ["0", "ENDSEC", "0", "EOF"]
+    path.write_text("\n".join(out) + "\n", encoding="ascii")
+
+
+def gen_gcode(path: Path, scale: int, rng: random.Random) -> None:
+    lines = ["G21", "G90"] + [
+        f"G1 X{rng.uniform(0, 200):.3f} Y{rng.uniform(0, 200):.3f} F{rng.randint(600, 3000)}"
+        for _ in range(5000 * scale)
+    ]
+    path.write_text("\n".join(lines), encoding="ascii")
+
+
+# --- 3D ---
+
+def _sphere(scale: int) -> tuple[list, list]:
+    """Esfera UV com ~5000 triângulos por unidade de escala."""
+    n = max(8, int(math.sqrt(2500 * scale)))
+    verts = []
+    for i in range(n + 1):
+        theta = math.pi * i / n
+        for j in range(n):
+            phi = 2 * math.pi * j / n
+            verts.append((math.sin(theta) * math.cos(phi), math.sin(theta) * math.sin(phi), math.cos(theta)))
+    faces = []
+    for i in range(n):
+        for j in range(n):
+            a, b = i * n + j, i * n + (j + 1) % n
+            c, d = a + n, b + n
+            faces += [(a, c, b), (b, c, d)]
+    return verts, faces
+
+
+def gen_stl(path: Path, scale: int, rng: random.Random) -> None:
+    verts, faces = _sphere(scale)
+    with open(path, "wb") as f:
+        f.write(b"convertudo benchmark".ljust(80, b"\0"))
+        f.write(struct.pack("<I", len(faces)))
+        for a, b, c in faces:
+            f.write(struct.pack("<12fH", 0, 0, 0, *verts[a], *verts[b], *verts[c], 0))
+
+
+def gen_obj(path: Path, scale: int, rng: random.Random) -> None:
+    verts, faces = _sphere(scale)
+    lines = [f"v {x:.6f} {y:.6f} {z:.6f}" for x, y, z in verts]
+    lines += [f"f {a + 1} {b + 1} {c + 1}" for a, b, c in faces]
+    path.write_text("\n".join(lines) + "\n", encoding="ascii")
+
+
+def gen_ply(path: Path, scale: int, rng: random.Random) -> None:
+    verts, faces = _sphere(scale)
+    header = (
+        "ply\nformat binary_little_endian 1.0\n"
+        f"element vertex {len(verts)}\nproperty float x\nproperty float y\nproperty float z\n"
+        f"element face {len(faces)}\nproperty list uchar int vertex_indices\nend_header\n"
+    )
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        for v in verts:
+            f.write(struct.pack("<3f", *v))
+        for face in faces:
+            f.write(struct.pack("<B3i", 3, *face))
+
+
+# --- Áudio / Vídeo ---
+
+def gen_wav(path: Path, scale: int, rng: random.Random) -> None:
+    rate, seconds = 44100, 2 * scale
+    freqs = [rng.choice((220.0, 330.0, 440.0, 550.0)) for _ in range(seconds)]
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        for freq in freqs:
+            frames = bytearray()
+            for i in range(rate):
+                sample = int(12000 * math.sin(2 * math.pi * freq * i / rate))
+                frames += struct.pack("<hh", sample, sample)
+            w.writeframes(bytes(frames))
+
+
+def gen_mp4(path: Path, scale: int, rng: random.Random) -> None:
+    import shutil
+    import subprocess
+    if not shutil.which("ffmpeg"):
+        raise ImportError("ffmpeg")
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc=duration={2 * scale}:size=640x360:rate=25",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={2 * scale}",
+        "-pix_fmt", "yuv420p", "-shortest", str(path),
+    ], check=True)
+
+
+# --- Legendas / Agenda / Financeiro / Playlist / HAR ---
+
+def _ts(seconds: float, sep: str = ",") -> str:
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{int(s):02d}{sep}{int((s % 1) * 1000):03d}"
+
+
+def gen_srt(path: Path, scale: int, rng: random.Random) -> None:
+    blocks = []
+    for i in range(300 * scale):
+        start = i * 3.0
+        blocks.append(f"{i + 1}\n{_ts(start)} --> {_ts(start + 2.5)}\n{_sentence(rng, 8)}\n")
+    path.write_text("\n".join(blocks), encoding="utf-8")
+
+
+def gen_vtt(path: Path, scale: int, rng: random.Random) -> None:
+    blocks = ["WEBVTT\n"]
+    for i in range(300 * scale):
+        start = i * 3.0
+        blocks.append(f"{_ts(start, '.')} --> {_ts(start + 2.5, '.')}\n{_sentence(rng, 8)}\n")
+    path.write_text("\n".join(blocks), encoding="utf-8")
+
+
+def gen_ics(path: Path, scale: int, rng: random.Random) -> None:
+    events = []
+    for i in range(200 * scale):
+        day = f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+        events.append(
+            f"BEGIN:VEVENT\r\nUID:{i}@convertudo\r\nDTSTART:{day}T090000Z\r\n"
+            f"DTEND:{day}T100000Z\r\nSUMMARY:{_sentence(rng, 4)}\r\nEND:VEVENT\r\n"
+        )
+    path.write_text("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//convertudo//bench//\r\n"
+                    + "".join(events) + "END:VCALENDAR\r\n", encoding="utf-8")
+
+
+def gen_vcf(path: Path, scale: int, rng: random.Random) -> None:
+    cards = [
+        f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:{rng.choice(WORDS).title()} {i}\r\n"
+        f"TEL:+55119{rng.randint(10_000_000, 99_999_999)}\r\nEMAIL:user{i}@example.com\r\nEND:VCARD\r\n"
+        for i in range(300 * scale)
+    ]
+    path.write_text("".join(cards), encoding="utf-8")
+
+
+def gen_qif(path: Path, scale: int, rng: random.Random) -> None:
+    lines = ["!Type:Bank"]
+    for _ in range(500 * scale):
+        lines += [f"D{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2024",
+                  f"T{rng.uniform(-500, 500):.2f}", f"P{rng.choice(WORDS).title()}", "^"]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def gen_m3u(path: Path, scale: int, rng: random.Random) -> None:
+    lines = ["#EXTM3U"]
+    for i in range(500 * scale):
+        lines += [f"#EXTINF:{rng.randint(60, 400)},{_sentence(rng, 3)}", f"https://example.com/{i}.mp3"]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def gen_har(path: Path, scale: int, rng: random.Random) -> None:
+    entries = [
+        {
+            "startedDateTime": "2024-01-01T00:00:00.000Z",
+            "time": rng.uniform(1, 900),
+            "request": {"method": rng.choice(("GET", "POST")), "url": f"https://example.com/api/{i}",
+                        "headers": []},
+            "response": {"status": rng.choice((200, 200, 304, 404)), "headers": [],
+                         "content": {"size": rng.randint(0, 100_000), "mimeType": "application/json"}},
+            "timings": {"wait": rng.uniform(1, 500)},
+        }
+        for i in range(500 * scale)
+    ]
+    path.write_text(json.dumps({"log": {"version": "1.2", "entries": entries}}), encoding="utf-8")
+
+
+# --- Geoespacial ---
+
+def gen_geojson(path: Path, scale: int, rng: random.Random) -> None:
+    features = [
+        {"type": "Feature", "properties": {"name": f"pt{i}"},
+         "geometry": {"type": "Point", "coordinates": [rng.uniform(-74, -34), rng.uniform(-33, 5)]}}
+        for i in range(500 * scale)
+    ]
+    features.append({"type": "Feature", "properties": {"name": "trilha"},
+                     "geometry": {"type": "LineString",
+                                  "coordinates": [[rng.uniform(-47, -46), rng.uniform(-24, -23)]
+                                                  for _ in range(500 * scale)]}})
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8")
+
+
+def gen_gpx(path: Path, scale: int, rng: random.Random) -> None:
+    pts = "".join(
+        f'<trkpt lat="{rng.uniform(-24, -23):.6f}" lon="{rng.uniform(-47, -46):.6f}"><ele>{rng.uniform(700, 900):.1f}</ele></trkpt>'
+        for _ in range(1000 * scale)
+    )
+    path.write_text(
+        '<?xml version="1.0"?><gpx version="1.1" creator="convertudo" xmlns="http://www.topografix.com/GPX/1/1">'
+        f"<trk><name>bench</name><trkseg>{pts}</trkseg></trk></gpx>", encoding="utf-8")
+
+
+# --- Email ---
+
+def _message(rng: random.Random, i: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = f"remetente{i}@example.com"
+    msg["To"] = "destino@example.com"
+    msg["Subject"] = _sentence(rng, 5)
+    msg["Date"] = "Mon, 01 Jan 2024 10:00:00 +0000"
+    msg.set_content("\n\n".join(_sentence(rng, 30) for _ in range(5)))
+    msg.add_alternative(f"<html><body><p>{_sentence(rng, 30)}</p></body></html>", subtype="html")
+    return msg
+
+
+def gen_eml(path: Path, scale: int, rng: random.Random) -> None:
+    msg = _message(rng, 0)
+    msg.set_content("\n\n".join(_sentence(rng, 30) for _ in range(50 * scale)))
+    path.write_bytes(msg.as_bytes())
+
+
+def gen_mbox(path: Path, scale: int, rng: random.Random) -> None:
+    box = mailbox.mbox(str(path), create=True)
+    try:
+        for i in range(50 * scale):
+            box.add(_message(rng, i))
+        box.flush()
+    finally:
+        box.close()
+
+
+# --- Arquivos comprimidos ---
+
+def _archive_members(scale: int, rng: random.Random) -> list[tuple[str, bytes]]:
+    return [(f"dir{i % 5}/arquivo{i}.txt", ("\n".join(_sentence(rng, 20) for _ in range(50))).encode())
+            for i in range(20 * scale)]
+
+
+def gen_zip(path: Path, scale: int, rng: random.Random) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in _archive_members(scale, rng):
+            zf.writestr(zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0)), data)
+
+
+def _gen_tar(compress: bool) -> Callable:
+    def gen(path: Path, scale: int, rng: random.Random) -> None:
+        raw = io.BytesIO()
+        with tarfile.open(fileobj=raw, mode="w") as tf:
+            for name, data in _archive_members(scale, rng):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = 1704067200
+                tf.addfile(info, io.BytesIO(data))
+        payload = raw.getvalue()
+        path.write_bytes(gzip.compress(payload, mtime=0) if compress else payload)
+    return gen
+
+
+# --- Bioinformática ---
+
+def gen_fasta(path: Path, scale: int, rng: random.Random) -> None:
+    lines = []
+    for i in range(500 * scale):
+        seq = "".join(rng.choices("ACGT", k=rng.randint(200, 1200)))
+        lines.append(f">seq{i} {_sentence(rng, 3)}")
+        lines += [seq[j:j + 60] for j in range(0, len(seq), 60)]
+    path.write_text("\n".join(lines) + "\n", encoding="ascii", errors="replace")
+
+
+def gen_fastq(path: Path, scale: int, rng: random.Random) -> None:
+    lines = []
+    for i in range(2000 * scale):
+        n = rng.randint(100, 250)
+        lines += [f"@read{i} lane={rng.randint(1, 8)}", "".join(rng.choices("ACGT", k=n)), "+",
+                  "".join(chr(33 + rng.randint(2, 40)) for _ in range(n))]
+    path.write_text("\n".join(lines) + "\n", encoding="ascii")
+
+
+# --- Científico / Médico (dependências opcionais) ---
+
+def gen_fits(path: Path, scale: int, rng: random.Random) -> None:
+    import numpy as np
+    from astropy.io import fits
+    side = int(512 * math.sqrt(scale))
+    data = np.random.default_rng(rng.randint(0, 2**32)).normal(1000, 50, (side, side)).astype(np.float32)
+    table = fits.BinTableHDU.from_columns([
+        fits.Column(name="id", format="J", array=np.arange(1000 * scale)),
+        fits.Column(name="flux", format="E", array=np.linspace(0, 1, 1000 * scale)),
+    ])
+    fits.HDUList([fits.PrimaryHDU(data), table]).writeto(path, overwrite=True)
+
+
+def gen_nc(path: Path, scale: int, rng: random.Random) -> None:
+    import netCDF4
+    import numpy as np
+    n = 5000 * scale
+    with netCDF4.Dataset(path, "w") as ds:
+        ds.createDimension("time", n)
+        t = ds.createVariable("time", "f8", ("time",))
+        v = ds.createVariable("temperature", "f4", ("time",))
+        t[:] = np.arange(n)
+        v[:] = np.random.default_rng(rng.randint(0, 2**32)).normal(20, 5, n)
+
+
+def gen_dcm(path: Path, scale: int, rng: random.Random) -> None:
+    import numpy as np
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, SecondaryCaptureImageStorage, generate_uid
+
+    side = int(512 * math.sqrt(scale))
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid(entropy_srcs=[str(path.name), str(scale)])
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(str(path), {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "OT"
+    ds.Rows = ds.Columns = side
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 12, 11, 0
+    pixels = np.random.default_rng(rng.randint(0, 2**32)).integers(0, 4096, (side, side), dtype=np.uint16)
+    ds.PixelData = pixels.tobytes()
+    ds.save_as(str(path), enforce_file_format=True)
+
+
+# Extensão → gerador. Extensões ausentes aparecem como "sem gerador" no relatório.
+GENERATORS: dict[str, Callable[[Path, int, random.Random], None]] = {
+    "csv": gen_csv, "json": gen_json, "jsonl": gen_jsonl, "ndjson": gen_jsonl,
+    "parquet": gen_parquet, "feather": gen_feather, "xlsx": gen_xlsx,
+    "hdf5": gen_hdf5, "h5": gen_hdf5,
+    "sqlite": gen_sqlite, "db": gen_sqlite, "sql": gen_sql,
+    "yaml": gen_yaml, "yml": gen_yaml, "toml": gen_toml, "xml": gen_xml,
+    "ini": gen_ini, "env": gen_env,
+    "txt": gen_txt, "md": gen_md, "html": gen_html, "pdf": gen_pdf, "docx": gen_docx,
+    "rtf": gen_rtf, "py": gen_py, "ipynb": gen_ipynb,
+    "png": _gen_image("PNG", "RGBA"), "jpg": _gen_image("JPEG"), "jpeg": _gen_image("JPEG"),
+    "webp": _gen_image("WEBP"), "bmp": _gen_image("BMP"), "gif": _gen_image("GIF"),
+    "tiff": gen_tiff_multipage,
+    "svg": gen_svg, "dxf": gen_dxf, "gcode": gen_gcode,
+    "stl": gen_stl, "obj": gen_obj, "ply": gen_ply,
+    "wav": gen_wav, "mp4": gen_mp4,
+    "srt": gen_srt, "vtt": gen_vtt, "ics": gen_ics, "vcf": gen_vcf, "qif": gen_qif,
+    "m3u": gen_m3u, "m3u8": gen_m3u, "har": gen_har,
+    "geojson": gen_geojson, "gpx": gen_gpx,
+    "eml": gen_eml, "mbox": gen_mbox,
+    "zip": gen_zip, "tar": _gen_tar(False), "gz": _gen_tar(True),
+    "fasta": gen_fasta, "fa": gen_fasta, "fastq": gen_fastq, "fq": gen_fastq,
+    "fits": gen_fits, "fit": gen_fits, "fts": gen_fits, "nc": gen_nc,
+    "dcm": gen_dcm,
+}
+
+
+def generate(ext: str, size: str, dest_dir: Path) -> Path:
+    """Gera (ou reaproveita) o arquivo sintético de `ext` no tamanho `size`."""
+    path = Path(dest_dir) / f"{size}.{ext}"
+    if not path.exists():
+        tmp = path.with_name(f".partial-{path.name}")
+        GENERATORS[ext](tmp, SIZES[size], random.Random(f"convertudo:{ext}:{size}"))
+        tmp.rename(path)
+    return path
@@ -0,0 +1,255 @@
+"""Runner dos benchmarks de conversão.
+
+Executa cada aresta de `route_conversion` (extensão de entrada → formato de
+saída) sobre o corpus sintético, em vários tamanhos, cada medição num processo
+novo para que o pico de RSS seja isolado. Uso, a partir de `backend/`:
+
+    python -m benchmarks.run --sizes small,medium --output bench.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25
+
+Com `--baseline`, o processo termina com código 1 se alguma aresta ficar mais
+lenta que o baseline além do limiar.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from converters.registry import EXT_CATEGORY, SUPPORTED_CONVERSIONS, VIRTUAL_FORMAT_EXT
+
+from benchmarks import corpus
+
+DEFAULT_CORPUS_DIR = Path(tempfile.gettempdir()) / "convertudo-bench-corpus"
+
+
+def _edges(only: set[str], categories: set[str]) -> list[tuple[str, str]]:
+    edges = []
+    for input_ext, outputs in SUPPORTED_CONVERSIONS.items():
+        if only and input_ext not in only:
+            continue
+        if categories and EXT_CATEGORY.get(input_ext) not in categories:
+            continue
+        edges.extend((input_ext, out) for out in outputs)
+    return edges
+
+
+def _reset_peak_rss() -> None:
+    # Linux: zera o VmHWM do processo para medir só o pico da conversão
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb() -> int:
+    """VmHWM do processo atual (Linux) ou `ru_maxrss` como aproximação."""
+    import resource
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(conn, input_path: str, output_path: str, input_ext: str, target: str) -> None:
+    """Executa uma conversão e devolve as medições pelo pipe."""
+    import resource
+    try:
+        from converters.registry import route_conversion
+        converter = route_conversion(input_ext, target)
+
+        _reset_peak_rss()
+        self_0 = resource.getrusage(resource.RUSAGE_SELF)
+        child_0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        converter(input_path, output_path, target)
+        wall = time.perf_counter() - start
+        self_1 = resource.getrusage(resource.RUSAGE_SELF)
+        child_1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        cpu = ((self_1.ru_utime - self_0.ru_utime) + (self_1.ru_stime - self_0.ru_stime)
+               + (child_1.ru_utime - child_0.ru_utime) + (child_1.ru_stime - child_0.ru_stime))
+        conn.send({
+            "status": "ok",
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "peak_rss_kb": max(_peak_rss_kb(), child_1.ru_maxrss),
+            "output_bytes": os.path.getsize(output_path) if os.path.exists(output_path) else None,
+        })
+    except BaseException as e:
+        conn.send({"status": "error", "error": f"{type(e).__name__}: {e}"[:500]})
+    finally:
+        conn.close()
+
+
+def run_case(input_path: Path, work_dir: Path, input_ext: str, target: str, timeout: float) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    actual_ext = VIRTUAL_FORMAT_EXT.get(target, target)
+    output_path = work_dir / f"output_{input_ext}_{target}.{actual_ext}"
+    output_path.unlink(missing_ok=True)
+
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(child, str(input_path), str(output_path), input_ext, target))
+    proc.start()
+    child.close()
+    try:
+        if parent.poll(timeout):
+            result = parent.recv()
+        else:
+            result = {"status": "timeout", "error": f"excedeu {timeout:.0f}s"}
+    except EOFError:
+        result = {"status": "error", "error": f"processo terminou com código {proc.exitcode}"}
+    finally:
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+        parent.close()
+        output_path.unlink(missing_ok=True)
+    return result
+
+
+def _median_result(runs: list[dict]) -> dict:
+    ok = [r for r in runs if r["status"] == "ok"]
+    if len(ok) < len(runs):
+        return next(r for r in runs if r["status"] != "ok")
+    merged = dict(ok[0])
+    for key in ("wall_s", "cpu_s", "peak_rss_kb"):
+        merged[key] = statistics.median(r[key] for r in ok)
+    merged["runs"] = len(ok)
+    return merged
+
+
+def run(edges: list[tuple[str, str]], sizes: list[str], corpus_dir: Path,
+        repeat: int, timeout: float) -> list[dict]:
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="convertudo-bench-") as tmp:
+        work_dir = Path(tmp)
+        for size in sizes:
+            for input_ext, target in edges:
+                entry = {
+                    "edge": f"{input_ext}->{target}",
+                    "size": size,
+                    "category": EXT_CATEGORY.get(input_ext, ""),
+                }
+                if input_ext not in corpus.GENERATORS:
+                    results.append({**entry, "status": "skipped", "error": "sem gerador"})
+                    continue
+                try:
+                    input_path = corpus.generate(input_ext, size, corpus_dir)
+                except ImportError as e:
+                    results.append({**entry, "status": "skipped", "error": f"dependência ausente: {e}"})
+                    continue
+                entry["input_bytes"] = input_path.stat().st_size
+                runs = [run_case(input_path, work_dir, input_ext, target, timeout) for _ in range(repeat)]
+                result = {**entry, **_median_result(runs)}
+                results.append(result)
+                _print_result(result)
+    return results
+
+
+def _print_result(r: dict) -> None:
+    label = f"{r['edge']:<22} {r['size']:<7}"
+    if r["status"] == "ok":
+        print(f"{label} {r['wall_s']:>9.3f}s  cpu {r['cpu_s']:>8.3f}s  "
+              f"rss {r['peak_rss_kb'] / 1024:>8.1f} MB  out {r.get('output_bytes') or 0:>12} B")
+    else:
+        print(f"{label} {r['status']}: {r.get('error', '')}")
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float,
+            min_delta: float) -> list[dict]:
+    """Retorna as arestas cujo tempo piorou mais que `threshold` (fração) e `min_delta` (s)."""
+    base = {(b["edge"], b["size"]): b for b in baseline if b.get("status") == "ok"}
+    regressions = []
+    for r in results:
+        b = base.get((r["edge"], r["size"]))
+        if r.get("status") != "ok" or b is None:
+            continue
+        delta = r["wall_s"] - b["wall_s"]
+        if delta > min_delta and r["wall_s"] > b["wall_s"] * (1 + threshold):
+            regressions.append({
+                "edge": r["edge"], "size": r["size"],
+                "baseline_s": b["wall_s"], "current_s": r["wall_s"],
+                "ratio": round(r["wall_s"] / b["wall_s"], 2) if b["wall_s"] else None,
+            })
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de conversão do Convertudo")
+    parser.add_argument("--sizes", default="small,medium",
+                        help=f"tamanhos separados por vírgula ({', '.join(corpus.SIZES)})")
+    parser.add_argument("--only", default="", help="extensões de entrada, separadas por vírgula")
+    parser.add_argument("--category", default="", help="categorias do registry, separadas por vírgula")
+    parser.add_argument("--repeat", type=int, default=1, help="execuções por caso (usa a mediana)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="tempo máximo por caso (s)")
+    parser.add_argument("--corpus-dir", type=Path, default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--baseline", type=Path, help="JSON de resultados anterior para comparar")
+    parser.add_argument("--save-baseline", type=Path, help="grava os resultados também neste caminho")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="piora relativa tolerada antes de acusar regressão (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="piora absoluta mínima (s) para acusar regressão")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in corpus.SIZES]
+    if unknown:
+        parser.error(f"tamanhos desconhecidos: {', '.join(unknown)}")
+
+    only = {e.strip().lower() for e in args.only.split(",") if e.strip()}
+    categories = {c.strip() for c in args.category.split(",") if c.strip()}
+    edges = _edges(only, categories)
+
+    results = run(edges, sizes, args.corpus_dir, max(1, args.repeat), args.timeout)
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": {s: corpus.SIZES[s] for s in sizes},
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        report["regressions"] = regressions
+        for reg in regressions:
+            print(f"REGRESSÃO {reg['edge']} [{reg['size']}]: "
+                  f"{reg['baseline_s']:.3f}s → {reg['current_s']:.3f}s (×{reg['ratio']})")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"Sem regressões acima de {args.threshold:.0%} em relação ao baseline.")
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    args.output.write_text(text, encoding="utf-8")
+    if args.save_baseline:
+        args.save_baseline.write_text(text, encoding="utf-8")
+
+    counts: dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    print(", ".join(f"{k}: {v}" for k, v in sorted(counts.items())), f"→ {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Respostas pré-serializadas de /api/formats e /api/outputs.
+
+O JSON é montado uma vez a partir do registry (fixo durante a execução) e
+servido com ETag forte derivado do conteúdo, para que navegadores e CDNs
+revalidem com 304 em vez de baixar tudo de novo.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from converters import registry
+
+MAX_AGE = int(os.environ.get("CONVERTUDO_FORMATS_MAX_AGE", "300"))
+CACHE_CONTROL = f"public, max-age={MAX_AGE}, must-revalidate"
+
+
+class CachedJSON:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, data):
+        # Mesma serialização do JSONResponse do Starlette
+        self.body = json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None,
+                               separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+
+class Catalog:
+    def __init__(self):
+        self._formats: CachedJSON | None = None
+        self._outputs: dict[str, CachedJSON] = {}
+        self._lock = threading.Lock()
+
+    def _build(self) -> None:
+        formats = {}
+        for category, exts in registry.CATEGORIES.items():
+            category_data = {}
+            for ext in exts:
+                outputs = registry.SUPPORTED_CONVERSIONS.get(ext, [])
+                if outputs:
+                    category_data[ext] = outputs
+            if category_data:
+                formats[category] = category_data
+        self._formats = CachedJSON(formats)
+        self._outputs = {
+            ext: CachedJSON({"extension": ext, "outputs": outputs})
+            for ext, outputs in registry.SUPPORTED_CONVERSIONS.items() if outputs
+        }
+
+    def _current(self) -> None:
+        if self._formats is None:
+            with self._lock:
+                if self._formats is None:
+                    self._build()
+
+    def formats(self) -> CachedJSON:
+        self._current()
+        return self._formats
+
+    def outputs(self, ext: str) -> CachedJSON | None:
+        self._current()
+        return self._outputs.get(ext.lower())
@@ -0,0 +1 @@
+# Coloca backend/ no sys.path: os testes importam `converters` como o main.py
@@ -0,0 +1,348 @@
+"""Conversão de animações (GIF, WebP animado, APNG) quadro a quadro.
+
+Os quadros da origem são decodificados um por vez (`seek`) e passados ao
+escritor do destino antes de decodificar o próximo: a memória fica em torno
+de dois quadros, seja qual for a duração da animação.
+
+- GIF: cabeçalho e quadros gravados com os helpers `getheader`/`getdata` do
+  Pillow. Com `palette="reuse"` (padrão) a paleta do quadro anterior é
+  reaproveitada enquanto representar bem o quadro (sem nova quantização nem
+  tabela local); `"per_frame"` calcula uma paleta por quadro.
+- WebP: encoder de animação do libwebp, alimentado quadro a quadro (nas
+  versões do Pillow conferidas; nas demais, `save_all` com os quadros em memória).
+- APNG: chunks `fcTL`/`fdAT` gravados à mão a partir do PNG de cada quadro.
+- MP4: quadros RGB enviados ao FFmpeg por pipe (`ffmpeg_pipe`).
+
+`fps` limita a taxa de quadros: quadros que caem no mesmo intervalo são
+descartados e a duração deles vai para o quadro mantido.
+"""
+import io
+import itertools
+import struct
+import zlib
+
+from converters.image import resize, to_rgb
+
+# Duração usada por navegadores para quadros GIF sem atraso (ou com menos de 20 ms)
+DEFAULT_DURATION = 100
+MP4_DEFAULT_FPS = 25
+TRANSPARENT_INDEX = 255
+# GIF: a paleta do quadro anterior é reaproveitada se no máximo 0,1% dos pixels
+# ficarem a mais de 16 níveis (por canal) da cor original
+PALETTE_TOLERANCE = 16
+PALETTE_MAX_MISSES = 0.001
+# Versões (major) do Pillow cuja API interna do encoder WebP foi conferida
+WEBP_ENCODER_PILLOW = (11, 12)
+
+
+def iter_frames(img, options: dict):
+    """Gera `(quadro RGBA, duração em ms)` já redimensionados e com `fps` aplicado."""
+    fps = options.get("fps")
+    min_interval = 1000.0 / fps if fps else 0.0
+    pending = None
+    pending_duration = 0
+    next_slot = 0.0
+    t = 0.0
+    for index in range(getattr(img, "n_frames", 1)):
+        img.seek(index)
+        # Alguns leitores (WebP) só preenchem `duration` ao decodificar o quadro
+        img.load()
+        duration = img.info.get("duration") or 0
+        if duration < 20:
+            duration = DEFAULT_DURATION
+        if pending is not None and t < next_slot:
+            pending_duration += duration
+        else:
+            if pending is not None:
+                yield pending, pending_duration
+            # convert() copia: o próximo seek não altera o quadro guardado
+            pending = resize(img.convert("RGBA"), options)
+            pending_duration = duration
+            next_slot = t + min_interval
+        t += duration
+    if pending is not None:
+        yield pending, pending_duration
+
+
+def _has_alpha(frame) -> bool:
+    return frame.getchannel("A").getextrema()[0] < 255
+
+
+# --- GIF ---
+
+def _quantize(rgb):
+    from PIL import Image
+
+    return _full_palette(rgb.quantize(colors=255, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE))
+
+
+def _full_palette(quantized):
+    # Paleta completa: o índice de transparência precisa existir na tabela do GIF
+    palette = quantized.getpalette()[:3 * TRANSPARENT_INDEX]
+    quantized.putpalette(palette + [0] * (768 - len(palette)))
+    return quantized
+
+
+def _reusable_palette(palette_image):
+    """Imagem P só com as cores quantizadas, sem a entrada TRANSPARENT_INDEX.
+
+    Na paleta completa o índice 255 é preto (preenchimento): mapear um quadro
+    nela poderia mandar pixels opacos escuros para o índice de transparência.
+    """
+    from PIL import Image
+
+    reusable = Image.new("P", (1, 1))
+    reusable.putpalette(palette_image.getpalette()[:3 * TRANSPARENT_INDEX])
+    return reusable
+
+
+def _palette_misses(rgb, quantized) -> float:
+    """Fração dos pixels cuja cor ficou a mais de PALETTE_TOLERANCE da original."""
+    from PIL import ImageChops
+
+    r, g, b = ImageChops.difference(rgb, quantized.convert("RGB")).split()
+    hist = ImageChops.lighter(ImageChops.lighter(r, g), b).histogram()
+    return sum(hist[PALETTE_TOLERANCE + 1:]) / (rgb.width * rgb.height)
+
+
+def _to_palette(frame, palette_image):
+    """Quadro RGBA → P com o índice TRANSPARENT_INDEX nos pixels transparentes.
+
+    Com `palette_image`, reaproveita a paleta dele se o quadro couber nela
+    (quase nenhum pixel longe da cor original); senão calcula uma nova.
+    """
+    from PIL import Image
+
+    rgb = frame.convert("RGB")
+    quantized = None
+    if palette_image is not None:
+        quantized = rgb.quantize(palette=_reusable_palette(palette_image), dither=Image.Dither.NONE)
+        # Pillow antigo ignora o tamanho da paleta: nenhum pixel opaco pode cair no índice 255
+        if quantized.histogram()[TRANSPARENT_INDEX] or _palette_misses(rgb, quantized) > PALETTE_MAX_MISSES:
+            quantized = None
+        else:
+            quantized = _full_palette(quantized)
+    if quantized is None:
+        quantized = _quantize(rgb)
+    alpha = frame.getchannel("A")
+    if alpha.getextrema()[0] < 128:
+        mask = alpha.point(lambda a: 255 if a < 128 else 0, "1")
+        quantized.paste(TRANSPARENT_INDEX, mask=mask)
+    return quantized
+
+
+def _dispose_to_transparent(params: dict) -> None:
+    """Quadro opaco seguido de um transparente: limpar a área dele depois de exibido.
+
+    O índice TRANSPARENT_INDEX nunca é usado por quadros opacos (a quantização
+    usa 255 cores e a paleta reaproveitada não tem a entrada 255); marcá-lo
+    como transparência faz decodificadores que limpam com essa cor (Pillow)
+    limparem para transparente, não para o fundo.
+    """
+    params["disposal"] = 2
+    params["transparency"] = TRANSPARENT_INDEX
+
+
+def _write_gif(frames, output_path: str, options: dict, plays: int) -> None:
+    from PIL import GifImagePlugin, ImageChops
+
+    per_frame = options.get("palette", "reuse") == "per_frame"
+    global_palette = None
+    palette_image = None
+    previous = None
+    first_transparent = None
+    # Um quadro fica retido até o próximo ser conhecido: se o próximo tiver
+    # transparência, o retido passa a disposal 2 para não aparecer por baixo
+    held = None
+
+    def emit(f, quantized, offset, params):
+        for block in GifImagePlugin.getdata(quantized, offset, **params):
+            f.write(block)
+
+    with open(output_path, "wb") as f:
+        for frame, duration in frames:
+            quantized = _to_palette(frame, None if per_frame else palette_image)
+            if global_palette is None:
+                global_palette = quantized.getpalette()
+                info = {"optimize": False}
+                if plays != 1:
+                    # NETSCAPE conta as repetições depois da primeira; sem a extensão, toca uma vez
+                    info["loop"] = max(plays - 1, 0)
+                header, _ = GifImagePlugin.getheader(quantized, info=info)
+                for block in header:
+                    f.write(block)
+            palette_image = quantized
+            transparent = _has_alpha(frame)
+            if first_transparent is None:
+                first_transparent = transparent
+            params = {"duration": duration, "disposal": 2 if transparent else 1}
+            if transparent:
+                params["transparency"] = TRANSPARENT_INDEX
+            if quantized.getpalette() != global_palette:
+                params["include_color_table"] = True
+            offset = (0, 0)
+            if previous is not None and not transparent:
+                # Quadro opaco sobre um opaco: só a região que mudou
+                bbox = ImageChops.difference(previous, frame).getbbox(alpha_only=False) or (0, 0, 1, 1)
+                quantized = quantized.crop(bbox)
+                offset = bbox[:2]
+            if held is not None:
+                if transparent:
+                    _dispose_to_transparent(held[2])
+                emit(f, *held)
+            held = (quantized, offset, params)
+            previous = None if transparent else frame
+        if held is not None:
+            # No loop, o último quadro fica por baixo do primeiro
+            if first_transparent:
+                _dispose_to_transparent(held[2])
+            emit(f, *held)
+        f.write(b";")
+
+
+# --- WebP ---
+
+def _webp_encoder():
+    """Módulo `PIL._webp` se a versão do Pillow for uma das conferidas, senão None.
+
+    `WebPAnimEncoder(...)` e `add(...)` são API interna, chamada com argumentos
+    posicionais sem nome: uma ordem diferente com o mesmo número de argumentos
+    não daria erro, só um arquivo errado. A ordem usada abaixo é a do
+    `WebPImagePlugin._save_all` do Pillow 11 e 12 (`add` recebe `getim()`
+    desde o 11.0) e foi conferida no 12.3; fora dessa faixa vale o `save_all`.
+    """
+    from PIL import __version__
+
+    if int(__version__.split(".")[0]) not in WEBP_ENCODER_PILLOW:
+        return None
+    try:
+        from PIL import _webp
+    except ImportError:
+        return None
+    return _webp if hasattr(_webp, "WebPAnimEncoder") else None
+
+
+def _write_webp(frames, output_path: str, options: dict, plays: int) -> None:
+    frames = iter(frames)
+    first, first_duration = next(frames)
+    webp = _webp_encoder()
+    if webp is None:
+        # Encoder interno fora das versões conferidas: save_all, com os quadros em memória
+        rest = list(frames)
+        first.save(output_path, format="WEBP", save_all=True, append_images=[fr for fr, _ in rest],
+                   duration=[first_duration] + [d for _, d in rest], loop=plays, quality=80)
+        return
+
+    # (tamanho, fundo, loop, minimize_size, kmin, kmax, allow_mixed, verbose)
+    encoder = webp.WebPAnimEncoder(first.size, 0, plays, False, 3, 5, False, False)
+    # Mesmos padrões do WebPImagePlugin: quality 80, alpha_quality 100, kmin/kmax do gif2webp
+    timestamp = 0
+    for frame, duration in itertools.chain([(first, first_duration)], frames):
+        # (quadro, timestamp, lossless, quality, alpha_quality, method)
+        encoder.add(frame.getim(), round(timestamp), False, 80, 100, 4)
+        timestamp += duration
+    encoder.add(None, round(timestamp), False, 80, 100, 0)
+    data = encoder.assemble("", "", "")
+    if data is None:
+        raise RuntimeError("Falha ao gerar WebP animado")
+    with open(output_path, "wb") as f:
+        f.write(data)
+
+
+# --- APNG ---
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def _png_chunks(data: bytes):
+    pos = 8
+    while pos < len(data):
+        length, tag = struct.unpack(">I4s", data[pos:pos + 8])
+        yield tag, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def _write_apng(frames, output_path: str, options: dict, plays: int) -> None:
+    sequence = 0
+    count = 0
+    with open(output_path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        for frame, duration in frames:
+            buf = io.BytesIO()
+            frame.save(buf, format="PNG", compress_level=6)
+            chunks = list(_png_chunks(buf.getvalue()))
+            if count == 0:
+                f.write(_png_chunk(b"IHDR", chunks[0][1]))
+                # Número de quadros corrigido no fim (o fps pode descartar quadros)
+                actl_offset = f.tell()
+                f.write(_png_chunk(b"acTL", struct.pack(">II", 0, plays)))
+            width, height = frame.size
+            # Atraso em ms (ou em centésimos, se não couber em 16 bits)
+            delay, den = (duration, 1000) if duration <= 0xFFFF else (min(duration // 10, 0xFFFF), 100)
+            f.write(_png_chunk(b"fcTL", struct.pack(
+                ">IIIIIHHBB", sequence, width, height, 0, 0, delay, den, 0, 0,
+            )))
+            sequence += 1
+            for tag, data in chunks:
+                if tag != b"IDAT":
+                    continue
+                if count == 0:
+                    f.write(_png_chunk(b"IDAT", data))
+                else:
+                    f.write(_png_chunk(b"fdAT", struct.pack(">I", sequence) + data))
+                    sequence += 1
+            count += 1
+        f.write(_png_chunk(b"IEND", b""))
+        f.seek(actl_offset)
+        f.write(_png_chunk(b"acTL", struct.pack(">II", count, plays)))
+
+
+# --- MP4 ---
+
+def _write_mp4(frames, output_path: str, options: dict, plays: int) -> None:
+    from converters.ffmpeg_pipe import FfmpegPipe
+
+    fps = options.get("fps") or MP4_DEFAULT_FPS
+    background = options.get("background", "#ffffff")
+    pipe = None
+    shown = 0
+    t = 0.0
+    try:
+        for frame, duration in frames:
+            if pipe is None:
+                pipe = FfmpegPipe(output_path, frame.size, fps)
+            rgb = to_rgb(frame, background).tobytes()
+            t += duration
+            # Vídeo a taxa constante: cada quadro se repete até cobrir a própria duração
+            repeat = max(1, round(t * fps / 1000) - shown)
+            for _ in range(repeat):
+                pipe.write(rgb)
+            shown += repeat
+    except BaseException:
+        if pipe is not None:
+            pipe.abort()
+        raise
+    pipe.close()
+
+
+WRITERS = {"gif": _write_gif, "webp": _write_webp, "apng": _write_apng, "mp4": _write_mp4}
+
+
+def _plays(img) -> int:
+    """Quantas vezes a origem toca (0 = sem fim).
+
+    No GIF, `loop` conta as repetições depois da primeira e a falta da extensão
+    NETSCAPE significa tocar uma vez; no WebP e no APNG é o total de vezes.
+    """
+    loop = img.info.get("loop")
+    if loop is None:
+        return 1
+    if img.format == "GIF" and loop:
+        return loop + 1
+    return loop
+
+
+def convert(img, output_path: str, target_format: str, options: dict) -> None:
+    """Converte a imagem (animada ou não) aberta pelo Pillow para `target_format`."""
+    WRITERS[target_format](iter_frames(img, options), output_path, options, _plays(img))
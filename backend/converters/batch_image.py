@@ -0,0 +1,134 @@
+"""Conversão de imagens em lote num pool de processos de longa duração.
+
+Os processos do pool são criados uma vez e reaproveitados entre lotes: o
+opener HEIF/AVIF é registrado no inicializador de cada processo, não a cada
+arquivo. Cada processo decodifica e codifica um arquivo por vez; com vários
+arquivos em voo, a decodificação de um se sobrepõe à codificação de outro e à
+gravação do ZIP, feita no processo principal à medida que os resultados ficam
+prontos.
+"""
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+WORKERS = int(os.environ.get("CONVERTUDO_BATCH_WORKERS", str(os.cpu_count() or 1)))
+MAX_FILES = int(os.environ.get("CONVERTUDO_BATCH_MAX_FILES", "500"))
+
+HEIF_EXTENSIONS = {"heic", "heif", "avif"}
+# Formatos já comprimidos vão para o ZIP sem recompressão
+STORED_FORMATS = {"jpg", "jpeg", "png", "webp", "gif"}
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    # O OpenMP do LibRaw lê OMP_NUM_THREADS ao carregar (no primeiro RAW): os
+    # processos do pool dividem entre si as threads configuradas na partida
+    total = int(os.environ.get("OMP_NUM_THREADS") or os.cpu_count() or 1)
+    os.environ["OMP_NUM_THREADS"] = str(max(1, total // WORKERS))
+    try:
+        from converters.heic import register_heif
+        register_heif()
+    except RuntimeError:
+        pass  # sem pillow-heif: só os arquivos HEIF falham
+
+
+def _convert_one(input_path: str, output_path: str, target_format: str, options: dict) -> str:
+    if Path(input_path).suffix.lstrip(".").lower() in HEIF_EXTENSIONS:
+        from converters.heic import convert
+    else:
+        from converters.image import convert
+    convert(input_path, output_path, target_format, options or None)
+    return output_path
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o servidor tem threads, e fork com threads ativas pode travar o filho
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _unique(name: str, used: set[str]) -> str:
+    stem, dot, ext = name.rpartition(".")
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem} ({n}){dot}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def convert_batch(items: list[tuple[str, str]], target_format: str, options: dict, zip_path: str,
+                  work_dir: str, in_flight: int = WORKERS) -> dict:
+    """Converte `items` (`[(caminho de entrada, nome original do arquivo)]`) para um ZIP.
+
+    No máximo `in_flight` arquivos são convertidos ao mesmo tempo: o número de
+    vagas que o lote recebeu do controle de admissão. Arquivos que falham não interrompem o lote: entram em `erros.txt` dentro do
+    ZIP. Retorna `{"converted": n, "failed": n}`; se nenhum converter, levanta
+    ValueError com o primeiro erro.
+    """
+    pool = get_pool()
+    compression = zipfile.ZIP_STORED if target_format in STORED_FORMATS else zipfile.ZIP_DEFLATED
+    used: set[str] = set()
+    errors: list[str] = []
+    converted = 0
+    pending = iter(enumerate(items))
+    running: dict = {}
+
+    def submit_next() -> bool:
+        try:
+            index, (input_path, name) = next(pending)
+        except StopIteration:
+            return False
+        output_path = os.path.join(work_dir, f"out-{index}.{target_format}")
+        future = pool.submit(_convert_one, input_path, output_path, target_format, options)
+        running[future] = (input_path, name)
+        return True
+
+    with zipfile.ZipFile(zip_path, "w", compression) as zf:
+        while len(running) < min(in_flight, WORKERS) and submit_next():
+            pass
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                input_path, name = running.pop(future)
+                try:
+                    output_path = future.result()
+                except BrokenProcessPool:
+                    # Um processo morreu (OOM, sinal): o pool não serve mais; o próximo lote cria outro
+                    shutdown()
+                    raise RuntimeError("Processo de conversão em lote encerrado inesperadamente")
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                else:
+                    zf.write(output_path, _unique(f"{Path(name).stem}.{target_format}", used))
+                    os.remove(output_path)
+                    converted += 1
+                os.remove(input_path)
+                submit_next()
+        if errors:
+            zf.writestr("erros.txt", "\n".join(errors) + "\n")
+
+    if not converted:
+        raise ValueError(errors[0] if errors else "Nenhum arquivo no lote")
+    return {"converted": converted, "failed": len(errors)}
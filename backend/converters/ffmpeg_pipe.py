@@ -0,0 +1,52 @@
+"""Codificação de vídeo a partir de quadros RGB enviados ao FFmpeg por pipe.
+
+Os quadros vão para o stdin do FFmpeg como vídeo cru (`rawvideo`/`rgb24`)
+assim que ficam prontos: nenhum quadro é gravado em disco e a memória fica
+em um quadro. O stderr vai para um arquivo temporário — com `PIPE` o FFmpeg
+pode travar ao encher o buffer enquanto ainda escrevemos no stdin.
+"""
+import shutil
+import subprocess
+import tempfile
+
+
+class FfmpegPipe:
+    def __init__(self, output_path: str, size: tuple[int, int], fps: float):
+        if not shutil.which("ffmpeg"):
+            raise RuntimeError("FFmpeg não encontrado. Instale com: brew install ffmpeg")
+        width, height = size
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", f"{fps:g}",
+            "-i", "pipe:0", "-an",
+            # yuv420p exige dimensões pares
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            output_path,
+        ], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+
+    def write(self, frame: bytes) -> None:
+        try:
+            self.proc.stdin.write(frame)
+        except BrokenPipeError:
+            # O FFmpeg saiu antes da hora: o close() traz a mensagem dele
+            self.close()
+            raise RuntimeError("FFmpeg encerrou antes de receber todos os quadros")
+
+    def abort(self) -> None:
+        self.proc.kill()
+        self.proc.wait()
+        self.stderr.close()
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.proc.wait()
+        self.stderr.seek(0)
+        message = self.stderr.read().decode(errors="replace")[-2000:]
+        self.stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"FFmpeg falhou:\n{message}")
@@ -1,99 +1,284 @@
-"""Conversor de HDR (Radiance) e EXR via imageio + OpenCV."""
+"""Conversor de HDR (Radiance) e EXR via OpenCV (ou imageio).
+
+EXR passa pelo imageio; o codec EXR do OpenCV, desligado por padrão por
+segurança, só é usado com `CONVERTUDO_HDR_OPENCV_EXR=1`.
+
+O tone mapping para 8 bits é feito em faixas de linhas, in-place sobre a
+imagem carregada e com buffers do tamanho de uma faixa alocados uma vez: o
+pico de memória fica perto da imagem float32 em si, sem as cópias inteiras
+(cópia, divisão, clip) de um tone mapping feito de uma vez. PNG e TIFF são
+gravados faixa a faixa (`image_strips`); JPEG monta a saída de 8 bits inteira.
+
+Opções (campo `options` de `/api/convert`):
+- `tonemap`: `reinhard` (padrão; Reinhard global sobre a luminância, com
+  chave pela média logarítmica da cena), `aces` (curva fílmica ACES),
+  `exposure` (só exposição e gama), `drago` ou `mantiuk` (tonemappers do
+  OpenCV, multithread, mas sobre a imagem inteira).
+- `exposure`: ajuste em stops (padrão 0).
+- `gamma`: gama de saída (padrão 2.2).
+"""
+import math
+import os
 from pathlib import Path
+
 import numpy as np
 
+MB = 1024 * 1024
+
+STRIP_BYTES = int(float(os.environ.get("CONVERTUDO_HDR_STRIP_MB", "4")) * MB)
+THREADS = int(os.environ.get("CONVERTUDO_HDR_THREADS", str(os.cpu_count() or 1)))
+# O codec EXR do OpenCV vem desligado por padrão por segurança (arquivos
+# maliciosos); sem esta opção, EXR é lido e gravado pelo imageio
+OPENCV_EXR = os.environ.get("CONVERTUDO_HDR_OPENCV_EXR", "") == "1"
+
+TONEMAPS = ("reinhard", "aces", "exposure", "drago", "mantiuk")
+OPENCV_TONEMAPS = {"drago": "createTonemapDrago", "mantiuk": "createTonemapMantiuk"}
+MAX_EXPOSURE = 20
+GAMMA_RANGE = (0.2, 5.0)
+
+# Luminância Rec. 709 na ordem de canais do OpenCV (BGR)
+LUMA_BGR = np.array([0.0722, 0.7152, 0.2126], dtype=np.float32)
+REINHARD_KEY = 0.18
+# Maior valor finito de um half float: +inf do EXR vira isso
+HALF_MAX = 65504.0
+
+PILLOW_FORMAT_MAP = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "tiff": "TIFF"}
+
+
+def validate_options(options: dict) -> dict:
+    """Normaliza as opções do tone mapping; ValueError se alguma for inválida."""
+    clean: dict = {}
+    for key, value in options.items():
+        if key == "tonemap":
+            if value not in TONEMAPS:
+                raise ValueError(f"tonemap deve ser um de: {', '.join(TONEMAPS)}")
+            clean[key] = value
+        elif key == "exposure":
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or abs(value) > MAX_EXPOSURE:
+                raise ValueError(f"exposure deve ser um número entre -{MAX_EXPOSURE} e {MAX_EXPOSURE}")
+            clean[key] = float(value)
+        elif key == "gamma":
+            low, high = GAMMA_RANGE
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                raise ValueError(f"gamma deve ser um número entre {low} e {high}")
+            clean[key] = float(value)
+        else:
+            raise ValueError(f"Opção desconhecida: {key}")
+    return clean
+
 
-def convert(input_path: str, output_path: str, target_format: str) -> None:
+def convert(input_path: str, output_path: str, target_format: str, options: dict | None = None) -> None:
+    options = validate_options(options or {})
     input_ext = Path(input_path).suffix.lstrip(".").lower()
     target_format = target_format.lower()
 
-    img_linear = _load_hdr(input_path, input_ext)
+    img_bgr = _load_hdr(input_path, input_ext)
 
     if target_format == "exr":
-        _save_exr(img_linear, output_path)
-    else:
-        # Tone mapping para LDR (Low Dynamic Range)
-        img_ldr = _tonemap(img_linear)
-        _save_ldr(img_ldr, output_path, target_format)
+        _save_exr(img_bgr, output_path)
+        return
+
+    pil_format = PILLOW_FORMAT_MAP.get(target_format)
+    if pil_format is None:
+        raise ValueError(f"Formato de saída não suportado: {target_format}")
+    # Tone mapping para LDR (Low Dynamic Range)
+    rows = max(1, STRIP_BYTES // (img_bgr.shape[1] * 3 * 4))
+    _save_ldr(_tonemap(img_bgr, options, rows), img_bgr.shape[:2], rows, output_path, pil_format)
+
+
+def _import_cv2():
+    if OPENCV_EXR:
+        # Lida pelo OpenCV na primeira importação: só vale se o cv2 ainda não foi carregado
+        os.environ.setdefault("OPENCV_IO_ENABLE_OPENEXR", "1")
+    import cv2
+    cv2.setNumThreads(THREADS)
+    return cv2
 
 
 def _load_hdr(input_path: str, ext: str) -> np.ndarray:
-    """Carrega arquivo HDR/EXR e retorna array float32 RGB."""
-    if ext == "exr":
-        return _load_exr(input_path)
-    else:
-        # HDR (Radiance RGBE)
+    """Carrega arquivo HDR/EXR e retorna array float32 BGR (ordem do OpenCV)."""
+    cv2 = None
+    if ext != "exr" or OPENCV_EXR:
         try:
-            import imageio.v3 as iio
-            img = iio.imread(input_path, plugin="opencv")
-            return img.astype(np.float32)
-        except Exception:
-            import cv2
-            img = cv2.imread(input_path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_COLOR)
-            if img is None:
-                raise RuntimeError(f"Não foi possível abrir: {input_path}")
-            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32)
-
-
-def _load_exr(input_path: str) -> np.ndarray:
-    try:
-        import cv2
+            cv2 = _import_cv2()
+        except ImportError:
+            pass
+    if cv2 is not None:
         img = cv2.imread(input_path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_COLOR)
-        if img is None:
-            raise RuntimeError("OpenCV não conseguiu abrir o EXR")
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        return img_rgb.astype(np.float32)
-    except ImportError:
-        pass
+        if img is not None:
+            return img.astype(np.float32, copy=False)
 
     try:
         import imageio.v3 as iio
         img = iio.imread(input_path)
-        return np.array(img, dtype=np.float32)
     except Exception as e:
-        raise RuntimeError(
-            f"EXR requer opencv-python ou imageio[freeimage]: {e}\n"
-            "Instale com: pip install opencv-python"
-        )
+        if ext == "exr":
+            raise RuntimeError(
+                f"EXR requer a biblioteca FreeImage para o imageio (libfreeimage3 ou "
+                f"`imageio_download_bin freeimage`), ou opencv-python com CONVERTUDO_HDR_OPENCV_EXR=1: {e}"
+            )
+        raise RuntimeError(f"Não foi possível abrir: {input_path}")
+    img = np.asarray(img, dtype=np.float32)
+    if img.ndim == 2:
+        img = np.repeat(img[:, :, None], 3, axis=2)
+    # RGB(A) → BGR sem cópia
+    return img[:, :, 2::-1]
 
 
-def _tonemap(img_linear: np.ndarray) -> np.ndarray:
-    """Reinhard tone mapping simples: expõe para LDR 8-bit."""
-    img = img_linear.copy()
-    img = img / (img + 1.0)             # Reinhard
-    img = np.clip(img * 255.0, 0, 255).astype(np.uint8)
-    return img
+def _strips(height: int, rows: int):
+    for start in range(0, height, rows):
+        yield start, min(start + rows, height)
 
 
-def _save_ldr(img: np.ndarray, output_path: str, target_format: str) -> None:
-    from PIL import Image
-    pil_img = Image.fromarray(img)
+def _sanitize(block: np.ndarray) -> None:
+    """NaN e negativos viram 0 e +inf vira HALF_MAX, in-place."""
+    np.nan_to_num(block, copy=False, nan=0.0, posinf=HALF_MAX, neginf=0.0)
+    np.maximum(block, 0.0, out=block)
 
-    fmt_map = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "tiff": "TIFF"}
-    pil_format = fmt_map.get(target_format)
-    if pil_format is None:
-        raise ValueError(f"Formato de saída não suportado: {target_format}")
 
-    save_kwargs: dict = {}
-    if pil_format == "JPEG":
-        if pil_img.mode != "RGB":
-            pil_img = pil_img.convert("RGB")
-        save_kwargs["quality"] = 95
+def _scene_stats(img: np.ndarray, rows: int, lum: np.ndarray) -> tuple[float, float]:
+    """Média logarítmica e máximo da luminância, faixa a faixa."""
+    height, width = img.shape[:2]
+    log_sum = 0.0
+    peak = 0.0
+    for start, end in _strips(height, rows):
+        block = img[start:end]
+        _sanitize(block)
+        l = lum[:end - start]
+        np.dot(block, LUMA_BGR, out=l)
+        peak = max(peak, float(l.max()))
+        l += 1e-6
+        np.log(l, out=l)
+        log_sum += float(l.sum(dtype=np.float64))
+    return math.exp(log_sum / (height * width)), peak
+
 
-    pil_img.save(output_path, format=pil_format, **save_kwargs)
+def _tonemap(img: np.ndarray, options: dict, rows: int):
+    """Gera faixas uint8 RGB `(linhas, largura, 3)` com o tone mapping aplicado."""
+    method = options.get("tonemap", "reinhard")
+    gain = 2.0 ** options.get("exposure", 0.0)
+    gamma = options.get("gamma", 2.2)
+    if method in OPENCV_TONEMAPS:
+        yield from _tonemap_opencv(img, method, gain, gamma, rows)
+        return
 
+    height, width = img.shape[:2]
+    # Buffers de uma faixa, reaproveitados em todas
+    lum = np.empty((rows, width), dtype=np.float32)
+    ratio = np.empty((rows, width), dtype=np.float32)
+    num = np.empty((rows, width, 3), dtype=np.float32)
+    den = np.empty((rows, width, 3), dtype=np.float32)
+    out = np.empty((rows, width, 3), dtype=np.uint8)
 
-def _save_exr(img_linear: np.ndarray, output_path: str) -> None:
-    try:
-        import cv2
-        img_bgr = cv2.cvtColor(img_linear, cv2.COLOR_RGB2BGR)
-        cv2.imwrite(output_path, img_bgr)
+    if method == "reinhard":
+        log_avg, peak = _scene_stats(img, rows, lum)
+        scale = REINHARD_KEY / log_avg * gain
+        white2 = max(peak * scale, 1e-6) ** 2
+
+    for start, end in _strips(height, rows):
+        n = end - start
+        block = img[start:end]
+        if method == "reinhard":
+            # Ld = Ls (1 + Ls / Lwhite²) / (1 + Ls), Ls = L·scale; cor multiplicada por Ld / L
+            l, r = lum[:n], ratio[:n]
+            np.dot(block, LUMA_BGR, out=l)
+            l *= scale
+            np.divide(l, white2, out=r)
+            r += 1.0
+            l += 1.0
+            r /= l
+            r *= scale
+            block *= r[:, :, None]
+        else:
+            _sanitize(block)
+            block *= gain
+            if method == "aces":
+                # Ajuste de Narkowicz: x (2.51x + 0.03) / (x (2.43x + 0.59) + 0.14)
+                a, b = num[:n], den[:n]
+                block *= 0.6
+                np.multiply(block, 2.51, out=a)
+                a += 0.03
+                a *= block
+                np.multiply(block, 2.43, out=b)
+                b += 0.59
+                b *= block
+                b += 0.14
+                np.divide(a, b, out=block)
+        np.clip(block, 0.0, 1.0, out=block)
+        np.power(block, 1.0 / gamma, out=block)
+        block *= 255.0
+        block += 0.5
+        o = out[:n]
+        np.copyto(o, block[:, :, ::-1], casting="unsafe")
+        yield o
+
+
+def _tonemap_opencv(img: np.ndarray, method: str, gain: float, gamma: float, rows: int):
+    cv2 = _import_cv2()
+    height = img.shape[0]
+    for start, end in _strips(height, rows):
+        block = img[start:end]
+        _sanitize(block)
+        block *= gain
+    # Os tonemappers do OpenCV precisam da imagem inteira (e contígua)
+    ldr = getattr(cv2, OPENCV_TONEMAPS[method])(gamma=gamma).process(np.ascontiguousarray(img))
+    for start, end in _strips(height, rows):
+        block = ldr[start:end]
+        _sanitize(block)
+        np.clip(block, 0.0, 1.0, out=block)
+        block *= 255.0
+        block += 0.5
+        yield block[:, :, ::-1].astype(np.uint8)
+
+
+def _save_ldr(strips, shape: tuple[int, int], rows: int, output_path: str, pil_format: str) -> None:
+    from converters.image_strips import PngStripWriter, TiffStripWriter
+
+    height, width = shape
+    if pil_format == "PNG":
+        writer = PngStripWriter(output_path, width, height, "RGB")
+    elif pil_format == "TIFF":
+        writer = TiffStripWriter(output_path, width, height, "RGB", rows)
+    else:
+        from PIL import Image
+
+        full = np.empty((height, width, 3), dtype=np.uint8)
+        start = 0
+        for block in strips:
+            full[start:start + block.shape[0]] = block
+            start += block.shape[0]
+        Image.fromarray(full).save(output_path, format=pil_format, quality=95)
         return
-    except ImportError:
-        pass
+
+    try:
+        for block in strips:
+            # TiffStripWriter pode guardar a última faixa até o close(): não reaproveitar o buffer
+            writer.write(block.copy() if pil_format == "TIFF" else block)
+    except BaseException:
+        writer.f.close()
+        raise
+    writer.close()
+
+
+def _save_exr(img_bgr: np.ndarray, output_path: str) -> None:
+    cv2 = None
+    if OPENCV_EXR:
+        try:
+            cv2 = _import_cv2()
+        except ImportError:
+            pass
+    if cv2 is not None:
+        try:
+            if cv2.imwrite(output_path, np.ascontiguousarray(img_bgr)):
+                return
+        except cv2.error:
+            pass  # OpenCV compilado sem OpenEXR: tenta o imageio
 
     try:
         import imageio.v3 as iio
-        iio.imwrite(output_path, img_linear)
+        iio.imwrite(output_path, img_bgr[:, :, ::-1])
     except Exception as e:
-        raise RuntimeError(f"EXR export requer opencv-python: {e}")
+        raise RuntimeError(
+            f"EXR export requer a biblioteca FreeImage para o imageio (libfreeimage3 ou "
+            f"`imageio_download_bin freeimage`), ou opencv-python com CONVERTUDO_HDR_OPENCV_EXR=1: {e}"
+        )
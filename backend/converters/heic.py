@@ -1,30 +1,44 @@
 """Conversor de HEIC, HEIF e AVIF via pillow-heif + Pillow."""
 from pathlib import Path
 
+from converters.image import resize, to_rgb, validate_options
+
+_heif_registered = False
+
 PILLOW_FORMAT_MAP = {
     "jpg": "JPEG", "jpeg": "JPEG",
     "png": "PNG", "webp": "WEBP", "tiff": "TIFF",
 }
 
 
-def convert(input_path: str, output_path: str, target_format: str) -> None:
+def register_heif() -> None:
+    """Registra o opener HEIF/AVIF no Pillow uma única vez por processo."""
+    global _heif_registered
+    if _heif_registered:
+        return
     try:
         import pillow_heif
-        pillow_heif.register_heif_opener()
     except ImportError:
         raise RuntimeError("Instale: pip install pillow-heif")
+    pillow_heif.register_heif_opener()
+    _heif_registered = True
+
+
+def convert(input_path: str, output_path: str, target_format: str, options: dict | None = None) -> None:
+    register_heif()
 
     from PIL import Image
 
+    options = validate_options(options or {})
     target_format = target_format.lower()
     pil_format = PILLOW_FORMAT_MAP.get(target_format)
     if pil_format is None:
         raise ValueError(f"Formato de saída não suportado: {target_format}")
 
-    img = Image.open(input_path)
+    img = resize(Image.open(input_path), options)
 
     if pil_format in ("JPEG",) and img.mode in ("RGBA", "P", "LA"):
-        img = img.convert("RGB")
+        img = to_rgb(img, options.get("background", "#ffffff"))
 
     save_kwargs: dict = {}
     if pil_format == "JPEG":
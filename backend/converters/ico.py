@@ -0,0 +1,43 @@
+"""Ícones ICO com todos os tamanhos padrão a partir de uma única decodificação.
+
+A imagem é decodificada uma vez (em JPEG, já reduzida pelo `draft`), centrada
+num quadrado transparente e reduzida em cascata: 256 → 128 → 64 → … → 16,
+cada tamanho a partir do anterior. O Pillow, sem os tamanhos prontos, reduz a
+imagem original inteira uma vez para cada tamanho.
+"""
+
+ICO_SIZES = (256, 128, 64, 48, 32, 24, 16)
+# Caixa para o draft do JPEG: maior que isso não chega ao ícone
+DRAFT_OPTIONS = {"max_width": ICO_SIZES[0], "max_height": ICO_SIZES[0]}
+
+
+def build_frames(img) -> list:
+    """Quadros RGBA quadrados, do maior para o menor."""
+    from PIL import Image
+
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    side = max(img.size)
+    if img.width != img.height:
+        square = Image.new("RGBA", (side, side), (0, 0, 0, 0))
+        square.paste(img, ((side - img.width) // 2, (side - img.height) // 2))
+        img = square
+    sizes = [s for s in ICO_SIZES if s <= side] or [side]
+
+    frames = []
+    current = img
+    for size in sizes:
+        if current.width != size:
+            # Primeira redução (da imagem grande): reducing_gap corta o custo do Lanczos
+            gap = 3.0 if current is img else None
+            current = current.resize((size, size), Image.Resampling.LANCZOS, reducing_gap=gap)
+        frames.append(current)
+    return frames
+
+
+def save(img, output_path: str) -> None:
+    frames = build_frames(img)
+    frames[0].save(
+        output_path, format="ICO",
+        sizes=[f.size for f in frames], append_images=frames[1:],
+    )
@@ -1,7 +1,47 @@
-"""Conversor de imagens: Pillow (raster) + rawpy (câmera RAW)."""
+"""Conversor de imagens: Pillow (raster) + rawpy (câmera RAW).
+
+Toda imagem passa por um limite de pixels (proteção contra "decompression
+bombs") e por uma estimativa de memória antes de ser decodificada. Imagens
+grandes sem compressão (TIFF, BMP, PPM/PGM) indo para PNG ou TIFF são
+convertidas faixa a faixa por `image_strips`, sem carregar a imagem inteira.
+
+Opções (campo `options` de `/api/convert`): `max_width`/`max_height` com `fit`
+(`contain`, `cover` ou `fill`) redimensionam a imagem. Em JPEG o decodificador
+já reduz a imagem na decodificação (`Image.draft`, escala por DCT) e o ajuste
+final usa Lanczos. Sem redimensionamento, JPEG → JPEG e JPEG → PDF não
+recomprimem (`jpeg_lossless`).
+
+Para RAW de câmera, `raw_mode` escolhe entre `full` (demosaico completo,
+padrão), `half` (demosaico em meia resolução, ~4x mais rápido) e `preview`
+(JPEG embutido pela câmera, sem demosaico). O LibRaw usa OpenMP; o número de
+threads (`CONVERTUDO_RAW_THREADS`) é definido na partida do servidor (`main`).
+
+TIFF → PDF e TIFF multipágina → TIFF seguem página a página (`tiff_pages`);
+ICO sai com todos os tamanhos padrão, reduzidos em cascata (`ico`).
+
+Origens animadas (GIF, WebP, APNG) indo para GIF, WebP, APNG ou MP4 são
+convertidas quadro a quadro por `animation`, com `fps` (limite de quadros por
+segundo) e `palette` (`reuse` ou `per_frame`, só para GIF).
+"""
 import os
+import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+from PIL import Image
+
+MB = 1024 * 1024
+
+# Limite de pixels por imagem deste conversor (conferido contra o cabeçalho);
+# o limite global do Pillow continua o padrão para os demais conversores
+MAX_PIXELS = int(os.environ.get("CONVERTUDO_IMAGE_MAX_PIXELS", str(1_000_000_000)))
+# Memória estimada máxima para conversões que decodificam a imagem inteira
+MAX_MEMORY = int(float(os.environ.get("CONVERTUDO_IMAGE_MAX_MEMORY_MB", "2048")) * MB)
+# A partir daqui usa a conversão por faixas quando a origem/destino permitem
+STRIP_THRESHOLD = int(float(os.environ.get("CONVERTUDO_IMAGE_STRIP_THRESHOLD_MB", "256")) * MB)
+STRIP_BYTES = int(float(os.environ.get("CONVERTUDO_IMAGE_STRIP_MB", "8")) * MB)
+
 RAW_EXTENSIONS = {"cr2", "nef", "arw", "dng", "raf", "orf", "rw2"}
 
 PILLOW_FORMAT_MAP = {
@@ -16,39 +56,348 @@ PILLOW_FORMAT_MAP = {
     "pdf":  "PDF",
 }
 
+STRIP_FORMATS = {"PNG", "TIFF"}
+
+# Bytes por pixel de cada modo do Pillow (modos ausentes: 4)
+MODE_BYTES = {"1": 1, "L": 1, "P": 1, "LA": 2, "PA": 2, "I;16": 2, "RGB": 3, "YCbCr": 3,
+              "LAB": 3, "HSV": 3, "RGBA": 4, "RGBX": 4, "CMYK": 4, "I": 4, "F": 4}
+
+
+FITS = ("contain", "cover", "fill")
+_COLOR_RE = re.compile(r"^#?([0-9a-fA-F]{6})$")
+RAW_MODES = ("full", "half", "preview")
+MAX_DIMENSION = 65535
+PALETTES = ("reuse", "per_frame")
+MAX_FPS = 60
+# Destinos que aceitam vários quadros; os dois últimos só existem como animação
+ANIMATION_TARGETS = {"gif", "webp", "apng", "mp4"}
+ANIMATION_ONLY = {"apng", "mp4"}
+
+
+def validate_options(options: dict) -> dict:
+    """Normaliza as opções da conversão; ValueError se alguma for inválida."""
+    clean: dict = {}
+    for key, value in options.items():
+        if key in ("max_width", "max_height"):
+            if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= MAX_DIMENSION:
+                raise ValueError(f"{key} deve ser um inteiro entre 1 e {MAX_DIMENSION}")
+            clean[key] = value
+        elif key == "fit":
+            if value not in FITS:
+                raise ValueError(f"fit deve ser um de: {', '.join(FITS)}")
+            clean[key] = value
+        elif key == "background":
+            m = _COLOR_RE.match(value) if isinstance(value, str) else None
+            if m is None:
+                raise ValueError("background deve ser uma cor #rrggbb")
+            clean[key] = "#" + m.group(1).lower()
+        elif key == "fps":
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= MAX_FPS:
+                raise ValueError(f"fps deve ser um número entre 0 e {MAX_FPS}")
+            clean[key] = value
+        elif key == "palette":
+            if value not in PALETTES:
+                raise ValueError(f"palette deve ser um de: {', '.join(PALETTES)}")
+            clean[key] = value
+        elif key == "raw_mode":
+            if value not in RAW_MODES:
+                raise ValueError(f"raw_mode deve ser um de: {', '.join(RAW_MODES)}")
+            clean[key] = value
+        else:
+            raise ValueError(f"Opção desconhecida: {key}")
+    fit = clean.get("fit", "contain")
+    if fit != "contain" and not ("max_width" in clean and "max_height" in clean):
+        raise ValueError(f"fit={fit} exige max_width e max_height")
+    if "fit" in clean and not ("max_width" in clean or "max_height" in clean):
+        raise ValueError("fit exige max_width e/ou max_height")
+    return clean
+
+
+def _resize_plan(size: tuple[int, int], options: dict) -> tuple[tuple[int, int], tuple[int, int]] | None:
+    """(tamanho redimensionado, tamanho final após o corte) ou None se não há o que fazer."""
+    max_w = options.get("max_width")
+    max_h = options.get("max_height")
+    if max_w is None and max_h is None:
+        return None
+    width, height = size
+    fit = options.get("fit", "contain")
+    if fit == "fill":
+        return (max_w, max_h), (max_w, max_h)
+    scale_w = max_w / width if max_w else float("inf")
+    scale_h = max_h / height if max_h else float("inf")
+    # Nunca amplia: só reduz
+    scale = min(max(scale_w, scale_h) if fit == "cover" else min(scale_w, scale_h), 1.0)
+    resized = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if fit == "cover":
+        final = (min(resized[0], max_w), min(resized[1], max_h))
+    else:
+        final = resized
+    if resized == size and final == size:
+        return None
+    return resized, final
+
+
+def resize(img, options: dict):
+    """Aplica `max_width`/`max_height`/`fit` a uma imagem do Pillow (já com draft, se houver)."""
+
+    plan = _resize_plan(img.size, options)
+    if plan is None:
+        return img
+    resized, final = plan
+    if img.mode == "P":
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    elif img.mode == "1":
+        img = img.convert("L")
+    # reducing_gap: reduz por fator inteiro (rápido) antes do Lanczos final
+    img = img.resize(resized, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if final != resized:
+        left = (resized[0] - final[0]) // 2
+        top = (resized[1] - final[1]) // 2
+        img = img.crop((left, top, left + final[0], top + final[1]))
+    return img
+
+
+def _parse_color(value: str) -> tuple[int, int, int]:
+    value = value.lstrip("#")
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def to_rgb(img, background: str = "#ffffff"):
+    """Converte para RGB compondo a transparência sobre `background`.
+
+    CMYK sem perfil ICC usa a fórmula multiplicativa R = (255-C)(255-K)/255,
+    feita banda a banda nas operações em C do Pillow (mais rápidas que numpy
+    aqui); com perfil, a conversão é feita pelo ImageCms.
+    """
+    from PIL import ImageChops
+
+    if img.mode == "RGB":
+        return img
+    if img.mode == "CMYK":
+        icc = img.info.get("icc_profile")
+        if icc:
+            import io
+            from PIL import ImageCms
+            try:
+                return ImageCms.profileToProfile(
+                    img, ImageCms.ImageCmsProfile(io.BytesIO(icc)), ImageCms.createProfile("sRGB"),
+                    outputMode="RGB",
+                )
+            except (ImageCms.PyCMSError, OSError):
+                pass
+        c, m, y, k = img.point(lambda v: 255 - v).split()
+        return Image.merge("RGB", [ImageChops.multiply(band, k) for band in (c, m, y)])
+    if img.mode == "P":
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    elif img.mode == "PA":
+        img = img.convert("RGBA")
+    if img.mode in ("RGBA", "LA"):
+        flat = Image.new("RGB", img.size, _parse_color(background))
+        # paste com máscara faz a composição alfa em C, sem cópia intermediária em RGB
+        flat.paste(img.convert("RGBA") if img.mode == "LA" else img, mask=img.getchannel("A"))
+        return flat
+    return img.convert("RGB")
+
+
+def _check_pixels(width: int, height: int) -> None:
+    if width * height > MAX_PIXELS:
+        raise ValueError(
+            f"Imagem de {width}x{height} px excede o limite de {MAX_PIXELS:,} pixels".replace(",", ".")
+        )
+
+
+_pixel_limit_lock = threading.Lock()
+_pixel_limit_users = 0
+_pixel_limit_default = None
+
+
+@contextmanager
+def _raised_pixel_limit():
+    """Sobe o limite global do Pillow para MAX_PIXELS só durante `Image.open`.
 
-def _raw_to_numpy(input_path: str):
+    O limite é global e as conversões rodam em threads: o valor original volta
+    quando a última abertura em andamento termina. O limite de verdade é o
+    `_check_pixels` feito logo depois, sobre o tamanho lido do cabeçalho.
+    """
+    global _pixel_limit_users, _pixel_limit_default
+    with _pixel_limit_lock:
+        if _pixel_limit_users == 0:
+            _pixel_limit_default = Image.MAX_IMAGE_PIXELS
+            if _pixel_limit_default is not None:
+                Image.MAX_IMAGE_PIXELS = max(_pixel_limit_default, MAX_PIXELS)
+        _pixel_limit_users += 1
+    try:
+        yield
+    finally:
+        with _pixel_limit_lock:
+            _pixel_limit_users -= 1
+            if _pixel_limit_users == 0:
+                Image.MAX_IMAGE_PIXELS = _pixel_limit_default
+
+
+def _estimate_memory(width: int, height: int, mode: str, target_mode: str | None) -> int:
+    """Pico aproximado da conversão em memória: imagem decodificada + cópia convertida."""
+    pixels = width * height
+    total = pixels * MODE_BYTES.get(mode, 4)
+    if target_mode and target_mode != mode:
+        total += pixels * MODE_BYTES.get(target_mode, 4)
+    return total
+
+
+def _check_memory(estimate: int) -> None:
+    if estimate > MAX_MEMORY:
+        raise ValueError(
+            f"Imagem grande demais para converter em memória "
+            f"(~{estimate // MB} MB; limite {MAX_MEMORY // MB} MB)"
+        )
+
+
+def _check_page(page) -> None:
+    """Limites de pixels e memória para uma página de um arquivo multipágina."""
+    _check_pixels(page.width, page.height)
+    _check_memory(_estimate_memory(page.width, page.height, page.mode, "RGB"))
+
+
+def _draft(img, options: dict, swap: bool = False):
+    """Em JPEG, decodifica já reduzido (1/2, 1/4 ou 1/8) sem ficar menor que o tamanho pedido."""
+    if img.format != "JPEG":
+        return
+    size = img.size[::-1] if swap else img.size
+    plan = _resize_plan(size, options)
+    if plan is not None:
+        img.draft(img.mode, plan[0][::-1] if swap else plan[0])
+
+
+# raw.sizes.flip do LibRaw → transposição equivalente do Pillow
+_RAW_FLIPS = {3: "ROTATE_180", 5: "ROTATE_90", 6: "ROTATE_270"}
+
+
+def _raw_preview(raw, options: dict):
+    """Imagem de pré-visualização embutida no RAW, ou None se não houver uma utilizável."""
+    import io
     import rawpy
-    with rawpy.imread(input_path) as raw:
-        return raw.postprocess()
+
+    try:
+        thumb = raw.extract_thumb()
+    except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+        return None
+    flip = raw.sizes.flip
+    if thumb.format == rawpy.ThumbFormat.JPEG:
+        img = Image.open(io.BytesIO(thumb.data))
+        _draft(img, options, swap=flip in (5, 6))
+    else:
+        img = Image.fromarray(thumb.data)
+    _check_pixels(*img.size)
+    # A prévia vem na orientação do sensor; postprocess() já gira, aqui é manual
+    if flip in _RAW_FLIPS:
+        img = img.transpose(getattr(Image.Transpose, _RAW_FLIPS[flip]))
+    return img
 
 
-def convert(input_path: str, output_path: str, target_format: str) -> None:
-    from PIL import Image
+def _open_raw(input_path: str, options: dict):
+    """Abre um RAW de câmera como imagem do Pillow segundo `raw_mode`."""
+    import rawpy
+
+    mode = options.get("raw_mode", "full")
+    with rawpy.imread(input_path) as raw:
+        if mode == "preview":
+            img = _raw_preview(raw, options)
+            if img is not None:
+                return img
+            # Sem prévia embutida: meia resolução é o mais rápido que sobra
+            mode = "half"
+        width, height = raw.sizes.width, raw.sizes.height
+        _check_pixels(width, height)
+        if mode == "half":
+            width, height = width // 2, height // 2
+        # postprocess() devolve RGB 8 bits; Image.fromarray copia mais uma vez
+        _check_memory(2 * _estimate_memory(width, height, "RGB", None))
+        rgb = raw.postprocess(half_size=mode == "half")
+    return Image.fromarray(rgb)
+
 
+def convert(input_path: str, output_path: str, target_format: str, options: dict | None = None) -> None:
+    options = validate_options(options or {})
     target_format = target_format.lower()
     input_ext = Path(input_path).suffix.lstrip(".").lower()
 
+    pil_format = PILLOW_FORMAT_MAP.get(target_format)
+    if pil_format is None and target_format not in ANIMATION_ONLY:
+        raise ValueError(f"Formato de saída não suportado: {target_format}")
+
+    if (input_ext in ("jpg", "jpeg") and pil_format in ("JPEG", "PDF")
+            and "max_width" not in options and "max_height" not in options):
+        from converters import jpeg_lossless
+        if jpeg_lossless.convert(input_path, output_path, pil_format):
+            return
+
     if input_ext in RAW_EXTENSIONS:
-        import numpy as np
-        rgb = _raw_to_numpy(input_path)
-        img = Image.fromarray(rgb)
+        if pil_format is None:
+            raise ValueError(f"Formato de saída não suportado: {target_format}")
+        img = _open_raw(input_path, options)
     else:
-        img = Image.open(input_path)
+        try:
+            # open() só lê o cabeçalho: tamanho e modo já estão disponíveis
+            with _raised_pixel_limit():
+                img = Image.open(input_path)
+        except Image.DecompressionBombError:
+            raise ValueError(f"Imagem excede o limite de {MAX_PIXELS:,} pixels".replace(",", "."))
+        width, height = img.size
+        _check_pixels(width, height)
 
-    # Converter para RGB se necessário (PNG/GIF pode ter transparência)
-    pil_format = PILLOW_FORMAT_MAP.get(target_format)
-    if pil_format is None:
-        raise ValueError(f"Formato de saída não suportado: {target_format}")
+        if target_format in ANIMATION_TARGETS and (getattr(img, "is_animated", False) or pil_format is None):
+            from converters import animation
+            # Quadro a quadro: o atual e o anterior em RGBA
+            _check_memory(2 * _estimate_memory(width, height, "RGBA", None))
+            animation.convert(img, output_path, target_format, options)
+            return
+
+        if img.format == "TIFF" and (pil_format == "PDF" or (pil_format == "TIFF" and getattr(img, "n_frames", 1) > 1)):
+            from converters import tiff_pages
+            if pil_format == "PDF":
+                tiff_pages.to_pdf(img, input_path, output_path, options, _check_page)
+            else:
+                tiff_pages.to_tiff(img, output_path, options, _check_page)
+            return
+
+        if pil_format == "ICO":
+            from converters import ico
+            # Sem redimensionamento pedido, o JPEG já decodifica perto de 256 px
+            _draft(img, options if _resize_plan(img.size, options) else ico.DRAFT_OPTIONS)
+        else:
+            _draft(img, options)
+        width, height = img.size
+        plan = _resize_plan(img.size, options)
+
+        target_mode = None
+        if pil_format in ("JPEG", "BMP", "PDF") and img.mode != "RGB":
+            target_mode = "RGB"
+        estimate = _estimate_memory(width, height, img.mode, target_mode)
+        if plan is not None:
+            estimate += _estimate_memory(*plan[0], img.mode, None)
+        elif estimate > STRIP_THRESHOLD and pil_format in STRIP_FORMATS:
+            from converters import image_strips
+            if image_strips.can_stream(img):
+                image_strips.convert_strips(img, output_path, pil_format, STRIP_BYTES)
+                return
+        _check_memory(estimate)
+
+    img = resize(img, options)
+
+    # Formatos sem alfa: transparência composta sobre o fundo (branco por padrão)
+    background = options.get("background", "#ffffff")
+    if pil_format in ("JPEG", "BMP") and img.mode in ("RGBA", "P", "LA", "PA"):
+        img = to_rgb(img, background)
+    if pil_format == "PDF" and img.mode != "RGB":
+        img = to_rgb(img, background)
 
-    if pil_format in ("JPEG", "BMP") and img.mode in ("RGBA", "P", "LA"):
-        img = img.convert("RGB")
+    if pil_format == "ICO":
+        from converters import ico
+        ico.save(img, output_path)
+        return
 
     save_kwargs: dict = {}
     if pil_format == "JPEG":
         save_kwargs["quality"] = 95
-    if pil_format == "PDF":
-        if img.mode != "RGB":
-            img = img.convert("RGB")
 
     img.save(output_path, format=pil_format, **save_kwargs)
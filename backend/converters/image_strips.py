@@ -0,0 +1,215 @@
+"""Leitura e escrita de imagens em faixas de linhas (strips), com memória limitada.
+
+Fontes com pixels gravados sem compressão (TIFF sem compressão, BMP, PPM/PGM)
+são lidas direto do arquivo, faixa por faixa, a partir da tabela de tiles do
+Pillow — sem decodificar a imagem inteira. As faixas são gravadas em PNG
+(zlib incremental, filtro Sub) ou TIFF (strips com Deflate). O pico de
+memória é proporcional ao tamanho da faixa, não ao da imagem.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+# rawmode do Pillow → (modo de saída, bytes por pixel no arquivo, ordem dos canais)
+RAW_MODES = {
+    "L":    ("L", 1, None),
+    "RGB":  ("RGB", 3, None),
+    "RGBA": ("RGBA", 4, None),
+    "RGBX": ("RGB", 4, [0, 1, 2]),
+    "BGR":  ("RGB", 3, [2, 1, 0]),
+    "BGRX": ("RGB", 4, [2, 1, 0]),
+    "BGRA": ("RGBA", 4, [2, 1, 0, 3]),
+}
+MODE_BANDS = {"L": 1, "RGB": 3, "RGBA": 4}
+
+
+def _raw_tiles(img) -> list[tuple[int, int, int, int, int, str]] | None:
+    """(y0, y1, offset, stride, orientation, rawmode) de cada tile, se a imagem for legível por faixas."""
+    width = img.size[0]
+    tiles = []
+    for tile in img.tile:
+        codec, extents, offset, args = tile[0], tile[1], tile[2], tile[3]
+        if codec != "raw":
+            return None
+        x0, y0, x1, y1 = extents
+        if x0 != 0 or x1 != width:
+            return None
+        if isinstance(args, str):
+            rawmode, stride, orientation = args, 0, 1
+        else:
+            rawmode = args[0]
+            stride = args[1] if len(args) > 1 else 0
+            orientation = args[2] if len(args) > 2 else 1
+        if rawmode not in RAW_MODES or RAW_MODES[rawmode][0] != img.mode:
+            return None
+        bpp = RAW_MODES[rawmode][1]
+        tiles.append((y0, y1, offset, stride or width * bpp, orientation, rawmode))
+    return sorted(tiles) or None
+
+
+def can_stream(img) -> bool:
+    return img.mode in MODE_BANDS and _raw_tiles(img) is not None
+
+
+def iter_strips(img, rows_per_strip: int):
+    """Gera arrays uint8 (linhas, largura[, canais]) cobrindo a imagem de cima para baixo."""
+    width = img.size[0]
+    tiles = _raw_tiles(img)
+    with open(img.filename, "rb") as f:
+        for y0, y1, offset, stride, orientation, rawmode in tiles:
+            _, bpp, order = RAW_MODES[rawmode]
+            for a in range(y0, y1, rows_per_strip):
+                b = min(a + rows_per_strip, y1)
+                n = b - a
+                if orientation < 0:
+                    # Linhas gravadas de baixo para cima (BMP)
+                    f.seek(offset + (y1 - b) * stride)
+                else:
+                    f.seek(offset + (a - y0) * stride)
+                buf = np.frombuffer(f.read(n * stride), dtype=np.uint8)
+                if buf.size != n * stride:
+                    raise ValueError("Arquivo de imagem truncado")
+                rows = buf.reshape(n, stride)[:, :width * bpp].reshape(n, width, bpp)
+                if orientation < 0:
+                    rows = rows[::-1]
+                if order is not None:
+                    rows = rows[:, :, order]
+                if rows.shape[2] == 1:
+                    rows = rows[:, :, 0]
+                yield np.ascontiguousarray(rows)
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+class PngStripWriter:
+    """PNG de 8 bits gravado faixa a faixa."""
+
+    COLOR_TYPES = {"L": 0, "RGB": 2, "RGBA": 6}
+
+    def __init__(self, path: str, width: int, height: int, mode: str, level: int = 6):
+        self.f = open(path, "wb")
+        self.bpp = MODE_BANDS[mode]
+        self.width = width
+        self.rows_left = height
+        self.z = zlib.compressobj(level)
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self.f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, self.COLOR_TYPES[mode], 0, 0, 0)))
+
+    def write(self, rows: np.ndarray) -> None:
+        n = rows.shape[0]
+        raw = rows.reshape(n, self.width * self.bpp)
+        # Filtro Sub: cada byte menos o byte correspondente do pixel à esquerda (mod 256)
+        filtered = np.empty((n, raw.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:1 + self.bpp] = raw[:, :self.bpp]
+        np.subtract(raw[:, self.bpp:], raw[:, :-self.bpp], out=filtered[:, 1 + self.bpp:])
+        data = self.z.compress(filtered.tobytes())
+        if data:
+            self.f.write(_png_chunk(b"IDAT", data))
+        self.rows_left -= n
+
+    def close(self) -> None:
+        if self.rows_left:
+            raise ValueError("PNG incompleto: faltam linhas")
+        self.f.write(_png_chunk(b"IDAT", self.z.flush()))
+        self.f.write(_png_chunk(b"IEND", b""))
+        self.f.close()
+
+
+class TiffStripWriter:
+    """TIFF clássico (little-endian) com uma strip Deflate por faixa."""
+
+    def __init__(self, path: str, width: int, height: int, mode: str, rows_per_strip: int):
+        self.f = open(path, "wb")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_per_strip = rows_per_strip
+        self.offsets: list[int] = []
+        self.counts: list[int] = []
+        self._pending: list[np.ndarray] = []
+        self._pending_rows = 0
+        # Cabeçalho; o offset do IFD é preenchido no close()
+        self.f.write(b"II*\x00\x00\x00\x00\x00")
+
+    def write(self, rows: np.ndarray) -> None:
+        # As faixas do leitor podem não coincidir com RowsPerStrip: reagrupa
+        self._pending.append(rows)
+        self._pending_rows += rows.shape[0]
+        while self._pending_rows >= self.rows_per_strip:
+            block = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+            self._write_strip(block[:self.rows_per_strip])
+            rest = block[self.rows_per_strip:]
+            self._pending = [rest] if rest.shape[0] else []
+            self._pending_rows = rest.shape[0]
+
+    def _write_strip(self, rows: np.ndarray) -> None:
+        data = zlib.compress(rows.tobytes(), 6)
+        offset = self.f.tell()
+        if offset + len(data) > 0xFFFFFFFF:
+            raise ValueError("Saída TIFF passaria de 4 GB (BigTIFF não suportado)")
+        self.offsets.append(offset)
+        self.counts.append(len(data))
+        self.f.write(data)
+
+    def close(self) -> None:
+        if self._pending_rows:
+            self._write_strip(np.concatenate(self._pending))
+        bands = MODE_BANDS[self.mode]
+        entries = [
+            (256, 4, [self.width]),                                  # ImageWidth
+            (257, 4, [self.height]),                                 # ImageLength
+            (258, 3, [8] * bands),                                   # BitsPerSample
+            (259, 3, [8]),                                           # Compression: Deflate
+            (262, 3, [1 if self.mode == "L" else 2]),                # Photometric
+            (273, 4, self.offsets),                                  # StripOffsets
+            (277, 3, [bands]),                                       # SamplesPerPixel
+            (278, 4, [self.rows_per_strip]),                         # RowsPerStrip
+            (279, 4, self.counts),                                   # StripByteCounts
+            (284, 3, [1]),                                           # PlanarConfiguration
+        ]
+        if self.mode == "RGBA":
+            entries.append((338, 3, [2]))                            # ExtraSamples: alfa
+
+        if self.f.tell() % 2:
+            self.f.write(b"\x00")
+        ifd_offset = self.f.tell()
+        data_offset = ifd_offset + 2 + 12 * len(entries) + 4
+        ifd = struct.pack("<H", len(entries))
+        extra = b""
+        for tag, typ, values in entries:
+            fmt = "<%d%s" % (len(values), "H" if typ == 3 else "I")
+            packed = struct.pack(fmt, *values)
+            if len(packed) <= 4:
+                ifd += struct.pack("<HHI", tag, typ, len(values)) + packed.ljust(4, b"\x00")
+            else:
+                ifd += struct.pack("<HHII", tag, typ, len(values), data_offset + len(extra))
+                extra += packed
+                if len(extra) % 2:
+                    extra += b"\x00"
+        ifd += b"\x00\x00\x00\x00"
+        self.f.write(ifd + extra)
+        self.f.seek(4)
+        self.f.write(struct.pack("<I", ifd_offset))
+        self.f.close()
+
+
+def convert_strips(img, output_path: str, pil_format: str, strip_bytes: int) -> None:
+    """Converte `img` (aberta pelo Pillow, sem load()) para PNG/TIFF faixa a faixa."""
+    width, height = img.size
+    rows_per_strip = max(1, strip_bytes // max(1, width * MODE_BANDS[img.mode]))
+    if pil_format == "PNG":
+        writer = PngStripWriter(output_path, width, height, img.mode)
+    else:
+        writer = TiffStripWriter(output_path, width, height, img.mode, rows_per_strip)
+    try:
+        for rows in iter_strips(img, rows_per_strip):
+            writer.write(rows)
+    except BaseException:
+        # close() validaria um arquivo incompleto e mascararia o erro real
+        writer.f.close()
+        raise
+    writer.close()
@@ -0,0 +1,217 @@
+"""Operações em JPEG sem decodificar nem recomprimir.
+
+- JPEG → PDF: os bytes do JPEG entram no PDF como estão (`/DCTDecode`); a
+  orientação EXIF vira a matriz de desenho da página.
+- JPEG → JPEG: remove metadados (EXIF, XMP, IPTC, comentários, miniaturas)
+  reescrevendo só os segmentos do cabeçalho. A rotação EXIF é aplicada no
+  domínio DCT com `jpegtran -perfect` quando ele está instalado; sem ele (ou
+  se a imagem não tiver blocos inteiros), o arquivo sai com um EXIF mínimo
+  contendo só a orientação.
+
+Os dados comprimidos depois do SOS são copiados em blocos, sem ler o arquivo
+inteiro para a memória. Se o JPEG não puder ser tratado assim (12 bits,
+codificação aritmética, corrompido), `convert` retorna False e o chamador
+segue pelo caminho do Pillow.
+"""
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+
+from converters.pdf_writer import PdfImageWriter
+
+COPY_BLOCK = 1024 * 1024
+
+# SOF baseline, estendido e progressivo (Huffman): os que leitores de PDF aceitam
+SOF_MARKERS = {0xC0, 0xC1, 0xC2}
+# Outros SOF (lossless, aritmético…): fora do caminho sem perdas
+OTHER_SOF = {0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Orientação EXIF → argumentos do jpegtran
+JPEGTRAN_ARGS = {
+    2: ["-flip", "horizontal"],
+    3: ["-rotate", "180"],
+    4: ["-flip", "vertical"],
+    5: ["-transpose"],
+    6: ["-rotate", "90"],
+    7: ["-transverse"],
+    8: ["-rotate", "270"],
+}
+
+
+class NotLossless(Exception):
+    """O JPEG não pode ser tratado sem recomprimir."""
+
+
+def read_header(f) -> tuple[list[tuple[int, bytes]], int]:
+    """Lê os segmentos até o SOS. Retorna `[(marcador, conteúdo)]` e o offset do SOS."""
+    if f.read(2) != b"\xff\xd8":
+        raise NotLossless("não é JPEG")
+    segments = []
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            raise NotLossless("segmento inválido")
+        marker = f.read(1)
+        while marker == b"\xff":  # bytes de preenchimento
+            marker = f.read(1)
+        if not marker:
+            raise NotLossless("JPEG sem dados de imagem")
+        marker = marker[0]
+        if marker == 0xDA:
+            return segments, f.tell() - 2
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            continue
+        raw_length = f.read(2)
+        if len(raw_length) < 2:
+            raise NotLossless("JPEG truncado")
+        length = struct.unpack(">H", raw_length)[0]
+        payload = f.read(length - 2)
+        if len(payload) < length - 2:
+            raise NotLossless("JPEG truncado")
+        segments.append((marker, payload))
+
+
+def frame_info(segments) -> tuple[int, int, int]:
+    """(largura, altura, componentes) do SOF."""
+    for marker, payload in segments:
+        if marker in OTHER_SOF:
+            raise NotLossless("codificação não suportada em PDF")
+        if marker in SOF_MARKERS:
+            precision, height, width, components = struct.unpack(">BHHB", payload[:6])
+            if precision != 8 or components not in (1, 3, 4) or not width or not height:
+                raise NotLossless("formato de quadro não suportado")
+            return width, height, components
+    raise NotLossless("JPEG sem SOF")
+
+
+def exif_orientation(segments) -> int:
+    for marker, payload in segments:
+        if marker != 0xE1 or not payload.startswith(b"Exif\x00\x00"):
+            continue
+        tiff = payload[6:]
+        try:
+            order = {b"II": "<", b"MM": ">"}[tiff[:2]]
+            ifd = struct.unpack(order + "I", tiff[4:8])[0]
+            count = struct.unpack(order + "H", tiff[ifd:ifd + 2])[0]
+            for i in range(count):
+                entry = tiff[ifd + 2 + 12 * i: ifd + 14 + 12 * i]
+                tag, typ = struct.unpack(order + "HH", entry[:4])
+                if tag == 0x0112 and typ == 3:
+                    value = struct.unpack(order + "H", entry[8:10])[0]
+                    return value if 1 <= value <= 8 else 1
+        except (KeyError, struct.error):
+            return 1
+    return 1
+
+
+def _is_kept(marker: int, payload: bytes) -> bool:
+    """Segmentos que sobrevivem à remoção de metadados."""
+    if marker == 0xE0:
+        return payload.startswith(b"JFIF\x00")
+    if marker == 0xE2:
+        return payload.startswith(b"ICC_PROFILE\x00")
+    if marker == 0xEE:
+        # APP14 Adobe define a transformação de cor (YCCK/CMYK): necessário para decodificar
+        return payload.startswith(b"Adobe")
+    # Demais APPn e comentários (COM) são metadados; tabelas e quadro ficam
+    return not (0xE0 <= marker <= 0xEF or marker == 0xFE)
+
+
+def _orientation_exif(orientation: int) -> bytes:
+    tiff = b"MM\x00*" + struct.pack(">IH", 8, 1) + struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0)
+    return b"Exif\x00\x00" + tiff + struct.pack(">I", 0)
+
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    return bytes((0xFF, marker)) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _copy_from(path: str, offset: int):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while block := f.read(COPY_BLOCK):
+            yield block
+
+
+def _jpegtran(input_path: str, orientation: int) -> str | None:
+    """Aplica a orientação no domínio DCT. Retorna o arquivo temporário gerado, ou None."""
+    jpegtran = shutil.which("jpegtran")
+    if not jpegtran or orientation not in JPEGTRAN_ARGS:
+        return None
+    fd, tmp = tempfile.mkstemp(suffix=".jpg", dir=os.path.dirname(input_path))
+    os.close(fd)
+    # -perfect: falha em vez de cortar blocos parciais da borda
+    cmd = [jpegtran, "-copy", "none", "-perfect", *JPEGTRAN_ARGS[orientation], "-outfile", tmp, input_path]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        os.remove(tmp)
+        return None
+    return tmp
+
+
+def to_jpeg(input_path: str, output_path: str) -> None:
+    """Remove metadados e aplica a orientação EXIF sem recomprimir."""
+    with open(input_path, "rb") as f:
+        segments, sos = read_header(f)
+    frame_info(segments)
+    orientation = exif_orientation(segments)
+
+    source = input_path
+    icc = []
+    rotated = _jpegtran(input_path, orientation) if orientation != 1 else None
+    try:
+        if rotated:
+            # jpegtran -copy none descarta o perfil ICC: volta o do original
+            icc = [(m, p) for m, p in segments if m == 0xE2 and p.startswith(b"ICC_PROFILE\x00")]
+            source = rotated
+            orientation = 1
+            with open(rotated, "rb") as f:
+                segments, sos = read_header(f)
+
+        kept = [(m, p) for m, p in segments if _is_kept(m, p)]
+        # JFIF (e o EXIF de orientação) logo após o SOI; o resto na ordem original
+        head = [(m, p) for m, p in kept if m == 0xE0]
+        rest = [(m, p) for m, p in kept if m != 0xE0]
+        if orientation != 1:
+            head.append((0xE1, _orientation_exif(orientation)))
+        with open(output_path, "wb") as out:
+            out.write(b"\xff\xd8")
+            for marker, payload in head + icc + rest:
+                out.write(_segment(marker, payload))
+            for block in _copy_from(source, sos):
+                out.write(block)
+    finally:
+        if rotated:
+            os.remove(rotated)
+
+
+def to_pdf(input_path: str, output_path: str) -> None:
+    """Embute o JPEG numa página de PDF do tamanho da imagem (72 dpi)."""
+    with open(input_path, "rb") as f:
+        segments, _ = read_header(f)
+    width, height, components = frame_info(segments)
+    orientation = exif_orientation(segments)
+    decode = None
+    if components == 4 and any(m == 0xEE and p.startswith(b"Adobe") for m, p in segments):
+        # CMYK do Photoshop é gravado invertido
+        decode = [1, 0] * 4
+    writer = PdfImageWriter(output_path)
+    writer.add_image_page(
+        width, height, _copy_from(input_path, 0), components=components, decode=decode,
+        orientation=orientation,
+    )
+    writer.close()
+
+
+def convert(input_path: str, output_path: str, pil_format: str) -> bool:
+    """Converte sem perdas para JPEG ou PDF. Retorna False se o arquivo não permitir."""
+    try:
+        if pil_format == "PDF":
+            to_pdf(input_path, output_path)
+        else:
+            to_jpeg(input_path, output_path)
+    except NotLossless:
+        return False
+    return True
@@ -1,48 +1,242 @@
-"""Conversor de imagens médicas DICOM → PNG/JPG/TIFF via pydicom + Pillow."""
-from pathlib import Path
+"""Conversor de imagens médicas DICOM → PNG/JPG/TIFF, ZIP de PNGs ou MP4 via pydicom + Pillow.
+
+Os quadros são decodificados um por vez (`pydicom.pixels.iter_pixels` lê os
+dados de pixel do arquivo sob demanda): um estudo multiquadro inteiro nunca
+fica em memória. Saídas:
+
+- PNG/JPG/TIFF: um quadro (`frame`, padrão 0).
+- ZIP: todos os quadros como PNG (`frame_0001.png`…).
+- MP4: cine loop com todos os quadros (FFmpeg por pipe); `fps` ou, na falta,
+  Cine Rate / Frame Time do arquivo.
+
+Tons de cinza passam por uma tabela (LUT) valor armazenado → uint8 calculada
+uma vez por arquivo, que junta o rescale (slope/intercept, ou Modality LUT),
+a janela VOI (Window Center/Width, VOI LUT Sequence ou `window_center`/
+`window_width`) e a inversão de MONOCHROME1. Sem janela no arquivo, a faixa
+de valores de todos os quadros vira a janela.
+"""
+import io
+import zipfile
+
 import numpy as np
 
+PILLOW_FORMAT_MAP = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "tiff": "TIFF"}
+DEFAULT_FPS = 10
+MAX_FPS = 60
 
-def convert(input_path: str, output_path: str, target_format: str) -> None:
-    try:
-        import pydicom
-    except ImportError:
-        raise RuntimeError("Instale: pip install pydicom")
 
-    from PIL import Image
+def validate_options(options: dict) -> dict:
+    """Normaliza as opções da conversão; ValueError se alguma for inválida."""
+    clean: dict = {}
+    for key, value in options.items():
+        if key == "frame":
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError("frame deve ser um inteiro a partir de 0")
+            clean[key] = value
+        elif key in ("window_center", "window_width"):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key} deve ser um número")
+            if key == "window_width" and value < 1:
+                raise ValueError("window_width deve ser pelo menos 1")
+            clean[key] = float(value)
+        elif key == "fps":
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= MAX_FPS:
+                raise ValueError(f"fps deve ser um número entre 0 e {MAX_FPS}")
+            clean[key] = value
+        else:
+            raise ValueError(f"Opção desconhecida: {key}")
+    if ("window_center" in clean) != ("window_width" in clean):
+        raise ValueError("window_center e window_width devem ser informados juntos")
+    return clean
 
-    target_format = target_format.lower()
 
-    ds = pydicom.dcmread(input_path)
-    pixel_array = ds.pixel_array
+def _first(value) -> float:
+    """Primeiro valor de um elemento que pode ter multiplicidade (ex.: várias janelas)."""
+    from pydicom.multival import MultiValue
 
-    # Normalizar para 8-bit
-    pmin, pmax = pixel_array.min(), pixel_array.max()
-    if pmax > pmin:
-        normalized = ((pixel_array - pmin) / (pmax - pmin) * 255).astype(np.uint8)
-    else:
-        normalized = np.zeros_like(pixel_array, dtype=np.uint8)
-
-    # Lidar com imagens RGB vs grayscale
-    if normalized.ndim == 2:
-        img = Image.fromarray(normalized, mode="L")
-    elif normalized.ndim == 3 and normalized.shape[2] == 3:
-        img = Image.fromarray(normalized, mode="RGB")
-    elif normalized.ndim == 3 and normalized.shape[2] == 4:
-        img = Image.fromarray(normalized, mode="RGBA")
+    if isinstance(value, (MultiValue, list, tuple)):
+        value = value[0]
+    return float(value)
+
+
+def _window(values: np.ndarray, center: float, width: float) -> np.ndarray:
+    """Função VOI LINEAR do DICOM (PS3.3 C.11.2.1.2) → float em 0..1."""
+    if width <= 1:
+        return (values > center - 0.5).astype(np.float64)
+    out = (values - (center - 0.5)) / (width - 1) + 0.5
+    return np.clip(out, 0.0, 1.0, out=out)
+
+
+def _stored_range(ds, itemsize: int) -> np.ndarray:
+    """Todos os valores possíveis de um pixel, na ordem do índice sem sinal da LUT."""
+    index = np.arange(1 << (8 * itemsize), dtype=np.int64)
+    if ds.get("PixelRepresentation", 0) == 1:
+        # O índice é a visão sem sinal do inteiro com sinal: reinterpreta
+        half = 1 << (8 * itemsize - 1)
+        index = np.where(index >= half, index - (half << 1), index)
+    return index
+
+
+def _has_window(ds, options: dict) -> bool:
+    return ("window_center" in options or "VOILUTSequence" in ds
+            or ("WindowCenter" in ds and "WindowWidth" in ds))
+
+
+def _map_values(values: np.ndarray, ds, options: dict, data_range: tuple[float, float] | None) -> np.ndarray:
+    """Valores já com rescale → 0..1, pela janela VOI e pela fotometria."""
+    from pydicom.pixels import apply_voi_lut
+
+    if "window_center" in options:
+        mapped = _window(values, options["window_center"], options["window_width"])
+    elif "VOILUTSequence" in ds:
+        voi = apply_voi_lut(np.rint(values).astype(np.int64), ds).astype(np.float64, copy=False)
+        low, high = float(voi.min()), float(voi.max())
+        mapped = (voi - low) / (high - low) if high > low else np.zeros_like(voi)
+    elif "WindowCenter" in ds and "WindowWidth" in ds:
+        mapped = _window(values, _first(ds.WindowCenter), _first(ds.WindowWidth))
     else:
-        img = Image.fromarray(normalized)
+        low, high = data_range
+        mapped = _window(values, (low + high) / 2, high - low + 1)
+
+    if ds.get("PhotometricInterpretation") == "MONOCHROME1":
+        mapped = 1.0 - mapped
+    return mapped
+
+
+def _data_range(ds, input_path: str, frames) -> tuple[float, float]:
+    """Menor e maior valor (já com rescale) nos quadros usados, numa passada extra."""
+    from pydicom.pixels import apply_modality_lut, iter_pixels
+
+    low, high = np.inf, -np.inf
+    for arr in iter_pixels(input_path, indices=frames):
+        low = min(low, arr.min())
+        high = max(high, arr.max())
+    ends = apply_modality_lut(np.array([low, high]), ds)
+    return float(ends.min()), float(ends.max())
+
 
-    fmt_map = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "tiff": "TIFF"}
-    pil_format = fmt_map.get(target_format)
-    if pil_format is None:
+class _Renderer:
+    """Converte quadros decodificados em imagens de 8 bits do Pillow."""
+
+    def __init__(self, ds, input_path: str, options: dict, frames):
+        self.ds = ds
+        self.options = options
+        self.input_path = input_path
+        self.frames = frames
+        self.color = ds.get("SamplesPerPixel", 1) > 1
+        self.palette = ds.get("PhotometricInterpretation") == "PALETTE COLOR"
+        self.bits = ds.get("BitsStored", 8)
+        self.data_range = None
+        self.lut = None
+
+    def _range(self):
+        if self.data_range is None and not _has_window(self.ds, self.options):
+            self.data_range = _data_range(self.ds, self.input_path, self.frames)
+        return self.data_range
+
+    def _lut(self, itemsize: int) -> np.ndarray:
+        """LUT uint8 indexada pelo valor armazenado visto como inteiro sem sinal."""
+        from pydicom.pixels import apply_modality_lut
+
+        if self.lut is None:
+            stored = _stored_range(self.ds, itemsize)
+            values = apply_modality_lut(stored, self.ds).astype(np.float64, copy=False)
+            mapped = _map_values(values, self.ds, self.options, self._range())
+            self.lut = np.rint(mapped * 255).astype(np.uint8)
+        return self.lut
+
+    def render(self, arr: np.ndarray):
+        from PIL import Image
+        from pydicom.pixels import apply_color_lut, apply_modality_lut
+
+        if self.palette:
+            # Paleta de 16 bits por canal → 8 bits
+            rgb = apply_color_lut(arr, self.ds)
+            if rgb.dtype != np.uint8:
+                rgb = (rgb >> 8).astype(np.uint8)
+            return Image.fromarray(rgb, "RGB")
+        if self.color:
+            if arr.dtype != np.uint8:
+                arr = (arr >> max(0, self.bits - 8)).astype(np.uint8)
+            return Image.fromarray(arr, "RGBA" if arr.shape[2] == 4 else "RGB")
+        if arr.dtype.itemsize > 2:
+            # 32 bits: LUT inviável (4 G entradas); mapeamento direto no quadro
+            values = apply_modality_lut(arr, self.ds).astype(np.float64, copy=False)
+            mapped = _map_values(values, self.ds, self.options, self._range())
+            return Image.fromarray(np.rint(mapped * 255).astype(np.uint8), "L")
+        lut = self._lut(arr.dtype.itemsize)
+        # Índice pela visão sem sinal, na ordem de bytes do próprio array (Big Endian
+        # explícito vem como `>i2`): sem cópia intermediária do quadro
+        return Image.fromarray(lut[arr.view(arr.dtype.byteorder.replace("|", "=") + f"u{arr.dtype.itemsize}")], "L")
+
+
+def _cine_fps(ds) -> float:
+    if ds.get("CineRate"):
+        return min(float(ds.CineRate), MAX_FPS)
+    if ds.get("FrameTime"):
+        return min(1000.0 / float(ds.FrameTime), MAX_FPS)
+    return DEFAULT_FPS
+
+
+def _to_zip(frames, output_path: str) -> None:
+    # PNG já é comprimido: ZIP sem recompressão
+    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as zf:
+        for index, img in enumerate(frames, 1):
+            buf = io.BytesIO()
+            img.save(buf, format="PNG")
+            zf.writestr(f"frame_{index:04d}.png", buf.getvalue())
+
+
+def _to_mp4(frames, output_path: str, fps: float) -> None:
+    from converters.ffmpeg_pipe import FfmpegPipe
+
+    pipe = None
+    try:
+        for img in frames:
+            if pipe is None:
+                pipe = FfmpegPipe(output_path, img.size, fps)
+            pipe.write(img.convert("RGB").tobytes())
+    except BaseException:
+        if pipe is not None:
+            pipe.abort()
+        raise
+    pipe.close()
+
+
+def convert(input_path: str, output_path: str, target_format: str, options: dict | None = None) -> None:
+    try:
+        import pydicom
+        from pydicom.pixels import iter_pixels, pixel_array
+    except ImportError:
+        raise RuntimeError("Instale: pip install pydicom")
+
+    options = validate_options(options or {})
+    target_format = target_format.lower()
+    pil_format = PILLOW_FORMAT_MAP.get(target_format)
+    if pil_format is None and target_format not in ("zip", "mp4"):
         raise ValueError(f"DICOM não suporta saída: {target_format}")
 
-    if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
-        img = img.convert("RGB")
+    # Só os metadados: os pixels são lidos do arquivo quadro a quadro
+    ds = pydicom.dcmread(input_path, stop_before_pixels=True)
+    n_frames = int(ds.get("NumberOfFrames") or 1)
 
-    save_kwargs: dict = {}
-    if pil_format == "JPEG":
-        save_kwargs["quality"] = 95
+    if pil_format is not None:
+        index = options.get("frame", 0)
+        if index >= n_frames:
+            raise ValueError(f"frame {index} não existe: o arquivo tem {n_frames} quadro(s)")
+        renderer = _Renderer(ds, input_path, options, [index])
+        img = renderer.render(pixel_array(input_path, index=index))
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        save_kwargs: dict = {}
+        if pil_format == "JPEG":
+            save_kwargs["quality"] = 95
+        img.save(output_path, format=pil_format, **save_kwargs)
+        return
 
-    img.save(output_path, format=pil_format, **save_kwargs)
+    renderer = _Renderer(ds, input_path, options, None)
+    frames = (renderer.render(arr) for arr in iter_pixels(input_path))
+    if target_format == "zip":
+        _to_zip(frames, output_path)
+    else:
+        _to_mp4(frames, output_path, options.get("fps") or _cine_fps(ds))
@@ -0,0 +1,254 @@
+"""Leitura e escrita direta de malhas STL/PLY binárias (e OBJ na saída).
+
+Caminho rápido das trocas de formato de `threed.py`: STL e PLY binários são
+lidos como arrays estruturados do numpy mapeados do arquivo (`np.memmap`),
+sem montar um `trimesh.Trimesh` (e seus caches de adjacência), e a malha é
+gravada em blocos de triângulos. A memória fica perto dos arrays de vértices
+e faces; nada de objetos por vértice ou por face.
+
+A fusão de vértices (`merge`) usa um hash de 64 bits das coordenadas,
+fatorado pelo pandas em O(n); colisões do hash são conferidas e, se houver,
+a fusão refaz a conta com `np.unique` exato.
+
+Arquivos fora do caminho rápido (STL ASCII, PLY ASCII, com cores ou outros
+atributos, ou com faces que não são todas triângulos) devolvem None em
+`read()` e seguem pelo trimesh.
+"""
+import numpy as np
+
+# Triângulos por bloco na escrita
+WRITE_CHUNK = 1 << 20
+
+STL_HEADER = 80
+STL_DTYPE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+PLY_ENDIAN = {"binary_little_endian": "<", "binary_big_endian": ">"}
+PLY_FACE_LISTS = ("vertex_indices", "vertex_index")
+# Propriedades de vértice que o caminho rápido pode descartar (normais são recalculadas)
+PLY_VERTEX_PROPS = {"x", "y", "z", "nx", "ny", "nz"}
+
+# Multiplicadores do hash (constantes de mistura do xxHash64)
+HASH_PRIMES = (np.uint64(0x9E3779B185EBCA87), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0x165667B19E3779F9))
+
+
+class Mesh:
+    """Vértices `(n, 3)` e faces triangulares `(m, 3)`; `faces` None = sopa de triângulos."""
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray | None):
+        self.vertices = vertices
+        self.faces = faces
+
+    @property
+    def triangle_count(self) -> int:
+        return len(self.vertices) // 3 if self.faces is None else len(self.faces)
+
+    def triangles(self, start: int, end: int) -> np.ndarray:
+        """Coordenadas `(k, 3, 3)` dos triângulos `start:end`."""
+        if self.faces is None:
+            return self.vertices[start * 3:end * 3].reshape(-1, 3, 3)
+        return self.vertices[self.faces[start:end]]
+
+    def indexed(self) -> tuple[np.ndarray, np.ndarray]:
+        """Vértices e faces, numerando a sopa sem fundir vértices se preciso."""
+        if self.faces is None:
+            return self.vertices, np.arange(len(self.vertices), dtype=np.int64).reshape(-1, 3)
+        return self.vertices, self.faces
+
+
+def read(path: str, ext: str) -> Mesh | None:
+    """Malha do arquivo, ou None se ele não couber no caminho rápido."""
+    if ext == "stl":
+        return _read_stl(path)
+    if ext == "ply":
+        return _read_ply(path)
+    return None
+
+
+def _read_stl(path: str) -> Mesh | None:
+    with open(path, "rb") as f:
+        f.seek(STL_HEADER)
+        count = f.read(4)
+        f.seek(0, 2)
+        size = f.tell()
+    if len(count) < 4:
+        return None
+    n = int(np.frombuffer(count, "<u4")[0])
+    # STL ASCII (ou truncado): o tamanho não bate com o número de triângulos
+    if n == 0 or size != STL_HEADER + 4 + n * STL_DTYPE.itemsize:
+        return None
+    tris = np.memmap(path, dtype=STL_DTYPE, mode="r", offset=STL_HEADER + 4, shape=(n,))
+    # O campo é uma visão com passo de 50 bytes: uma cópia o torna contíguo
+    vertices = np.ascontiguousarray(tris["vertices"]).reshape(-1, 3)
+    return Mesh(vertices, None)
+
+
+def _ply_header(f) -> tuple[str, list] | None:
+    """Formato e elementos `[nome, quantidade, [(propriedade, tipo, tipo_da_lista)]]`."""
+    if f.readline().strip() != b"ply":
+        return None
+    fmt = None
+    elements: list = []
+    while True:
+        line = f.readline()
+        if not line:
+            return None
+        words = line.decode("ascii", "replace").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            return fmt, elements
+        if words[0] == "format" and len(words) >= 2:
+            fmt = words[1]
+        elif words[0] == "element" and len(words) == 3:
+            elements.append([words[1], int(words[2]), []])
+        elif words[0] == "property" and elements:
+            if words[1] == "list" and len(words) == 5:
+                elements[-1][2].append((words[4], words[3], words[2]))
+            elif len(words) == 3:
+                elements[-1][2].append((words[2], words[1], None))
+            else:
+                return None
+        else:
+            return None
+
+
+def _read_ply(path: str) -> Mesh | None:
+    with open(path, "rb") as f:
+        header = _ply_header(f)
+        offset = f.tell()
+    if header is None or header[0] not in PLY_ENDIAN:
+        return None
+    fmt, elements = header
+    endian = PLY_ENDIAN[fmt]
+
+    vertices = faces = None
+    for name, count, props in elements:
+        if name == "face":
+            # Só faces de triângulos com a lista de índices como única propriedade
+            if len(props) != 1 or props[0][0] not in PLY_FACE_LISTS:
+                return None
+            _, item, length = props[0]
+            if length not in PLY_TYPES or item not in PLY_TYPES or PLY_TYPES[item][0] == "f":
+                return None
+            dtype = np.dtype([("n", endian + PLY_TYPES[length]), ("i", endian + PLY_TYPES[item], (3,))])
+            data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,)) if count else None
+            if data is not None and not (data["n"] == 3).all():
+                return None
+            faces = np.empty((0, 3), np.int64) if data is None else data["i"].astype(np.int64)
+        else:
+            # Elementos com listas têm tamanho variável: sem como pular sem ler
+            if any(p[2] is not None or p[1] not in PLY_TYPES for p in props):
+                return None
+            dtype = np.dtype([(p[0], endian + PLY_TYPES[p[1]]) for p in props])
+            if name == "vertex":
+                # Cores e outros atributos ficam para o trimesh, que os preserva
+                if not {"x", "y", "z"} <= dtype.fields.keys() <= PLY_VERTEX_PROPS:
+                    return None
+                # Coordenadas double também: o caminho rápido grava float
+                if any(dtype[key].kind != "f" or dtype[key].itemsize != 4 for key in "xyz"):
+                    return None
+                data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,)) if count else None
+                vertices = np.empty((count, 3), np.float32)
+                if data is not None:
+                    for axis, key in enumerate("xyz"):
+                        vertices[:, axis] = data[key]
+        offset += count * dtype.itemsize
+
+    if vertices is None or faces is None or not len(faces):
+        return None
+    if faces.min() < 0 or faces.max() >= len(vertices):
+        raise ValueError("PLY com índice de vértice fora do intervalo")
+    return Mesh(vertices, faces)
+
+
+def merge(mesh: Mesh) -> Mesh:
+    """Funde vértices de coordenadas idênticas (e numera a sopa de um STL)."""
+    import pandas as pd
+
+    vertices, faces = mesh.indexed()
+    # +0.0 iguala -0.0 a 0.0 antes de comparar os bits
+    coords = np.ascontiguousarray(vertices, dtype=np.float32) + np.float32(0.0)
+    bits = coords.view(np.uint32).astype(np.uint64)
+    key = bits[:, 0] * HASH_PRIMES[0]
+    key ^= bits[:, 1] * HASH_PRIMES[1]
+    key ^= bits[:, 2] * HASH_PRIMES[2]
+    del bits
+    codes, _ = pd.factorize(key)
+    del key
+    # Primeira ocorrência de cada código: os vértices mantêm a ordem de aparição
+    # (o factorize numera na ordem de aparição, então o código i é o i-ésimo único)
+    first = np.unique(codes, return_index=True)[1]
+    merged = coords[first]
+    if not np.array_equal(merged[codes], coords):
+        # Colisão do hash: fusão exata, mais lenta
+        merged, codes = np.unique(coords, axis=0, return_inverse=True)
+    return Mesh(merged, codes.reshape(-1)[faces])
+
+
+def _normals(tris: np.ndarray) -> np.ndarray:
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, length, out=normals, where=length > 0)
+    return normals
+
+
+def write_stl(mesh: Mesh, output_path: str) -> None:
+    n = mesh.triangle_count
+    with open(output_path, "wb") as f:
+        f.write(b"convertudo".ljust(STL_HEADER, b"\0"))
+        f.write(np.uint32(n).tobytes())
+        block = np.zeros(min(n, WRITE_CHUNK), dtype=STL_DTYPE)
+        for start in range(0, n, WRITE_CHUNK):
+            tris = mesh.triangles(start, min(start + WRITE_CHUNK, n))
+            out = block[:len(tris)]
+            out["vertices"] = tris
+            out["normal"] = _normals(tris)
+            out.tofile(f)
+
+
+def write_ply(mesh: Mesh, output_path: str) -> None:
+    vertices, faces = mesh.indexed()
+    header = (
+        "ply\nformat binary_little_endian 1.0\ncomment convertudo\n"
+        f"element vertex {len(vertices)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        f"element face {len(faces)}\n"
+        "property list uchar int vertex_indices\nend_header\n"
+    )
+    face_dtype = np.dtype([("n", "u1"), ("i", "<i4", (3,))])
+    with open(output_path, "wb") as f:
+        f.write(header.encode("ascii"))
+        np.ascontiguousarray(vertices, dtype="<f4").tofile(f)
+        block = np.full(min(len(faces), WRITE_CHUNK), 3, dtype=face_dtype)
+        for start in range(0, len(faces), WRITE_CHUNK):
+            chunk = faces[start:start + WRITE_CHUNK]
+            out = block[:len(chunk)]
+            out["i"] = chunk
+            out.tofile(f)
+
+
+def write_obj(mesh: Mesh, output_path: str) -> None:
+    vertices, faces = mesh.indexed()
+    with open(output_path, "w", encoding="ascii", newline="\n") as f:
+        f.write("# convertudo\n")
+        _write_rows(f, "v %.8g %.8g %.8g\n", vertices)
+        # OBJ numera os vértices a partir de 1
+        _write_rows(f, "f %d %d %d\n", faces, 1)
+
+
+def _write_rows(f, line: str, rows: np.ndarray, add: int = 0) -> None:
+    """Formata blocos de linhas com um único `%` por bloco (bem mais rápido que linha a linha)."""
+    for start in range(0, len(rows), WRITE_CHUNK):
+        chunk = rows[start:start + WRITE_CHUNK]
+        if add:
+            chunk = chunk + add
+        f.write((line * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+WRITERS = {"stl": write_stl, "ply": write_ply, "obj": write_obj}
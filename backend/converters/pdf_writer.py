@@ -0,0 +1,102 @@
+"""Escritor mínimo de PDF com uma imagem por página, gravado em fluxo.
+
+Os dados da imagem entram no PDF como já estão (JPEG com `/DCTDecode`, Deflate
+com `/FlateDecode`…), em pedaços: nada é decodificado nem recomprimido e a
+memória não depende do tamanho do arquivo.
+"""
+
+COLORSPACES = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}
+
+
+def _orientation_matrix(orientation: int, w: float, h: float) -> tuple:
+    """Matriz de desenho (a b c d e f) que exibe a imagem w×h pt na orientação EXIF."""
+    return {
+        1: (w, 0, 0, h, 0, 0),
+        2: (-w, 0, 0, h, w, 0),
+        3: (-w, 0, 0, -h, w, h),
+        4: (w, 0, 0, -h, 0, h),
+        5: (0, -w, -h, 0, h, w),
+        6: (0, -w, h, 0, 0, w),
+        7: (0, w, h, 0, 0, 0),
+        8: (0, w, -h, 0, h, 0),
+    }[orientation]
+
+
+class PdfImageWriter:
+    def __init__(self, path: str):
+        self.f = open(path, "wb")
+        # Objetos 1 e 2 (catálogo e árvore de páginas) são gravados no close()
+        self.offsets: dict[int, int] = {}
+        self.next_obj = 3
+        self.pages: list[int] = []
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _alloc(self) -> int:
+        num = self.next_obj
+        self.next_obj += 1
+        return num
+
+    def _obj(self, num: int, body: bytes) -> None:
+        self.offsets[num] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def add_image_page(self, width: int, height: int, chunks, *, components: int = 3,
+                       bits: int = 8, filter: str | None = "DCTDecode", decode: list | None = None,
+                       decode_parms: str | None = None, dpi: float = 72.0, orientation: int = 1) -> None:
+        """Adiciona uma página do tamanho da imagem com os dados de `chunks` (iterável de bytes).
+
+        `orientation` (1–8, como no EXIF) gira/espelha a imagem na página sem tocar nos dados.
+        """
+        image, length, content, page = self._alloc(), self._alloc(), self._alloc(), self._alloc()
+
+        entries = [
+            b"/Type /XObject /Subtype /Image",
+            b"/Width %d /Height %d" % (width, height),
+            b"/ColorSpace " + COLORSPACES[components].encode(),
+            b"/BitsPerComponent %d" % bits,
+            b"/Length %d 0 R" % length,
+        ]
+        if filter:
+            entries.append(b"/Filter /" + filter.encode())
+        if decode:
+            entries.append(b"/Decode [" + b" ".join(b"%g" % v for v in decode) + b"]")
+        if decode_parms:
+            entries.append(b"/DecodeParms " + decode_parms.encode())
+        self.offsets[image] = self.f.tell()
+        self.f.write(b"%d 0 obj\n<< " % image + b" ".join(entries) + b" >>\nstream\n")
+        start = self.f.tell()
+        for chunk in chunks:
+            self.f.write(chunk)
+        size = self.f.tell() - start
+        self.f.write(b"\nendstream\nendobj\n")
+        self._obj(length, b"%d" % size)
+
+        w_pt = width * 72.0 / dpi
+        h_pt = height * 72.0 / dpi
+        if orientation >= 5:
+            page_w, page_h = h_pt, w_pt
+        else:
+            page_w, page_h = w_pt, h_pt
+        matrix = _orientation_matrix(orientation, w_pt, h_pt)
+        draw = b"q " + b" ".join(b"%.4f" % v for v in matrix) + b" cm /Im0 Do Q"
+        self._obj(content, b"<< /Length %d >>\nstream\n" % len(draw) + draw + b"\nendstream")
+        self._obj(page, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f]"
+            b" /Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+        ) % (page_w, page_h, image, content))
+        self.pages.append(page)
+
+    def close(self) -> None:
+        if not self.pages:
+            self.f.close()
+            raise ValueError("PDF sem páginas")
+        kids = b" ".join(b"%d 0 R" % p for p in self.pages)
+        self._obj(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self.pages))
+        self._obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.f.tell()
+        self.f.write(b"xref\n0 %d\n" % self.next_obj)
+        self.f.write(b"0000000000 65535 f \n")
+        for num in range(1, self.next_obj):
+            self.f.write(b"%010d 00000 n \n" % self.offsets[num])
+        self.f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_obj, xref))
+        self.f.close()
@@ -2,13 +2,13 @@ from typing import Callable
 
 SUPPORTED_CONVERSIONS: dict[str, list[str]] = {
     # --- Imagens raster ---
-    "png":        ["jpg", "webp", "bmp", "gif", "tiff", "ico", "pdf"],
-    "jpg":        ["png", "webp", "bmp", "tiff", "pdf"],
-    "jpeg":       ["png", "webp", "bmp", "tiff", "pdf"],
-    "webp":       ["png", "jpg", "bmp", "pdf"],
-    "gif":        ["png", "jpg", "webp", "mp4"],
+    "png":        ["jpg", "webp", "bmp", "gif", "tiff", "ico", "pdf", "apng"],
+    "jpg":        ["jpg", "png", "webp", "bmp", "tiff", "pdf", "ico"],
+    "jpeg":       ["jpg", "png", "webp", "bmp", "tiff", "pdf", "ico"],
+    "webp":       ["png", "jpg", "bmp", "pdf", "gif", "apng", "mp4"],
+    "gif":        ["png", "jpg", "webp", "mp4", "gif", "apng"],
     "bmp":        ["png", "jpg", "webp"],
-    "tiff":       ["png", "jpg", "pdf"],
+    "tiff":       ["png", "jpg", "pdf", "tiff"],
     "ico":        ["png", "jpg"],
     "heic":       ["jpg", "png", "webp", "tiff"],
     "heif":       ["jpg", "png", "webp", "tiff"],
@@ -38,11 +38,11 @@ SUPPORTED_CONVERSIONS: dict[str, list[str]] = {
     "dxf":        ["svg", "png", "pdf"],
     "gcode":      ["txt"],
     # --- 3D ---
-    "stl":        ["obj", "ply", "gltf", "glb", "3mf"],
-    "obj":        ["stl", "ply", "gltf", "glb", "3mf"],
-    "ply":        ["stl", "obj", "gltf", "glb"],
-    "gltf":       ["glb", "stl", "obj", "ply"],
-    "glb":        ["gltf", "stl", "obj", "ply"],
+    "stl":        ["obj", "ply", "gltf", "glb", "3mf", "zip"],
+    "obj":        ["stl", "ply", "gltf", "glb", "3mf", "zip"],
+    "ply":        ["stl", "obj", "gltf", "glb", "zip"],
+    "gltf":       ["glb", "stl", "obj", "ply", "zip"],
+    "glb":        ["gltf", "stl", "obj", "ply", "zip"],
     "3mf":        ["stl", "obj"],
     "fbx":        ["stl", "obj", "gltf"],
     "off":        ["stl", "obj", "ply"],
@@ -135,7 +135,7 @@ SUPPORTED_CONVERSIONS: dict[str, list[str]] = {
     "ssa":        ["srt", "vtt", "ass"],
     "sbv":        ["srt", "vtt", "ass"],
     # --- Médico ---
-    "dcm":        ["png", "jpg", "tiff"],
+    "dcm":        ["png", "jpg", "tiff", "zip", "mp4"],
     # --- Geoespacial ---
     "geojson":    ["kml", "gpx", "csv"],
     "kml":        ["geojson", "gpx", "csv"],
@@ -187,10 +187,10 @@ SUPPORTED_CONVERSIONS: dict[str, list[str]] = {
     "scala":      ["html", "pdf", "txt", "md"],
     "r":          ["html", "pdf", "txt", "md"],
     # --- Científico ---
-    "fits":       ["png", "csv"],
-    "fit":        ["png", "csv"],
-    "fts":        ["png", "csv"],
-    "nc":         ["json", "csv"],
+    "fits":       ["png", "csv", "parquet"],
+    "fit":        ["png", "csv", "parquet"],
+    "fts":        ["png", "csv", "parquet"],
+    "nc":         ["json", "csv", "parquet"],
     # --- Bioinformática ---
     "fasta":      ["csv", "txt", "fasta"],
     "fa":         ["csv", "txt", "fasta"],
@@ -253,6 +253,7 @@ for _cat, _exts in CATEGORIES.items():
 # Formatos virtuais: o identificador não corresponde à extensão real do arquivo
 VIRTUAL_FORMAT_EXT: dict[str, str] = {
     "qr": "png",
+    "apng": "png",
 }
 
 # Extensões dentro de "Documento" e "Dados" que usam conversor diferente
@@ -1,143 +1,440 @@
-"""Conversor científico: FITS (astronomia) → PNG/CSV; NetCDF → CSV/JSON."""
+"""Conversor científico: FITS (astronomia) → PNG/CSV/Parquet; NetCDF → CSV/Parquet/JSON.
+
+Imagens FITS → PNG são abertas com memmap e sem aplicar BSCALE/BZERO na
+leitura: os limites da escala saem de uma amostra em grade (~1 Mpx) e a
+imagem é escalada e gravada faixa a faixa (`image_strips`), então a memória
+não depende do tamanho da imagem.
+
+Opções de FITS → PNG (campo `options` de `/api/convert`):
+- `stretch`: `linear` (padrão), `asinh`, `log` ou `zscale` (limites pelo
+  algoritmo zscale do IRAF, escala linear).
+- `min_percent`/`max_percent`: percentis da amostra usados como preto e
+  branco (padrão 1 e 99; ignorados com `zscale`).
+
+Tabelas FITS e variáveis NetCDF → CSV/Parquet são lidas coluna a coluna, em
+blocos de CHUNK_ROWS linhas, direto para `RecordBatch`es do Arrow gravados
+em sequência (`pyarrow.csv.CSVWriter` / `ParquetWriter`), sem passar por
+listas Python. No NetCDF, `variables` escolhe as variáveis (padrão: o grupo
+de variáveis de dados com mais dimensões) e `dimensions` recorta dimensões
+(`{"time": [0, 24], "level": 0}`); as coordenadas viram colunas.
+"""
 import json
+import math
+import os
 from pathlib import Path
 
+MB = 1024 * 1024
+
+STRIP_BYTES = int(float(os.environ.get("CONVERTUDO_FITS_STRIP_MB", "8")) * MB)
+# Pixels da amostra usada para calcular percentis/zscale
+SAMPLE_PIXELS = 1_000_000
+
+STRETCHES = ("linear", "asinh", "log", "zscale")
+
+# Linhas por RecordBatch nas exportações tabulares
+CHUNK_ROWS = 100_000
+TABLE_FORMATS = ("csv", "parquet")
+
+
+def validate_options(options: dict) -> dict:
+    """Normaliza as opções da conversão; ValueError se alguma for inválida."""
+    clean: dict = {}
+    for key, value in options.items():
+        if key == "stretch":
+            if value not in STRETCHES:
+                raise ValueError(f"stretch deve ser um de: {', '.join(STRETCHES)}")
+            clean[key] = value
+        elif key == "variables":
+            if (not isinstance(value, list) or not value
+                    or not all(isinstance(v, str) and v for v in value)):
+                raise ValueError("variables deve ser uma lista de nomes de variáveis")
+            clean[key] = list(dict.fromkeys(value))
+        elif key == "dimensions":
+            if not isinstance(value, dict):
+                raise ValueError('dimensions deve ser um objeto {"dimensão": índice ou [início, fim]}')
+            for dim, sel in value.items():
+                if isinstance(sel, int) and not isinstance(sel, bool):
+                    ok = sel >= 0
+                else:
+                    ok = (isinstance(sel, list) and len(sel) == 2
+                          and all(isinstance(v, int) and not isinstance(v, bool) for v in sel)
+                          and 0 <= sel[0] < sel[1])
+                if not ok:
+                    raise ValueError(f"dimensions.{dim} deve ser um índice ou [início, fim] com início < fim")
+            clean[key] = dict(value)
+        elif key in ("min_percent", "max_percent"):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 100:
+                raise ValueError(f"{key} deve ser um número entre 0 e 100")
+            clean[key] = float(value)
+        else:
+            raise ValueError(f"Opção desconhecida: {key}")
+    if clean.get("min_percent", 1.0) >= clean.get("max_percent", 99.0):
+        raise ValueError("min_percent deve ser menor que max_percent")
+    return clean
+
 
-def convert(input_path: str, output_path: str, target_format: str) -> None:
+def convert(input_path: str, output_path: str, target_format: str, options: dict | None = None) -> None:
+    options = validate_options(options or {})
     input_ext = Path(input_path).suffix.lstrip(".").lower()
     target_format = target_format.lower()
 
     if input_ext in ("fits", "fit", "fts"):
-        _fits_convert(input_path, output_path, target_format)
+        _fits_convert(input_path, output_path, target_format, options)
     elif input_ext == "nc":
-        _netcdf_convert(input_path, output_path, target_format)
+        _netcdf_convert(input_path, output_path, target_format, options)
     else:
         raise ValueError(f"Científico não suporta entrada: {input_ext}")
 
 
 # --- FITS ---
 
-def _fits_convert(input_path: str, output_path: str, target_format: str) -> None:
+def _fits_convert(input_path: str, output_path: str, target_format: str, options: dict) -> None:
     try:
         from astropy.io import fits
     except ImportError:
         raise RuntimeError("Instale: pip install astropy")
 
-    with fits.open(input_path) as hdul:
-        if target_format == "png":
-            _fits_to_png(hdul, output_path)
-        elif target_format == "csv":
-            _fits_to_csv(hdul, output_path)
-        else:
-            raise ValueError(f"FITS não suporta saída: {target_format}")
+    if target_format == "png":
+        # Dados crus mapeados do disco; BSCALE/BZERO/BLANK aplicados faixa a faixa
+        with fits.open(input_path, memmap=True, do_not_scale_image_data=True) as hdul:
+            _fits_to_png(hdul, output_path, options)
+    elif target_format in TABLE_FORMATS:
+        with fits.open(input_path, memmap=True, do_not_scale_image_data=True) as hdul:
+            _fits_to_table(hdul, output_path, target_format)
+    else:
+        raise ValueError(f"FITS não suporta saída: {target_format}")
+
+
+def _image_hdu(hdul):
+    """Primeiro HDU de imagem com 2+ eixos, sem ler os dados das tabelas."""
+    for hdu in hdul:
+        if hdu.is_image and hdu.header.get("NAXIS", 0) >= 2 and hdu.data is not None:
+            return hdu
+    raise ValueError("FITS sem dados de imagem")
+
+
+class _Scaler:
+    """Valor cru do FITS → float32 físico (BSCALE/BZERO; BLANK e NaN viram NaN)."""
+
+    def __init__(self, header, dtype):
+        import numpy as np
 
+        self.bscale = float(header.get("BSCALE", 1.0))
+        self.bzero = float(header.get("BZERO", 0.0))
+        blank = header.get("BLANK")
+        self.blank = blank if blank is not None and np.issubdtype(dtype, np.integer) else None
 
-def _fits_to_png(hdul, output_path: str) -> None:
+    def __call__(self, raw, out):
+        import numpy as np
+
+        np.copyto(out, raw, casting="unsafe")
+        if self.bscale != 1.0:
+            out *= self.bscale
+        if self.bzero != 0.0:
+            out += self.bzero
+        if self.blank is not None:
+            out[raw == self.blank] = np.nan
+        return out
+
+
+def _sample(data, scaler):
+    """Amostra em grade (~SAMPLE_PIXELS), só com os valores finitos."""
     import numpy as np
-    from PIL import Image
 
-    # Procurar o primeiro HDU com dados de imagem 2D
-    img_data = None
-    for hdu in hdul:
-        if hasattr(hdu, "data") and hdu.data is not None:
-            if hdu.data.ndim >= 2:
-                img_data = hdu.data
-                break
+    height, width = data.shape
+    step = max(1, math.ceil(math.sqrt(height * width / SAMPLE_PIXELS)))
+    raw = data[::step, ::step]
+    values = scaler(raw, np.empty(raw.shape, dtype=np.float32))
+    return values[np.isfinite(values)]
+
+
+def _limits(sample, options: dict) -> tuple[float, float]:
+    import numpy as np
+
+    if sample.size == 0:
+        return 0.0, 1.0
+    if options.get("stretch") == "zscale":
+        from astropy.visualization import ZScaleInterval
+        return tuple(float(v) for v in ZScaleInterval().get_limits(sample))
+    low, high = np.percentile(sample, [options.get("min_percent", 1.0), options.get("max_percent", 99.0)])
+    return float(low), float(high)
+
 
-    if img_data is None:
-        raise ValueError("FITS sem dados de imagem")
+def _fits_to_png(hdul, output_path: str, options: dict) -> None:
+    import numpy as np
+    from converters.image_strips import PngStripWriter
 
+    hdu = _image_hdu(hdul)
+    data = hdu.data
     # Usar apenas os dois últimos eixos se for cubo (3D+)
-    while img_data.ndim > 2:
-        img_data = img_data[0]
+    while data.ndim > 2:
+        data = data[0]
 
-    img_data = img_data.astype(np.float64)
+    scaler = _Scaler(hdu.header, data.dtype)
+    vmin, vmax = _limits(_sample(data, scaler), options)
+    span = vmax - vmin if vmax > vmin else 1.0
+
+    stretch = None
+    if options.get("stretch") == "asinh":
+        from astropy.visualization import AsinhStretch
+        stretch = AsinhStretch()
+    elif options.get("stretch") == "log":
+        from astropy.visualization import LogStretch
+        stretch = LogStretch()
+
+    height, width = data.shape
+    rows = max(1, STRIP_BYTES // (width * 4))
+    buf = np.empty((rows, width), dtype=np.float32)
+    out = np.empty((rows, width), dtype=np.uint8)
+    writer = PngStripWriter(output_path, width, height, "L")
+    try:
+        for start in range(0, height, rows):
+            n = min(rows, height - start)
+            block = scaler(data[start:start + n], buf[:n])
+            block -= vmin
+            block /= span
+            # NaN (e BLANK) ficam pretos
+            np.nan_to_num(block, copy=False, nan=0.0, posinf=1.0, neginf=0.0)
+            np.clip(block, 0.0, 1.0, out=block)
+            if stretch is not None:
+                stretch(block, clip=True, out=block)
+            block *= 255.0
+            block += 0.5
+            np.copyto(out[:n], block, casting="unsafe")
+            writer.write(out[:n])
+    except BaseException:
+        writer.f.close()
+        raise
+    writer.close()
+
+
+def _fits_table_batches(hdu):
+    import pyarrow as pa
+
+    data = hdu.data
+    names = hdu.columns.names
+    for start in range(0, max(len(data), 1), CHUNK_ROWS):
+        # Fatiar o FITS_rec antes de ler a coluna: TSCAL/TZERO só no bloco
+        chunk = data[start:start + CHUNK_ROWS]
+        arrays, labels = [], []
+        for name in names:
+            values = chunk.field(name)
+            if values.ndim > 1:
+                # Coluna vetorial: uma coluna por elemento
+                flat = values.reshape(len(values), -1)
+                for i in range(flat.shape[1]):
+                    arrays.append(_arrow_column(flat[:, i]))
+                    labels.append(f"{name}[{i}]")
+            else:
+                arrays.append(_arrow_column(values))
+                labels.append(name)
+        yield pa.RecordBatch.from_arrays(arrays, names=labels)
 
-    # Remover NaN e aplicar escala
-    img_data = np.nan_to_num(img_data, nan=0.0)
-    vmin, vmax = np.percentile(img_data, [1, 99])
-    if vmax > vmin:
-        img_data = np.clip((img_data - vmin) / (vmax - vmin) * 255, 0, 255)
-    else:
-        img_data = np.zeros_like(img_data)
 
-    img = Image.fromarray(img_data.astype(np.uint8), mode="L")
-    img.save(output_path, format="PNG")
+def _fits_image_batches(hdu):
+    import numpy as np
+    import pyarrow as pa
 
+    data = hdu.data
+    while data.ndim > 2:
+        data = data[0]
+    scaler = _Scaler(hdu.header, data.dtype)
+    scaled = scaler.bscale != 1.0 or scaler.bzero != 0.0 or scaler.blank is not None
+    height, width = data.shape
+    rows = max(1, CHUNK_ROWS // width)
+    labels = [str(j) for j in range(width)]
+    for start in range(0, height, rows):
+        block = data[start:start + rows]
+        if scaled:
+            block = scaler(block, np.empty(block.shape, dtype=np.float64))
+        yield pa.RecordBatch.from_arrays([_arrow_column(block[:, j]) for j in range(width)], names=labels)
 
-def _fits_to_csv(hdul, output_path: str) -> None:
-    import csv
 
+def _fits_to_table(hdul, output_path: str, target_format: str) -> None:
     # Procurar tabela binária ou ASCII
     for hdu in hdul:
-        if hasattr(hdu, "columns") and hdu.columns is not None:
-            cols = hdu.columns.names
-            with open(output_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(cols)
-                for row in hdu.data:
-                    writer.writerow([str(v) for v in row])
+        if getattr(hdu, "columns", None) is not None and hdu.data is not None:
+            _write_batches(_fits_table_batches(hdu), output_path, target_format)
             return
 
-    # Fallback: exportar dados numéricos brutos
-    for hdu in hdul:
-        if hasattr(hdu, "data") and hdu.data is not None and hdu.data.ndim == 2:
-            import numpy as np
-            import csv
-            with open(output_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                for row in hdu.data:
-                    writer.writerow(row.tolist())
-            return
+    # Fallback: exportar a matriz da imagem (CSV sem cabeçalho, como antes)
+    try:
+        hdu = _image_hdu(hdul)
+    except ValueError:
+        raise ValueError("FITS sem tabela ou dados matriciais exportáveis")
+    _write_batches(_fits_image_batches(hdu), output_path, target_format, header=False)
+
+
+# --- Exportação tabular (Arrow) ---
+
+def _arrow_column(values):
+    """Array numpy (mascarado ou não) → pyarrow.Array, com máscara virando nulos."""
+    import numpy as np
+    import pyarrow as pa
+
+    mask = None
+    if np.ma.isMaskedArray(values):
+        mask = np.ma.getmaskarray(values)
+        values = values.data
+        if not mask.any():
+            mask = None
+    values = np.asarray(values)
+    if values.dtype.kind in "SU":
+        return pa.array(values.astype(str), mask=mask)
+    if values.dtype.kind == "O":
+        # Arrays de tamanho variável (formato P/Q do FITS) e afins
+        return pa.array([str(v) for v in values], mask=mask)
+    if not values.dtype.isnative:
+        # FITS é big-endian; o Arrow só aceita a ordem nativa
+        values = values.astype(values.dtype.newbyteorder("="))
+    return pa.array(values, mask=mask)
 
-    raise ValueError("FITS sem tabela ou dados matriciais exportáveis")
+
+def _write_batches(batches, output_path: str, target_format: str, header: bool = True) -> None:
+    """Grava `RecordBatch`es em sequência como CSV ou Parquet."""
+    try:
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Instale: pip install pyarrow")
+
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                if target_format == "parquet":
+                    writer = pq.ParquetWriter(output_path, batch.schema)
+                else:
+                    writer = pa_csv.CSVWriter(
+                        output_path, batch.schema, write_options=pa_csv.WriteOptions(include_header=header),
+                    )
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Nenhum dado para exportar")
 
 
 # --- NetCDF ---
 
-def _netcdf_convert(input_path: str, output_path: str, target_format: str) -> None:
+def _nc_coordinate(ds, name: str) -> bool:
+    var = ds.variables[name]
+    return var.dimensions == (name,)
+
+
+def _nc_variables(ds, options: dict) -> list[str]:
+    """Variáveis exportadas para tabela: todas com as mesmas dimensões."""
+    if "variables" in options:
+        names = options["variables"]
+        missing = [n for n in names if n not in ds.variables]
+        if missing:
+            raise ValueError(f"Variável não encontrada: {', '.join(missing)}")
+        dims = {ds.variables[n].dimensions for n in names}
+        if len(dims) > 1:
+            raise ValueError("As variáveis escolhidas precisam ter as mesmas dimensões")
+        return names
+    data_vars = [n for n in ds.variables if not _nc_coordinate(ds, n)] or list(ds.variables)
+    if not data_vars:
+        raise ValueError("NetCDF sem variáveis")
+    groups: dict[tuple, list[str]] = {}
+    for name in data_vars:
+        groups.setdefault(ds.variables[name].dimensions, []).append(name)
+    # O grupo com mais dimensões (e, no empate, mais variáveis)
+    return max(groups.values(), key=lambda g: (len(ds.variables[g[0]].dimensions), len(g)))
+
+
+def _nc_selection(ds, options: dict) -> dict:
+    """dimensions → {dimensão: índice (int) ou slice}, conferido contra o arquivo."""
+    selection = {}
+    for dim, sel in options.get("dimensions", {}).items():
+        if dim not in ds.dimensions:
+            raise ValueError(f"Dimensão não encontrada: {dim}")
+        size = len(ds.dimensions[dim])
+        if isinstance(sel, int):
+            if sel >= size:
+                raise ValueError(f"dimensions.{dim}: índice {sel} fora de 0..{size - 1}")
+            selection[dim] = sel
+        else:
+            selection[dim] = slice(min(sel[0], size), min(sel[1], size))
+    return selection
+
+
+def _netcdf_batches(ds, names: list[str], selection: dict):
+    import numpy as np
+    import pyarrow as pa
+
+    dims = ds.variables[names[0]].dimensions
+    ranges = {d: selection.get(d, slice(0, len(ds.dimensions[d]))) for d in dims}
+    kept = [d for d in dims if not isinstance(ranges[d], int)]
+    coords = {}
+    for d in kept:
+        if d in ds.variables and _nc_coordinate(ds, d) and d not in names:
+            coords[d] = ds.variables[d][ranges[d]]
+        elif d not in names:
+            coords[d] = np.arange(ranges[d].start, ranges[d].stop)
+
+    if not kept:
+        values = [_arrow_column(np.ma.atleast_1d(ds.variables[n][tuple(ranges[d] for d in dims)])) for n in names]
+        yield pa.RecordBatch.from_arrays(values, names=names)
+        return
+
+    lead = kept[0]
+    lead_range = ranges[lead]
+    inner = 1
+    for d in kept[1:]:
+        inner *= ranges[d].stop - ranges[d].start
+    rows = max(1, CHUNK_ROWS // max(inner, 1))
+    for start in range(lead_range.start, max(lead_range.stop, lead_range.start + 1), rows):
+        stop = min(start + rows, lead_range.stop)
+        index = tuple(slice(start, stop) if d == lead else ranges[d] for d in dims)
+        # netCDF4 lê só o bloco pedido do disco
+        blocks = [ds.variables[name][index] for name in names]
+        shape = blocks[0].shape
+        arrays, labels = [], []
+        for axis, d in enumerate(kept):
+            if d not in coords:
+                continue
+            coord = coords[d][start - lead_range.start:stop - lead_range.start] if d == lead else coords[d]
+            view = [1] * len(kept)
+            view[axis] = -1
+            grid = np.broadcast_to(np.ma.getdata(coord).reshape(view), shape)
+            arrays.append(_arrow_column(grid.ravel()))
+            labels.append(d)
+        for name, block in zip(names, blocks):
+            arrays.append(_arrow_column(block.ravel()))
+            labels.append(name)
+        yield pa.RecordBatch.from_arrays(arrays, names=labels)
+
+
+def _netcdf_convert(input_path: str, output_path: str, target_format: str, options: dict) -> None:
     try:
         import netCDF4 as nc
     except ImportError:
         raise RuntimeError("Instale: pip install netCDF4")
 
-    ds = nc.Dataset(input_path, "r")
-    try:
+    if target_format not in TABLE_FORMATS and target_format != "json":
+        raise ValueError(f"NetCDF não suporta saída: {target_format}")
+
+    with nc.Dataset(input_path, "r") as ds:
+        selection = _nc_selection(ds, options)
+        if target_format in TABLE_FORMATS:
+            names = _nc_variables(ds, options)
+            _write_batches(_netcdf_batches(ds, names, selection), output_path, target_format)
+            return
+
         result: dict = {}
-        for var_name in ds.variables:
+        for var_name in options.get("variables") or ds.variables:
+            if var_name not in ds.variables:
+                raise ValueError(f"Variável não encontrada: {var_name}")
             var = ds.variables[var_name]
+            index = tuple(selection.get(d, slice(None)) for d in var.dimensions)
             try:
-                data = var[:].tolist() if hasattr(var[:], "tolist") else list(var[:])
-                result[var_name] = data
+                data = var[index] if index else var[...]
+                result[var_name] = data.tolist() if hasattr(data, "tolist") else list(data)
             except Exception:
                 result[var_name] = str(var[:])
-
-        if target_format == "json":
-            Path(output_path).write_text(
-                json.dumps(result, indent=2, ensure_ascii=False, default=str),
-                encoding="utf-8"
-            )
-        elif target_format == "csv":
-            import csv
-            import pandas as pd
-            dfs = []
-            for k, v in result.items():
-                try:
-                    if isinstance(v, list) and v and not isinstance(v[0], list):
-                        dfs.append(pd.DataFrame({k: v}))
-                except Exception:
-                    pass
-            if dfs:
-                import functools
-                combined = functools.reduce(
-                    lambda a, b: a.join(b, how="outer"), dfs
-                )
-                combined.to_csv(output_path, index=False)
-            else:
-                Path(output_path).write_text(
-                    json.dumps(result, default=str), encoding="utf-8"
-                )
-        else:
-            raise ValueError(f"NetCDF não suporta saída: {target_format}")
-    finally:
-        ds.close()
+        Path(output_path).write_text(
+            json.dumps(result, indent=2, ensure_ascii=False, default=str),
+            encoding="utf-8"
+        )
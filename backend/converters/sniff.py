@@ -0,0 +1,270 @@
+"""Detecção do formato real pelos primeiros bytes (magic bytes).
+
+`sniff(head)` devolve a família do conteúdo (`"png"`, `"zip"`, `"mp4"`…) ou
+None quando não há assinatura conhecida (texto, CSV, STL ASCII…). `resolve`
+compara com a extensão declarada e decide se o arquivo segue como está, é
+redirecionado para o conversor do formato real ou deve ser recusado.
+"""
+
+HEAD_SIZE = 4096
+
+# Família detectada → extensões declaradas compatíveis com ela
+FAMILIES: dict[str, set[str]] = {
+    "png":     {"png"},
+    "jpg":     {"jpg", "jpeg"},
+    "gif":     {"gif"},
+    "webp":    {"webp"},
+    "bmp":     {"bmp"},
+    "ico":     {"ico"},
+    "dds":     {"dds"},
+    # RAW de câmeras baseados em TIFF
+    "tiff":    {"tiff", "tif", "dng", "cr2", "nef", "arw", "pef", "srw"},
+    "orf":     {"orf"},
+    "rw2":     {"rw2"},
+    "raf":     {"raf"},
+    "psd":     {"psd"},
+    "heif":    {"heic", "heif", "avif"},
+    "exr":     {"exr"},
+    "hdr":     {"hdr"},
+    "pdf":     {"pdf", "ai"},
+    "ps":      {"eps", "ai"},
+    "zip":     {"zip", "docx", "xlsx", "pptx", "odt", "ods", "odp", "epub", "3mf"},
+    "epub":    {"epub"},
+    "odt":     {"odt"},
+    "ods":     {"ods"},
+    "odp":     {"odp"},
+    "ole":     {"xls", "ppt", "msg"},
+    "7z":      {"7z"},
+    "gz":      {"gz"},
+    "tar":     {"tar"},
+    "sqlite":  {"sqlite", "db"},
+    "parquet": {"parquet"},
+    "feather": {"feather"},
+    "hdf5":    {"hdf5", "h5", "nc"},
+    "cdf":     {"nc"},
+    "fits":    {"fits", "fit", "fts"},
+    "dcm":     {"dcm"},
+    "ttf":     {"ttf"},
+    "otf":     {"otf"},
+    "woff":    {"woff"},
+    "woff2":   {"woff2"},
+    "glb":     {"glb"},
+    "ply":     {"ply"},
+    "rtf":     {"rtf"},
+    # ISO BMFF: o ffmpeg trata todos pelo conteúdo
+    "mp4":     {"mp4", "mov", "m4a", "3gp"},
+    "mkv":     {"mkv", "webm"},
+    "avi":     {"avi"},
+    "wav":     {"wav"},
+    "aiff":    {"aiff", "aif"},
+    "mp3":     {"mp3"},
+    "ogg":     {"ogg", "opus"},
+    "flac":    {"flac"},
+    "ape":     {"ape"},
+    "amr":     {"amr"},
+    "asf":     {"asf", "wmv", "wma"},
+    "flv":     {"flv"},
+    "mpg":     {"mpg", "mpeg"},
+    "ts":      {"ts", "m2ts"},
+}
+
+# Extensão usada para rotear quando o conteúdo diverge da extensão declarada.
+# Famílias ambíguas (zip genérico, OLE) ficam de fora: não dá para escolher o conversor.
+CANONICAL_EXT: dict[str, str] = {fam: fam for fam in FAMILIES if fam not in ("zip", "ole")}
+CANONICAL_EXT.update({"heif": "heic", "cdf": "nc", "ps": "eps"})
+
+# Extensões cujo formato sempre começa com uma assinatura reconhecida por sniff():
+# sem assinatura, o arquivo certamente não é o que diz ser
+STRICT_EXTS = {
+    "png", "jpg", "jpeg", "gif", "webp", "tiff", "tif", "psd", "pdf", "zip", "docx", "xlsx",
+    "pptx", "odt", "ods", "odp", "epub", "3mf", "7z", "gz", "sqlite", "db", "heic", "heif",
+    "avif", "exr", "fits", "fit", "fts", "parquet", "feather", "flac", "woff", "woff2", "glb",
+    "hdf5", "h5", "nc", "xls", "ppt", "msg", "ogg", "opus",
+}
+
+_ODF_MIMETYPES = {
+    b"application/epub+zip": "epub",
+    b"application/vnd.oasis.opendocument.text": "odt",
+    b"application/vnd.oasis.opendocument.spreadsheet": "ods",
+    b"application/vnd.oasis.opendocument.presentation": "odp",
+}
+
+
+def _sniff_zip(head: bytes) -> str:
+    # EPUB e ODF guardam o arquivo "mimetype" sem compressão como primeira entrada
+    if head[30:38] == b"mimetype":
+        content = head[38:38 + 64]
+        for mimetype, ext in _ODF_MIMETYPES.items():
+            if content.startswith(mimetype):
+                return ext
+    return "zip"
+
+
+def _sniff_ftyp(head: bytes) -> str:
+    brand = head[8:12]
+    if brand in (b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1", b"avif", b"avis"):
+        return "heif"
+    return "mp4"
+
+
+def _id3_size(head: bytes) -> int:
+    """Tamanho total de uma tag ID3v2 no início de `head`.
+
+    O tamanho é um inteiro "syncsafe" (7 bits por byte) nos bytes 6–9; com a
+    flag de rodapé, somam-se mais 10 bytes.
+    """
+    size = 10 + ((head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | head[9] & 0x7F)
+    if head[5] & 0x10:
+        size += 10
+    return size
+
+
+def _id3_truncated(head: bytes) -> bool:
+    """Se `head` começa com uma tag ID3v2 que vai além do trecho lido (capa embutida…)."""
+    return head.startswith(b"ID3") and (len(head) < 10 or len(head) - _id3_size(head) < 4)
+
+
+def _after_id3(head: bytes) -> str | None:
+    """Família do conteúdo depois de uma tag ID3v2.
+
+    ID3v2 é só um contêiner de metadados: pode vir antes de MP3, mas também de
+    FLAC e AAC (ADTS).
+    """
+    if _id3_truncated(head):
+        return None
+    return sniff(head[_id3_size(head):])
+
+
+def sniff(head: bytes) -> str | None:
+    """Família do conteúdo a partir dos primeiros bytes, ou None se desconhecida."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(b"RIFF") and len(head) >= 12:
+        return {b"WEBP": "webp", b"WAVE": "wav", b"AVI ": "avi"}.get(head[8:12])
+    if head.startswith(b"FORM") and head[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if head[:4] == b"IIRO":
+        return "orf"
+    if head[:4] == b"IIU\x00":
+        return "rw2"
+    if head.startswith(b"FUJIFILMCCD-RAW"):
+        return "raf"
+    if head.startswith(b"8BPS"):
+        return "psd"
+    if head.startswith(b"BM") and len(head) >= 14 and head[6:10] == b"\x00\x00\x00\x00":
+        return "bmp"
+    if head[:4] == b"\x00\x00\x01\x00" and len(head) >= 6 and head[4:6] != b"\x00\x00":
+        return "ico"
+    if head.startswith(b"DDS "):
+        return "dds"
+    if head[4:8] == b"ftyp":
+        return _sniff_ftyp(head)
+    if head.startswith(b"\x76\x2f\x31\x01"):
+        return "exr"
+    if head.startswith((b"#?RADIANCE", b"#?RGBE")):
+        return "hdr"
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"%!PS") or head.startswith(b"\xc5\xd0\xd3\xc6"):
+        return "ps"
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return _sniff_zip(head)
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        return "ole"
+    if head.startswith(b"7z\xbc\xaf\x27\x1c"):
+        return "7z"
+    if head.startswith(b"\x1f\x8b"):
+        return "gz"
+    if head[257:262] == b"ustar":
+        return "tar"
+    if head.startswith(b"SQLite format 3\x00"):
+        return "sqlite"
+    if head.startswith(b"PAR1"):
+        return "parquet"
+    if head.startswith(b"ARROW1"):
+        return "feather"
+    if head.startswith(b"\x89HDF\r\n\x1a\n"):
+        return "hdf5"
+    if head[:4] in (b"CDF\x01", b"CDF\x02", b"CDF\x05"):
+        return "cdf"
+    if head.startswith(b"SIMPLE  ="):
+        return "fits"
+    if head[128:132] == b"DICM":
+        return "dcm"
+    if head.startswith(b"\x00\x01\x00\x00") and len(head) >= 12:
+        return "ttf"
+    if head.startswith(b"OTTO"):
+        return "otf"
+    if head.startswith(b"wOFF"):
+        return "woff"
+    if head.startswith(b"wOF2"):
+        return "woff2"
+    if head.startswith(b"glTF"):
+        return "glb"
+    if head.startswith(b"ply\n") or head.startswith(b"ply\r\n"):
+        return "ply"
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "mkv"
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head.startswith(b"MAC "):
+        return "ape"
+    if head.startswith(b"#!AMR"):
+        return "amr"
+    if head.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return "asf"
+    if head.startswith(b"FLV\x01"):
+        return "flv"
+    if head.startswith(b"\x00\x00\x01\xba"):
+        return "mpg"
+    if len(head) > 564 and all(head[i] == 0x47 for i in (0, 188, 376, 564)):
+        return "ts"
+    if head.startswith(b"ID3"):
+        return _after_id3(head)
+    if len(head) > 1 and head[0] == 0xFF and head[1] in (0xFB, 0xF3, 0xF2):
+        return "mp3"
+    return None
+
+
+class SniffMismatch(Exception):
+    """O conteúdo não corresponde à extensão e não há conversor para o formato real."""
+
+
+def resolve(declared_ext: str, head: bytes, supports) -> tuple[str, str | None]:
+    """Decide a extensão efetiva do arquivo a partir do conteúdo.
+
+    `supports(ext)` diz se há conversão do formato `ext` para o destino pedido.
+    Retorna `(ext, familia_detectada)`; levanta SniffMismatch quando o arquivo
+    deve ser recusado.
+    """
+    family = sniff(head)
+    if family is None:
+        # Tag ID3 maior que o trecho lido: a assinatura do áudio não foi vista
+        if _id3_truncated(head):
+            return declared_ext, None
+        # PDFs podem ter lixo antes do cabeçalho; leitores aceitam até 1 KB
+        if declared_ext in FAMILIES["pdf"] and b"%PDF-" in head[:1024]:
+            return declared_ext, "pdf"
+        if declared_ext in STRICT_EXTS:
+            raise SniffMismatch(f"O conteúdo não parece ser um arquivo .{declared_ext} válido")
+        return declared_ext, None
+    if declared_ext in FAMILIES[family]:
+        return declared_ext, family
+
+    real_ext = CANONICAL_EXT.get(family)
+    if real_ext and supports(real_ext):
+        return real_ext, family
+    label = real_ext or family
+    raise SniffMismatch(
+        f"Arquivo declarado como .{declared_ext}, mas o conteúdo é {label.upper()}"
+    )
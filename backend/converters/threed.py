@@ -1,4 +1,21 @@
-"""Conversor de arquivos 3D via trimesh."""
+"""Conversor de arquivos 3D via trimesh.
+
+Trocas entre STL/PLY binários e STL/PLY/OBJ passam pelo caminho rápido de
+`mesh_io` (arrays do numpy mapeados do arquivo, sem `trimesh.Trimesh`); o
+resto, e os arquivos que o caminho rápido não lê, vão pelo trimesh.
+
+Opções (campo `options` de `/api/convert`):
+- `merge_vertices`: funde vértices de coordenadas iguais (padrão true, como
+  o trimesh faz ao carregar). Em STL de saída não faz diferença.
+- `target_faces` ou `ratio`: simplifica a malha por decimação de erro
+  quadrático (`fast-simplification`) até esse número ou fração de faces.
+- `lods`: frações de faces dos níveis de detalhe (ex.: `[1, 0.5, 0.1]`),
+  gravados juntos num GLB/GLTF (um nó `lod_N` por nível) ou num ZIP. A
+  malha é carregada uma vez e cada nível é simplificado a partir do anterior.
+- `lod_format`: formato das malhas dentro do ZIP (`lod_N.<formato>`, padrão
+  `glb`); sem `lods`, o ZIP tem uma malha só.
+"""
+import zipfile
 from pathlib import Path
 
 
@@ -12,21 +29,154 @@ TRIMESH_EXPORT_MAP = {
     "off":  "off",
 }
 
+FAST_INPUTS = ("stl", "ply")
+LOD_TARGETS = ("glb", "gltf", "zip")
+LOD_FORMATS = ("glb", "stl", "obj", "ply")
+MAX_LODS = 8
+
+
+def validate_options(options: dict) -> dict:
+    """Normaliza as opções da conversão; ValueError se alguma for inválida."""
+    clean: dict = {}
+    for key, value in options.items():
+        if key == "merge_vertices":
+            if not isinstance(value, bool):
+                raise ValueError("merge_vertices deve ser true ou false")
+            clean[key] = value
+        elif key == "target_faces":
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError("target_faces deve ser um inteiro a partir de 1")
+            clean[key] = value
+        elif key == "ratio":
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= 1:
+                raise ValueError("ratio deve ser um número maior que 0 e até 1")
+            clean[key] = float(value)
+        elif key == "lods":
+            if (not isinstance(value, list) or not 1 <= len(value) <= MAX_LODS
+                    or any(isinstance(r, bool) or not isinstance(r, (int, float)) or not 0 < r <= 1 for r in value)):
+                raise ValueError(f"lods deve ser uma lista de 1 a {MAX_LODS} frações maiores que 0 e até 1")
+            # Do mais detalhado ao mais simples: cada nível sai do anterior
+            clean[key] = sorted({float(r) for r in value}, reverse=True)
+        elif key == "lod_format":
+            if value not in LOD_FORMATS:
+                raise ValueError(f"lod_format deve ser um de: {', '.join(LOD_FORMATS)}")
+            clean[key] = value
+        else:
+            raise ValueError(f"Opção desconhecida: {key}")
+    if "target_faces" in clean and "ratio" in clean:
+        raise ValueError("Use target_faces ou ratio, não os dois")
+    if "lods" in clean and ("target_faces" in clean or "ratio" in clean):
+        raise ValueError("lods não combina com target_faces ou ratio")
+    if clean.get("merge_vertices") is False and ("lods" in clean or "target_faces" in clean or "ratio" in clean):
+        raise ValueError("A simplificação precisa de merge_vertices")
+    return clean
+
+
+def _convert_fast(input_path: str, input_ext: str, output_path: str, target_format: str, options: dict) -> bool:
+    """Troca de formato sem trimesh; False se o arquivo não couber no caminho rápido."""
+    from converters import mesh_io
+
+    writer = mesh_io.WRITERS.get(target_format)
+    if writer is None or input_ext not in FAST_INPUTS:
+        return False
+    mesh = mesh_io.read(input_path, input_ext)
+    if mesh is None:
+        return False
+    # STL grava triângulos soltos: fundir vértices seria trabalho perdido
+    if options.get("merge_vertices", True) and target_format != "stl":
+        mesh = mesh_io.merge(mesh)
+    writer(mesh, output_path)
+    return True
 
-def convert(input_path: str, output_path: str, target_format: str) -> None:
+
+def _load(input_path: str, input_ext: str, options: dict):
+    """`trimesh.Trimesh` do arquivo; STL/PLY binários entram pelo `mesh_io`."""
     import trimesh
 
-    target_format = target_format.lower()
-    input_ext = Path(input_path).suffix.lstrip(".").lower()
+    if input_ext in FAST_INPUTS:
+        from converters import mesh_io
+
+        mesh = mesh_io.read(input_path, input_ext)
+        if mesh is not None:
+            if options.get("merge_vertices", True):
+                mesh = mesh_io.merge(mesh)
+            # Vértices já fundidos (ou mantidos a pedido): process=False evita refazer o trabalho
+            return trimesh.Trimesh(*mesh.indexed(), process=False)
 
     # Carregar a malha 3D
-    mesh = trimesh.load(input_path, force="mesh")
+    mesh = trimesh.load(input_path, force="mesh", process=options.get("merge_vertices", True))
 
     if mesh is None or (hasattr(mesh, "is_empty") and mesh.is_empty):
         raise ValueError(f"Não foi possível carregar o arquivo 3D: {input_path}")
+    return mesh
+
+
+def _decimate(mesh, face_count: int):
+    """Malha simplificada até ~face_count faces (a própria malha se já tiver menos)."""
+    if face_count >= len(mesh.faces):
+        return mesh
+    try:
+        return mesh.simplify_quadric_decimation(face_count=max(face_count, 1))
+    except ImportError:
+        raise RuntimeError("Instale: pip install fast-simplification")
+
+
+def _lods(mesh, ratios: list):
+    total = len(mesh.faces)
+    current = mesh
+    for ratio in ratios:
+        # Cada nível parte do anterior, já menor que a malha original
+        current = _decimate(current, round(total * ratio))
+        yield current
+
+
+def _save_levels(levels, output_path: str, target_format: str, options: dict) -> None:
+    """Grava as malhas `levels` (iterável) num ZIP ou numa cena GLB/GLTF."""
+    import trimesh
+
+    if target_format == "zip":
+        fmt = options.get("lod_format", "glb")
+        # GLB já é binário compacto; os demais formatos ganham com Deflate
+        compression = zipfile.ZIP_STORED if fmt == "glb" else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(output_path, "w", compression) as zf:
+            for index, level in enumerate(levels):
+                with zf.open(f"lod_{index}.{fmt}", "w") as f:
+                    level.export(f, file_type=fmt)
+        return
+
+    scene = trimesh.Scene()
+    for index, level in enumerate(levels):
+        scene.add_geometry(level, node_name=f"lod_{index}", geom_name=f"lod_{index}")
+    scene.export(output_path, file_type=TRIMESH_EXPORT_MAP[target_format])
+
+
+def convert(input_path: str, output_path: str, target_format: str, options: dict | None = None) -> None:
+    options = validate_options(options or {})
+    target_format = target_format.lower()
+    input_ext = Path(input_path).suffix.lstrip(".").lower()
+
+    if "lods" in options:
+        if target_format not in LOD_TARGETS:
+            raise ValueError(f"lods só vale para saída {', '.join(LOD_TARGETS)}")
+        levels = _lods(_load(input_path, input_ext, options), options["lods"])
+        _save_levels(levels, output_path, target_format, options)
+        return
+    if "lod_format" in options and target_format != "zip":
+        raise ValueError("lod_format só vale para saída zip")
 
     fmt = TRIMESH_EXPORT_MAP.get(target_format)
-    if fmt is None:
+    if fmt is None and target_format != "zip":
         raise ValueError(f"Formato 3D de saída não suportado: {target_format}")
 
+    simplify = "target_faces" in options or "ratio" in options
+    if not simplify and _convert_fast(input_path, input_ext, output_path, target_format, options):
+        return
+
+    mesh = _load(input_path, input_ext, options)
+    if simplify:
+        mesh = _decimate(mesh, options.get("target_faces") or round(len(mesh.faces) * options["ratio"]))
+
+    if target_format == "zip":
+        _save_levels([mesh], output_path, target_format, options)
+        return
     mesh.export(output_path, file_type=fmt)
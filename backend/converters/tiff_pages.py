@@ -0,0 +1,121 @@
+"""TIFF multipágina → PDF ou TIFF, uma página por vez.
+
+Cada página é decodificada, gravada e descartada antes da próxima: a memória
+fica em uma página, seja qual for o tamanho do documento.
+
+- PDF: páginas CCITT G4 de uma faixa (o caso de documentos digitalizados)
+  entram no PDF como estão (`/CCITTFaxDecode`), sem decodificar. As demais são
+  comprimidas com Deflate (`/FlateDecode`); páginas 1 bit continuam 1 bit.
+  O DPI do TIFF define o tamanho da página.
+- TIFF: páginas gravadas em sequência pelo `AppendingTiffWriter` do Pillow,
+  mantendo a compressão da origem quando o Pillow sabe gravá-la (senão,
+  Deflate).
+"""
+import zlib
+
+from converters.image import MB, resize, to_rgb
+from converters.pdf_writer import PdfImageWriter
+
+# Compressões sem perdas que o Pillow (libtiff) também grava
+WRITABLE_COMPRESSIONS = {"tiff_lzw", "tiff_deflate", "tiff_adobe_deflate", "packbits", "group3", "group4"}
+# Modo do Pillow → componentes e bits por componente no PDF
+PDF_MODES = {"1": (1, 1), "L": (1, 8), "RGB": (3, 8), "CMYK": (4, 8)}
+
+COPY_BLOCK = MB
+MIN_DPI = 10
+
+
+def _g4_strip(page) -> tuple[int, int] | None:
+    """(offset, tamanho) da faixa G4 única da página, ou None se não der para copiar."""
+    tags = page.tag_v2
+    if page.info.get("compression") != "group4" or 322 in tags:  # 322: TileWidth
+        return None
+    offsets, counts = tags.get(273), tags.get(279)
+    if not offsets or len(offsets) != 1 or tags.get(266, 1) != 1:  # 266: FillOrder
+        return None
+    return offsets[0], counts[0]
+
+
+def _copy_range(path: str, offset: int, size: int):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while size > 0:
+            block = f.read(min(COPY_BLOCK, size))
+            if not block:
+                break
+            size -= len(block)
+            yield block
+
+
+def _deflate(data: bytes):
+    compressor = zlib.compressobj(6)
+    view = memoryview(data)
+    for start in range(0, len(view), COPY_BLOCK):
+        chunk = compressor.compress(view[start:start + COPY_BLOCK])
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def _pages(img, check_page):
+    for index in range(getattr(img, "n_frames", 1)):
+        img.seek(index)
+        check_page(img)
+        yield img
+
+
+def to_pdf(img, input_path: str, output_path: str, options: dict, check_page) -> None:
+    background = options.get("background", "#ffffff")
+    resizing = "max_width" in options or "max_height" in options
+    writer = PdfImageWriter(output_path)
+    try:
+        for page in _pages(img, check_page):
+            dpi = page.info.get("dpi", (72, 72))[0]
+            if dpi < MIN_DPI:  # resolução sem unidade ou ausente
+                dpi = 72
+            strip = None if resizing else _g4_strip(page)
+            if strip is not None:
+                # /BlackIs1 diz qual valor o filtro do PDF entrega para as corridas pretas do
+                # CCITT (não o que o bit 1 significa no TIFF): WhiteIsZero (262=0, fax e
+                # scanner) → false; BlackIsZero (262=1) → true. Mesmo mapeamento do img2pdf
+                black_is_1 = "true" if page.tag_v2.get(262, 0) == 1 else "false"
+                writer.add_image_page(
+                    page.width, page.height, _copy_range(input_path, *strip),
+                    components=1, bits=1, filter="CCITTFaxDecode",
+                    decode_parms=f"<< /K -1 /Columns {page.width} /Rows {page.height} /BlackIs1 {black_is_1} >>",
+                    dpi=dpi,
+                )
+                continue
+            width = page.width
+            frame = resize(page, options)
+            if frame.mode not in PDF_MODES:
+                frame = to_rgb(frame, background)
+            components, bits = PDF_MODES[frame.mode]
+            writer.add_image_page(
+                frame.width, frame.height, _deflate(frame.tobytes()),
+                components=components, bits=bits, filter="FlateDecode",
+                # Redimensionada, a página mantém o tamanho físico
+                dpi=dpi * frame.width / width,
+            )
+    except BaseException:
+        writer.f.close()
+        raise
+    writer.close()
+
+
+def to_tiff(img, output_path: str, options: dict, check_page) -> None:
+    from PIL import TiffImagePlugin
+
+    # AppendingTiffWriter com caminho acrescentaria a um arquivo existente
+    with open(output_path, "w+b") as f, TiffImagePlugin.AppendingTiffWriter(f) as tf:
+        for page in _pages(img, check_page):
+            compression = page.info.get("compression")
+            frame = resize(page, options)
+            if compression not in WRITABLE_COMPRESSIONS or (compression.startswith("group") and frame.mode != "1"):
+                # Sem isso o Pillow reusaria a compressão da origem guardada em `info`
+                compression = "tiff_deflate"
+            save_kwargs: dict = {"compression": compression}
+            if "dpi" in page.info:
+                save_kwargs["dpi"] = page.info["dpi"]
+            frame.save(tf, format="TIFF", **save_kwargs)
+            tf.newFrame()
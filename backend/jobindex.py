@@ -0,0 +1,188 @@
+"""Índice de jobs por chave de cache, para deduplicar conversões.
+
+A chave é o SHA-256 da entrada + formato de destino (+ opções). Antes de
+converter, o job tenta reservar a chave (`claim`): se já existe um resultado
+válido, ele é reaproveitado; se outro job está convertendo a mesma entrada
+(lease ativo), espera por ele em vez de repetir o trabalho.
+
+`LocalIndex` vale para um processo só. Com `CONVERTUDO_SHARED_DIR` apontando
+para um armazenamento compartilhado entre réplicas, o índice passa a ser um
+arquivo SQLite nesse diretório (`SQLiteIndex`) e os resultados também ficam
+lá, então qualquer nó serve o resultado produzido por outro.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import metrics
+
+SHARED_DIR = os.environ.get("CONVERTUDO_SHARED_DIR", "")
+LEASE_TTL = float(os.environ.get("CONVERTUDO_LEASE_TTL", "120"))
+NODE = f"{socket.gethostname()}:{os.getpid()}"
+
+RESULT_CACHE = metrics.Counter(
+    "convertudo_result_cache_total",
+    "Consultas ao cache de resultados por desfecho.",
+    ("result",),
+)
+
+
+def cache_key(input_sha256: str, input_ext: str, target_format: str, options: dict | None = None) -> str:
+    payload = json.dumps([input_sha256, input_ext, target_format, options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobIndex:
+    """Interface do índice. `claim` retorna None quando a chave passa a ser do chamador,
+    ou `(estado, job_id)` do dono atual (`"running"` ou `"done"`)."""
+
+    def claim(self, key: str, job_id: str, lease_ttl: float = LEASE_TTL) -> tuple[str, str] | None:
+        raise NotImplementedError
+
+    def renew(self, key: str, job_id: str, lease_ttl: float = LEASE_TTL) -> None:
+        raise NotImplementedError
+
+    def complete(self, key: str, job_id: str, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def release(self, key: str, job_id: str) -> None:
+        """Desiste da chave (conversão falhou ou o resultado sumiu)."""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        raise NotImplementedError
+
+
+class LocalIndex(JobIndex):
+    def __init__(self):
+        self._rows: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _alive(row: dict, now: float) -> bool:
+        return row["lease_until"] > now if row["state"] == "running" else row["expires_at"] > now
+
+    def claim(self, key, job_id, lease_ttl=LEASE_TTL):
+        now = time.time()
+        with self._lock:
+            row = self._rows.get(key)
+            if row and self._alive(row, now):
+                return row["state"], row["job_id"]
+            self._rows[key] = {"job_id": job_id, "state": "running",
+                               "lease_until": now + lease_ttl, "expires_at": 0.0}
+        return None
+
+    def renew(self, key, job_id, lease_ttl=LEASE_TTL):
+        with self._lock:
+            row = self._rows.get(key)
+            if row and row["job_id"] == job_id and row["state"] == "running":
+                row["lease_until"] = time.time() + lease_ttl
+
+    def complete(self, key, job_id, expires_at):
+        with self._lock:
+            self._rows[key] = {"job_id": job_id, "state": "done", "lease_until": 0.0,
+                               "expires_at": expires_at}
+
+    def release(self, key, job_id):
+        with self._lock:
+            row = self._rows.get(key)
+            if row and row["job_id"] == job_id:
+                del self._rows[key]
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            dead = [k for k, row in self._rows.items() if not self._alive(row, now)]
+            for k in dead:
+                del self._rows[k]
+        return len(dead)
+
+
+class SQLiteIndex(JobIndex):
+    """Índice num arquivo SQLite compartilhado (modo de journal padrão: WAL não funciona em NFS)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " cache_key TEXT PRIMARY KEY,"
+            " job_id TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " node TEXT,"
+            " lease_until REAL NOT NULL DEFAULT 0,"
+            " expires_at REAL NOT NULL DEFAULT 0)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Uma conexão por operação: as chamadas vêm de threads diferentes do executor
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        db = self._connect()
+        try:
+            return db.execute(sql, params).rowcount
+        finally:
+            db.close()
+
+    def claim(self, key, job_id, lease_ttl=LEASE_TTL):
+        now = time.time()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT job_id, state, lease_until, expires_at FROM jobs WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row:
+                owner, state, lease_until, expires_at = row
+                if (state == "running" and lease_until > now) or (state == "done" and expires_at > now):
+                    db.execute("COMMIT")
+                    return state, owner
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (cache_key, job_id, state, node, lease_until, expires_at)"
+                " VALUES (?, ?, 'running', ?, ?, 0)",
+                (key, job_id, NODE, now + lease_ttl),
+            )
+            db.execute("COMMIT")
+            return None
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def renew(self, key, job_id, lease_ttl=LEASE_TTL):
+        self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE cache_key = ? AND job_id = ? AND state = 'running'",
+            (time.time() + lease_ttl, key, job_id),
+        )
+
+    def complete(self, key, job_id, expires_at):
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (cache_key, job_id, state, node, lease_until, expires_at)"
+            " VALUES (?, ?, 'done', ?, 0, ?)",
+            (key, job_id, NODE, expires_at),
+        )
+
+    def release(self, key, job_id):
+        self._execute("DELETE FROM jobs WHERE cache_key = ? AND job_id = ?", (key, job_id))
+
+    def sweep(self):
+        now = time.time()
+        return self._execute(
+            "DELETE FROM jobs WHERE (state = 'running' AND lease_until < ?)"
+            " OR (state = 'done' AND expires_at < ?)",
+            (now, now),
+        )
+
+
+def make_index() -> JobIndex:
+    if SHARED_DIR:
+        return SQLiteIndex(Path(SHARED_DIR) / "jobs.sqlite3")
+    return LocalIndex()
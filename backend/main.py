@@ -1,66 +1,403 @@
+import inspect
+import json
 import os
 import uuid
-import shutil
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+# O OpenMP do LibRaw (rawpy) lê OMP_NUM_THREADS ao carregar, e o rawpy não
+# aceita o número de threads por chamada: definido aqui, antes de qualquer
+# conversor, e herdado pelos processos do lote. Sem a variável, o padrão do
+# OpenMP já é um thread por núcleo.
+if os.environ.get("CONVERTUDO_RAW_THREADS"):
+    os.environ["OMP_NUM_THREADS"] = os.environ["CONVERTUDO_RAW_THREADS"]
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Header, Depends
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+from contextlib import asynccontextmanager
+
+from converters import batch_image, sniff
+from converters.registry import EXT_CATEGORY, get_supported_outputs, route_conversion, VIRTUAL_FORMAT_EXT
+import metrics
+from admission import AdmissionController, AdmissionRejected
+from scheduler import FairScheduler, PRIORITIES, estimate_cost
+import profiling
+import catalog
+import jobindex
+from timing import JobTimer
+from workspace import Workspace, QuotaExceeded, InsufficientSpace, SWEEP_INTERVAL
+from uploads import UploadStore, UploadError
+from results import ResultStore
+
+
+async def _sweep_forever():
+    loop = asyncio.get_running_loop()
+    while True:
+        for sweep in (WORKSPACE.sweep, UPLOADS.sweep, RESULTS.sweep, INDEX.sweep):
+            try:
+                await loop.run_in_executor(None, sweep)
+            except Exception:
+                pass
+        await asyncio.sleep(SWEEP_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Limpa o que sobrou de execuções anteriores (crash, worker morto) e segue varrendo
+    WORKSPACE.sweep()
+    WORKSPACE.sweep_legacy(TEMP_DIR)
+    sweeper = asyncio.create_task(_sweep_forever())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        batch_image.shutdown()
 
-from converters.registry import SUPPORTED_CONVERSIONS, CATEGORIES, get_supported_outputs, route_conversion, VIRTUAL_FORMAT_EXT
 
-app = FastAPI(title="Convertudo", version="1.0.0")
+app = FastAPI(title="Convertudo", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Job-Id", "Retry-After", "ETag", "Content-Range", "Accept-Ranges", "X-Cache",
+                    "X-Batch-Converted", "X-Batch-Failed"],
 )
 
+
+@app.middleware("http")
+async def _mark_request_start(request: Request, call_next):
+    # Marca a chegada da requisição para medir o recebimento do upload
+    request.state.received_at = time.perf_counter()
+    return await call_next(request)
+
+
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
 TEMP_DIR = Path(tempfile.gettempdir()) / "convertudo"
 TEMP_DIR.mkdir(exist_ok=True)
 
+# Executor dedicado às conversões (mesmo padrão de tamanho do executor default do asyncio)
+CONVERT_WORKERS = int(os.environ.get("CONVERTUDO_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+CONVERT_EXECUTOR = ThreadPoolExecutor(max_workers=CONVERT_WORKERS, thread_name_prefix="convert")
+
+WORKSPACE = Workspace(TEMP_DIR)
+UPLOADS = UploadStore(TEMP_DIR / "uploads")
+# Com CONVERTUDO_SHARED_DIR, resultados e índice de jobs ficam no armazenamento compartilhado
+RESULTS = ResultStore(Path(jobindex.SHARED_DIR) / "results" if jobindex.SHARED_DIR else TEMP_DIR / "results")
+INDEX = jobindex.make_index()
+DEDUP_POLL_INTERVAL = 0.5
+CATALOG = catalog.Catalog()
+
+metrics.EXECUTOR_WORKERS.set(CONVERT_WORKERS)
+metrics.watch_temp_dir(TEMP_DIR, *([WORKSPACE.tmpfs_root] if WORKSPACE.tmpfs_root else []))
+profiling.set_profile_dir(TEMP_DIR / "profiles")
+
+ADMISSION = AdmissionController()
+SCHEDULER = FairScheduler(CONVERT_EXECUTOR, CONVERT_WORKERS)
+
 
 # --- API Routes ---
 
 @app.get("/api/formats")
-def get_formats():
+def get_formats(if_none_match: str | None = Header(None)):
     """Retorna o mapa completo de conversões suportadas, agrupado por categoria."""
-    result = {}
-    for category, exts in CATEGORIES.items():
-        category_data = {}
-        for ext in exts:
-            outputs = SUPPORTED_CONVERSIONS.get(ext, [])
-            if outputs:
-                category_data[ext] = outputs
-        if category_data:
-            result[category] = category_data
-    return JSONResponse(result)
+    return _cached_json(CATALOG.formats(), if_none_match)
 
 
 @app.get("/api/outputs/{extension}")
-def get_outputs(extension: str):
+def get_outputs(extension: str, if_none_match: str | None = Header(None)):
     """Retorna os formatos de saída disponíveis para uma extensão."""
-    outputs = get_supported_outputs(extension)
-    if not outputs:
+    cached = CATALOG.outputs(extension)
+    if cached is None:
         raise HTTPException(status_code=404, detail=f"Formato '{extension}' não suportado")
-    return {"extension": extension, "outputs": outputs}
+    return _cached_json(cached, if_none_match)
+
+
+def _cached_json(cached, if_none_match: str | None) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": catalog.CACHE_CONTROL}
+    if if_none_match and _etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 
 @app.post("/api/convert")
 async def convert_file(
+    request: Request,
     file: UploadFile = File(...),
     target_format: str = Form(...),
+    priority: str = Form("interactive"),
+    profile: str = Form(""),
+    options: str = Form(""),
+    x_admin_token: str | None = Header(None),
+    x_api_key: str | None = Header(None),
 ):
-    """Recebe um arquivo e retorna o arquivo convertido."""
+    """Recebe um arquivo e retorna o arquivo convertido.
+
+    `priority` (`interactive` ou `batch`) define a classe no escalonador; a
+    justiça entre clientes usa o header `X-API-Key` ou, na falta dele, o IP.
+    `profile` (`cprofile` ou `sampling`) executa a conversão sob um profiler;
+    exige o header `X-Admin-Token`.
+    `options` é um objeto JSON repassado ao conversor (ex.:
+    `{"max_width": 800}` para imagens); conversões que não aceitam opções
+    respondem 400.
+    """
     original_name = Path(file.filename or "arquivo").stem
-    input_ext = Path(file.filename or "").suffix.lstrip(".").lower()
+    declared_ext = Path(file.filename or "").suffix.lstrip(".").lower()
+    # O upload já está no spool do multipart: ler o começo é barato
+    head = await file.read(sniff.HEAD_SIZE)
+    await file.seek(0)
+    input_ext = _resolve_input_ext(declared_ext, target_format, head)
+    target_format, priority, profile = _validate_job(input_ext, target_format, priority, profile, x_admin_token)
+    job_options = _parse_options(options, input_ext, target_format)
+
+    job_id = uuid.uuid4().hex
+    timer = JobTimer(job_id, input_ext=input_ext, target_format=target_format,
+                     **({"declared_ext": declared_ext} if declared_ext != input_ext else {}))
+    # O multipart já foi lido pelo FastAPI antes de chegar aqui
+    timer.record("upload", time.perf_counter() - request.state.received_at)
+
+    async def stage_input(input_path: Path) -> tuple[int, str]:
+        return await WORKSPACE.save_upload(file, input_path)
+
+    return await _run_job(
+        request, job_id, timer, input_ext, target_format, original_name,
+        priority=priority, profile=profile, options=job_options, x_api_key=x_api_key,
+        expected_bytes=file.size or 0, stage_input=stage_input,
+    )
+
+
+BATCH_CATEGORIES = ("Imagem", "RAW")
+
+
+@app.post("/api/convert/batch")
+async def convert_batch(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    target_format: str = Form(...),
+    priority: str = Form("batch"),
+    options: str = Form(""),
+    x_api_key: str | None = Header(None),
+):
+    """Converte várias imagens para o mesmo formato e devolve um ZIP.
+
+    As conversões rodam no pool de processos de `converters.batch_image`.
+    Arquivos que falham são listados em `erros.txt` dentro do ZIP; os headers
+    `X-Batch-Converted` e `X-Batch-Failed` trazem as contagens.
+    """
+    if len(files) > batch_image.MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Lote com mais de {batch_image.MAX_FILES} arquivos")
+
+    inputs: list[tuple[UploadFile, str]] = []
+    target = target_format
+    for file in files:
+        declared_ext = Path(file.filename or "").suffix.lstrip(".").lower()
+        head = await file.read(sniff.HEAD_SIZE)
+        await file.seek(0)
+        input_ext = _resolve_input_ext(declared_ext, target_format, head)
+        if EXT_CATEGORY.get(input_ext) not in BATCH_CATEGORIES:
+            raise HTTPException(status_code=400, detail=f"Lote aceita só imagens: {file.filename}")
+        target, priority, _ = _validate_job(input_ext, target_format, priority, "", None)
+        inputs.append((file, input_ext))
+    # As opções valem para todos os arquivos: cada extensão do lote passa pelo próprio conversor
+    job_options = [_parse_options(options, ext, target) for ext in dict.fromkeys(ext for _, ext in inputs)][0]
+    # RAW é a categoria mais restrita: um lote com RAW usa as vagas dela
+    category = "RAW" if any(EXT_CATEGORY.get(ext) == "RAW" for _, ext in inputs) else "Imagem"
+
+    job_id = uuid.uuid4().hex
+    timer = JobTimer(job_id, input_ext="batch", target_format=target, files=len(inputs))
+    timer.record("upload", time.perf_counter() - request.state.received_at)
+    expected_bytes = sum(file.size or 0 for file, _ in inputs)
+    # Cada vaga converte um arquivo por vez: o custo de uma é o do maior arquivo
+    file_bytes = max(file.size or 0 for file, _ in inputs)
+
+    grants = []
+    try:
+        with timer.phase("admission"):
+            grants.append(await ADMISSION.acquire(category, file_bytes))
+            # Vagas extras só se couberem agora; o lote roda com quantas conseguir
+            while len(grants) < min(len(inputs), batch_image.WORKERS):
+                extra = ADMISSION.try_acquire(category, file_bytes)
+                if extra is None:
+                    break
+                grants.append(extra)
+
+        with timer.phase("write"):
+            job_dir = WORKSPACE.create(job_id, expected_bytes)
+            items = []
+            for i, (file, input_ext) in enumerate(inputs):
+                input_path = job_dir / f"input-{i}.{input_ext}"
+                await WORKSPACE.save_upload(file, input_path)
+                items.append((str(input_path), file.filename or f"arquivo-{i}.{input_ext}"))
+            output_path = job_dir / "output.zip"
+
+        # Fases `queue` e `convert` vêm do metrics.timed, como nas conversões avulsas
+        timed = metrics.timed(
+            batch_image.convert_batch, "batch", target, timer, category=category,
+            paths=lambda items, target, options, zip_path, work_dir, in_flight: ([p for p, _ in items], zip_path),
+        )
+        try:
+            summary = await SCHEDULER.run(
+                timed, items, target, job_options, str(output_path), str(job_dir), len(grants),
+                client=_client_key(request, x_api_key),
+                priority=priority,
+                cost=estimate_cost(category, expected_bytes),
+            )
+        finally:
+            timed.discard()
+        WORKSPACE.check_quota(job_id)
+
+        with timer.phase("store"):
+            result = RESULTS.put(
+                job_id, output_path, "imagens.zip", "application/zip",
+                input_ext="batch", target_format=target, **summary,
+            )
+        return FileResponse(
+            path=str(RESULTS.path(job_id)),
+            media_type="application/zip",
+            filename="imagens.zip",
+            headers={**_result_headers(result), "Server-Timing": timer.server_timing(), "X-Job-Id": job_id,
+                     "X-Batch-Converted": str(summary["converted"]), "X-Batch-Failed": str(summary["failed"])},
+            background=_finish_job_task(timer, job_id, result),
+        )
+
+    except AdmissionRejected as e:
+        timer.log("rejected", category=e.category)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except QuotaExceeded as e:
+        WORKSPACE.remove(job_id)
+        timer.log("error", error=str(e))
+        raise HTTPException(status_code=413, detail=str(e))
+    except InsufficientSpace as e:
+        timer.log("rejected", error=str(e))
+        raise HTTPException(status_code=507, detail=str(e), headers={"Retry-After": "60"})
+    except Exception as e:
+        WORKSPACE.remove(job_id)
+        timer.log("error", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for grant in grants:
+            ADMISSION.release(grant)
+
+
+# --- Uploads retomáveis ---
+
+@app.post("/api/uploads", status_code=201)
+def create_upload(filename: str = Form(...), size: int = Form(...)):
+    """Abre uma sessão de upload em blocos para arquivos grandes."""
+    input_ext = Path(filename).suffix.lstrip(".").lower()
+    if not get_supported_outputs(input_ext):
+        raise HTTPException(status_code=400, detail=f"Formato '{input_ext}' não suportado")
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="Tamanho inválido")
+    if size > WORKSPACE.job_quota_bytes:
+        raise HTTPException(status_code=413, detail="Arquivo maior que a cota por job")
+    try:
+        return UPLOADS.create(filename, size)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.get("/api/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """Estado da sessão: bytes recebidos e intervalos que ainda faltam."""
+    try:
+        return UPLOADS.status(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.put("/api/uploads/{upload_id}")
+async def put_upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: str | None = Header(None),
+):
+    """Grava um bloco do arquivo a partir de `offset` (blocos podem chegar em paralelo)."""
+    length = request.headers.get("content-length")
+    try:
+        return await UPLOADS.write_chunk(
+            upload_id, offset, request.stream(), int(length) if length else None, x_chunk_sha256,
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.delete("/api/uploads/{upload_id}", status_code=204)
+def delete_upload(upload_id: str):
+    try:
+        UPLOADS.remove(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    request: Request,
+    upload_id: str,
+    target_format: str = Form(...),
+    priority: str = Form("interactive"),
+    profile: str = Form(""),
+    options: str = Form(""),
+    sha256: str = Form(""),
+    x_admin_token: str | None = Header(None),
+    x_api_key: str | None = Header(None),
+):
+    """Monta o arquivo enviado em blocos e o converte como em `/api/convert`.
+
+    `sha256` (opcional) confere o arquivo inteiro. Se a conversão falhar a
+    sessão continua disponível para outra tentativa até expirar.
+    """
+    try:
+        session = UPLOADS.session(upload_id)
+        head = UPLOADS.head(upload_id, sniff.HEAD_SIZE)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    original_name = Path(session["filename"] or "arquivo").stem
+    declared_ext = Path(session["filename"] or "").suffix.lstrip(".").lower()
+    input_ext = _resolve_input_ext(declared_ext, target_format, head)
+    target_format, priority, profile = _validate_job(input_ext, target_format, priority, profile, x_admin_token)
+    job_options = _parse_options(options, input_ext, target_format)
+
+    job_id = uuid.uuid4().hex
+    timer = JobTimer(job_id, input_ext=input_ext, target_format=target_format, upload_id=upload_id,
+                     **({"declared_ext": declared_ext} if declared_ext != input_ext else {}))
+
+    async def stage_input(input_path: Path) -> tuple[int, str]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, UPLOADS.assemble, upload_id, input_path, sha256 or None)
+        except UploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    response = await _run_job(
+        request, job_id, timer, input_ext, target_format, original_name,
+        priority=priority, profile=profile, options=job_options, x_api_key=x_api_key,
+        expected_bytes=session["size"], stage_input=stage_input,
+    )
+    await asyncio.to_thread(UPLOADS.remove, upload_id)
+    return response
+
+
+def _resolve_input_ext(declared_ext: str, target_format: str, head: bytes) -> str:
+    """Extensão efetiva pelo conteúdo: corrige arquivos com extensão errada ou recusa com 415."""
+    target = target_format.lower().lstrip(".")
+    try:
+        input_ext, _ = sniff.resolve(declared_ext, head, lambda ext: target in get_supported_outputs(ext))
+    except sniff.SniffMismatch as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    return input_ext
 
+
+def _validate_job(input_ext: str, target_format: str, priority: str, profile: str,
+                  x_admin_token: str | None) -> tuple[str, str, str]:
+    """Valida os parâmetros comuns de um job e devolve (target_format, priority, profile) normalizados."""
     if not input_ext:
         raise HTTPException(status_code=400, detail="Arquivo sem extensão reconhecida")
 
@@ -74,25 +411,116 @@ async def convert_file(
             detail=f"Conversão '{input_ext}' → '{target_format}' não suportada",
         )
 
-    # Criar arquivos temporários
-    job_id = uuid.uuid4().hex
+    priority = priority.lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Prioridade inválida: {priority}")
+
+    profile = profile.lower()
+    if profile in ("1", "true", "on"):
+        profile = "cprofile"
+    if profile:
+        if not profiling.is_admin(x_admin_token):
+            raise HTTPException(status_code=403, detail="Profiling requer token de administrador")
+        if profile not in profiling.ENGINES:
+            raise HTTPException(status_code=400, detail=f"Profiler inválido: {profile}")
+    return target_format, priority, profile
+
+
+def _parse_options(raw: str, input_ext: str, target_format: str) -> dict:
+    """Lê o campo `options` (objeto JSON) e valida contra o conversor da conversão pedida."""
+    if not raw.strip():
+        return {}
+    try:
+        options = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="options deve ser um objeto JSON")
+    if not isinstance(options, dict):
+        raise HTTPException(status_code=400, detail="options deve ser um objeto JSON")
+    if not options:
+        return {}
+    converter = route_conversion(input_ext, target_format)
+    if "options" not in inspect.signature(converter).parameters:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Conversão '{input_ext}' → '{target_format}' não aceita opções",
+        )
+    # Conversores com opções podem expor validate_options() no módulo: erro vira 400, não 500
+    validate = getattr(inspect.getmodule(converter), "validate_options", None)
+    if validate is not None:
+        try:
+            options = validate(options)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return options
+
+
+async def _run_job(request: Request, job_id: str, timer: JobTimer, input_ext: str, target_format: str,
+                   original_name: str, *, priority: str, profile: str, options: dict,
+                   x_api_key: str | None, expected_bytes: int, stage_input):
+    """Admite, prepara a entrada com `stage_input(input_path)`, converte e devolve a resposta.
+
+    `stage_input` grava a entrada e retorna `(bytes, sha256)`. Se a mesma entrada
+    já foi convertida para o mesmo formato (neste nó ou em outro, com
+    `CONVERTUDO_SHARED_DIR`), o resultado existente é devolvido sem converter.
+    """
     actual_ext = VIRTUAL_FORMAT_EXT.get(target_format, target_format)
-    input_path = TEMP_DIR / f"{job_id}_input.{input_ext}"
-    output_path = TEMP_DIR / f"{job_id}_output.{actual_ext}"
 
+    grant = None
+    key = None
+    renewer = None
     try:
-        # Salvar upload
-        content = await file.read()
-        input_path.write_bytes(content)
+        # Reservar vaga na categoria antes de carregar o arquivo
+        category = EXT_CATEGORY.get(input_ext, "")
+        with timer.phase("admission"):
+            grant = await ADMISSION.acquire(category, expected_bytes)
+
+        # Entrada no diretório do job (disco ou tmpfs), dentro da cota
+        with timer.phase("write"):
+            job_dir = WORKSPACE.create(job_id, expected_bytes)
+            input_path = job_dir / f"input.{input_ext}"
+            output_path = job_dir / f"output.{actual_ext}"
+            input_bytes, input_sha256 = await stage_input(input_path)
+
+        # Mesma entrada e destino já convertidos (ou em conversão) em algum nó?
+        if RESULTS.ttl > 0 and not profile:
+            key = jobindex.cache_key(input_sha256, input_ext, target_format, options)
+            with timer.phase("dedup"):
+                cached = await _claim_or_wait(key, job_id)
+            if cached is not None:
+                key = None
+                WORKSPACE.remove(job_id)
+                return FileResponse(
+                    path=str(RESULTS.path(cached["job_id"])),
+                    media_type=cached["media_type"],
+                    filename=f"{original_name}.{actual_ext}",
+                    headers={**_result_headers(cached), "Server-Timing": timer.server_timing(),
+                             "X-Job-Id": cached["job_id"], "X-Cache": "HIT"},
+                    background=_finish_job_task(timer, job_id, cached, cached_from=cached["job_id"]),
+                )
+            renewer = asyncio.create_task(_renew_lease(key, job_id))
 
         # Converter (em thread para não bloquear o event loop)
-        converter = route_conversion(input_ext, target_format)
-        await asyncio.get_event_loop().run_in_executor(
-            None, converter, str(input_path), str(output_path), target_format
-        )
+        with timer.phase("route"):
+            converter = route_conversion(input_ext, target_format)
+        if profile:
+            converter = profiling.profiled(
+                converter, job_id, profile, input_ext=input_ext, target_format=target_format,
+            )
+        timed = metrics.timed(converter, input_ext, target_format, timer)
+        try:
+            await SCHEDULER.run(
+                timed,
+                str(input_path), str(output_path), target_format, *((options,) if options else ()),
+                client=_client_key(request, x_api_key),
+                priority=priority,
+                cost=estimate_cost(category, input_bytes),
+            )
+        finally:
+            timed.discard()
 
         if not output_path.exists():
             raise RuntimeError("Arquivo de saída não foi gerado")
+        WORKSPACE.check_quota(job_id)
 
         # Tipos MIME comuns
         MIME_MAP = {
@@ -133,19 +561,179 @@ async def convert_file(
         media_type = MIME_MAP.get(actual_ext, "application/octet-stream")
         download_name = f"{original_name}.{actual_ext}"
 
+        # A saída fica disponível em /api/jobs/{job_id}/result até expirar
+        with timer.phase("store"):
+            result = RESULTS.put(
+                job_id, output_path, download_name, media_type,
+                input_ext=input_ext, target_format=target_format,
+            )
+            if key is not None:
+                await _index(INDEX.complete, key, job_id, result["expires_at"])
+                key = None
+
         return FileResponse(
-            path=str(output_path),
+            path=str(RESULTS.path(job_id)),
             media_type=media_type,
             filename=download_name,
-            background=_cleanup_task(input_path, output_path),
+            headers={**_result_headers(result), "Server-Timing": timer.server_timing(), "X-Job-Id": job_id},
+            background=_finish_job_task(timer, job_id, result),
         )
 
+    except AdmissionRejected as e:
+        timer.log("rejected", category=e.category)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except QuotaExceeded as e:
+        WORKSPACE.remove(job_id)
+        timer.log("error", error=str(e))
+        raise HTTPException(status_code=413, detail=str(e))
+    except InsufficientSpace as e:
+        timer.log("rejected", error=str(e))
+        raise HTTPException(status_code=507, detail=str(e), headers={"Retry-After": "60"})
     except HTTPException:
-        _cleanup(input_path, output_path)
+        WORKSPACE.remove(job_id)
+        timer.log("error")
         raise
     except Exception as e:
-        _cleanup(input_path, output_path)
+        WORKSPACE.remove(job_id)
+        timer.log("error", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if renewer is not None:
+            renewer.cancel()
+        if key is not None:
+            # Conversão não terminou: libera a chave para outro job tentar
+            await _index(INDEX.release, key, job_id)
+        if grant is not None:
+            ADMISSION.release(grant)
+
+
+async def _index(fn, *args):
+    # O índice pode ser um SQLite em armazenamento de rede: fora do event loop
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def _claim_or_wait(key: str, job_id: str) -> dict | None:
+    """Reserva a chave para `job_id` (retorna None) ou devolve o resultado de quem já a tem.
+
+    Se outro job está convertendo a mesma entrada, espera ele terminar ou o lease expirar.
+    """
+    waited = False
+    while True:
+        holder = await _index(INDEX.claim, key, job_id)
+        if holder is None:
+            jobindex.RESULT_CACHE.inc(result="miss")
+            return None
+        state, owner = holder
+        if state == "done":
+            result = RESULTS.get(owner)
+            if result is not None:
+                jobindex.RESULT_CACHE.inc(result="wait" if waited else "hit")
+                return result
+            # Resultado expirou ou foi apagado antes do índice: esquece e tenta de novo
+            await _index(INDEX.release, key, owner)
+            continue
+        waited = True
+        await asyncio.sleep(DEDUP_POLL_INTERVAL)
+
+
+async def _renew_lease(key: str, job_id: str):
+    while True:
+        await asyncio.sleep(jobindex.LEASE_TTL / 3)
+        try:
+            await _index(INDEX.renew, key, job_id)
+        except Exception:
+            pass
+
+
+# --- Resultados por job ---
+
+def _result_headers(result: dict) -> dict:
+    max_age = max(0, int(result["expires_at"] - time.time()))
+    return {"ETag": result["etag"], "Cache-Control": f"private, max-age={max_age}"}
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match usa comparação fraca: ignora o prefixo W/
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Metadados do resultado de um job enquanto ele estiver guardado."""
+    result = RESULTS.get(job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado ou expirado")
+    return {**result, "status": "done", "result_url": f"/api/jobs/{job_id}/result"}
+
+
+@app.api_route("/api/jobs/{job_id}/result", methods=["GET", "HEAD"])
+def get_job_result(job_id: str, if_none_match: str | None = Header(None)):
+    """Arquivo convertido de um job, com suporte a `Range`, `If-Range` e `If-None-Match`."""
+    result = RESULTS.get(job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado ou expirado")
+    headers = _result_headers(result)
+    if if_none_match and _etag_matches(if_none_match, result["etag"]):
+        return Response(status_code=304, headers=headers)
+    # FileResponse responde a Range/If-Range (206/416) comparando com o ETag acima
+    return FileResponse(
+        path=str(RESULTS.path(job_id)),
+        media_type=result["media_type"],
+        filename=result["filename"],
+        headers=headers,
+    )
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Métricas de conversão no formato de texto do Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _client_key(request: Request, api_key: str | None) -> str:
+    """Identidade do cliente para o escalonador justo."""
+    if api_key:
+        return f"key:{api_key}"
+    return f"ip:{request.client.host if request.client else ''}"
+
+
+def _require_admin(x_admin_token: str | None = Header(None)):
+    if not profiling.enabled():
+        raise HTTPException(status_code=404, detail="Profiling desabilitado (defina CONVERTUDO_ADMIN_TOKEN)")
+    if not profiling.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Token de administrador inválido")
+
+
+@app.get("/api/admin/profiles", dependencies=[Depends(_require_admin)])
+def list_profiles():
+    """Lista os profiles gravados, do mais recente para o mais antigo."""
+    return {"sampling_available": profiling.sampling_available(), "profiles": profiling.list_profiles()}
+
+
+@app.get("/api/admin/profiles/{job_id}", dependencies=[Depends(_require_admin)])
+def get_profile(job_id: str, top: int = 25, sort: str = "cumulative"):
+    """Resumo top-N das funções mais caras de uma conversão perfilada."""
+    try:
+        result = profiling.summary(job_id, top=max(1, min(top, 500)), sort=sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+    return result
+
+
+@app.get("/api/admin/profiles/{job_id}/raw", dependencies=[Depends(_require_admin)])
+def get_profile_raw(job_id: str):
+    """Arquivo bruto do profile (.prof do cProfile ou relatório texto do pyinstrument)."""
+    try:
+        path = profiling.raw_path(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+    return FileResponse(path=str(path), filename=path.name, media_type="application/octet-stream")
 
 
 @app.get("/api/info")
@@ -170,14 +758,15 @@ async def download_from_url(
         raise HTTPException(status_code=400, detail="URL inválida")
 
     job_id = uuid.uuid4().hex
-    job_dir = TEMP_DIR / f"dl_{job_id}"
 
     try:
         from converters.downloader import download as dl
 
+        job_dir = WORKSPACE.create(job_id)
         output_path: Path = await asyncio.get_event_loop().run_in_executor(
-            None, dl, url, str(job_dir), format.lower(), quality.lower()
+            None, dl, url, str(job_dir / "download"), format.lower(), quality.lower()
         )
+        WORKSPACE.check_quota(job_id)
 
         if not output_path.exists():
             raise RuntimeError("Arquivo de saída não encontrado")
@@ -194,33 +783,43 @@ async def download_from_url(
             path=str(output_path),
             media_type=media_type,
             filename=output_path.name,
-            background=_cleanup_dir_task(job_dir),
+            background=_remove_job_task(job_id),
         )
 
+    except QuotaExceeded as e:
+        WORKSPACE.remove(job_id)
+        raise HTTPException(status_code=413, detail=str(e))
+    except InsufficientSpace as e:
+        raise HTTPException(status_code=507, detail=str(e), headers={"Retry-After": "60"})
     except HTTPException:
-        shutil.rmtree(job_dir, ignore_errors=True)
+        WORKSPACE.remove(job_id)
         raise
     except Exception as e:
-        shutil.rmtree(job_dir, ignore_errors=True)
+        WORKSPACE.remove(job_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _cleanup(*paths):
-    for p in paths:
-        try:
-            Path(p).unlink(missing_ok=True)
-        except Exception:
-            pass
+def _finish_job_task(timer: JobTimer, job_id: str, result: dict, cached_from: str | None = None):
+    """Registra o envio da resposta, emite o log do job e remove o diretório do job."""
+    from starlette.background import BackgroundTask
+    send_start = time.perf_counter()
 
+    def _finish():
+        timer.record("send", time.perf_counter() - send_start)
+        if cached_from:
+            timer.log("cached", output_bytes=result["size"], cached_from=cached_from)
+        else:
+            timer.log("ok", output_bytes=result["size"])
+        WORKSPACE.remove(job_id)
+        if RESULTS.ttl <= 0:
+            RESULTS.remove(job_id)
 
-def _cleanup_task(*paths):
-    from starlette.background import BackgroundTask
-    return BackgroundTask(_cleanup, *paths)
+    return BackgroundTask(_finish)
 
 
-def _cleanup_dir_task(dirpath: Path):
+def _remove_job_task(job_id: str):
     from starlette.background import BackgroundTask
-    return BackgroundTask(shutil.rmtree, str(dirpath), True)
+    return BackgroundTask(WORKSPACE.remove, job_id)
 
 
 # --- Servir frontend ---
@@ -0,0 +1,335 @@
+"""Métricas de conversão no formato de exposição de texto do Prometheus.
+
+Implementação mínima (contadores, gauges e histogramas com labels) para não
+adicionar dependências ao backend. O endpoint `/metrics` em main.py chama
+`render()`.
+"""
+import math
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from converters.registry import EXT_CATEGORY
+
+# Segundos: de conversões triviais (config/JSON) a vídeos longos
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Bytes: 1 KB → 4 GB
+SIZE_BUCKETS = tuple(float(1024 * 4 ** i) for i in range(12))
+
+CONVERSION_LABELS = ("input_ext", "target_format", "category")
+
+_lock = threading.Lock()
+_registry: list["_Metric"] = []
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> list[str]:
+        with _lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (),
+                 function: Callable[[], float] | None = None):
+        super().__init__(name, help_text, labelnames)
+        self._function = function
+
+    def set(self, value: float, **labels) -> None:
+        with _lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_fmt(self._function())}"]
+            except Exception:
+                return []
+        with _lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (),
+                 buckets: tuple = TIME_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> list[str]:
+        with _lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _label_str(self.labelnames, key, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _label_str(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_fmt(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+def render() -> str:
+    with _lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# --- Uso do diretório temporário ---
+
+_temp_dirs: list[Path] = []
+
+
+def _dir_usage(path: Path) -> tuple[int, int]:
+    total = files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+                files += 1
+            except OSError:
+                pass
+    return total, files
+
+
+def watch_temp_dir(*paths: Path) -> None:
+    """Define os diretórios temporários (disco e tmpfs) cujo uso é exposto em /metrics."""
+    _temp_dirs[:] = [Path(p) for p in paths]
+
+
+def _temp_bytes() -> float:
+    return sum(_dir_usage(p)[0] for p in _temp_dirs)
+
+
+def _temp_files() -> float:
+    return sum(_dir_usage(p)[1] for p in _temp_dirs)
+
+
+def _temp_free_bytes() -> float:
+    try:
+        return shutil.disk_usage(_temp_dirs[0]).free if _temp_dirs else 0
+    except OSError:
+        return 0
+
+
+# --- Métricas do Convertudo ---
+
+CONVERSIONS = Counter(
+    "convertudo_conversions_total",
+    "Conversões finalizadas por resultado.",
+    CONVERSION_LABELS + ("status",),
+)
+CONVERSION_SECONDS = Histogram(
+    "convertudo_conversion_seconds",
+    "Tempo gasto dentro do conversor.",
+    CONVERSION_LABELS,
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "convertudo_queue_wait_seconds",
+    "Tempo entre o envio ao executor e o início da conversão.",
+    CONVERSION_LABELS,
+)
+INPUT_BYTES = Histogram(
+    "convertudo_input_bytes",
+    "Tamanho dos arquivos de entrada.",
+    CONVERSION_LABELS,
+    buckets=SIZE_BUCKETS,
+)
+OUTPUT_BYTES = Histogram(
+    "convertudo_output_bytes",
+    "Tamanho dos arquivos gerados.",
+    CONVERSION_LABELS,
+    buckets=SIZE_BUCKETS,
+)
+EXECUTOR_WORKERS = Gauge(
+    "convertudo_executor_workers",
+    "Número máximo de threads do executor de conversões.",
+)
+EXECUTOR_ACTIVE = Gauge(
+    "convertudo_executor_active",
+    "Conversões em execução no executor.",
+)
+EXECUTOR_QUEUED = Gauge(
+    "convertudo_executor_queued",
+    "Conversões aguardando uma thread livre do executor.",
+)
+TEMP_DIR_BYTES = Gauge(
+    "convertudo_temp_dir_bytes",
+    "Bytes ocupados no diretório temporário.",
+    function=_temp_bytes,
+)
+TEMP_DIR_FILES = Gauge(
+    "convertudo_temp_dir_files",
+    "Arquivos presentes no diretório temporário.",
+    function=_temp_files,
+)
+TEMP_DIR_FREE_BYTES = Gauge(
+    "convertudo_temp_dir_free_bytes",
+    "Bytes livres no sistema de arquivos do diretório temporário.",
+    function=_temp_free_bytes,
+)
+
+
+def _file_size(path: str) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _input_bytes(paths) -> int | None:
+    sizes = [_file_size(p) for p in paths]
+    return None if None in sizes else sum(sizes)
+
+
+class _Timed:
+    """Conversor envolvido por `timed`; conta na fila até rodar ou ser descartado."""
+
+    def __init__(self, converter: Callable, labels: dict, timer, paths: Callable | None):
+        self.converter = converter
+        self.labels = labels
+        self.timer = timer
+        self.paths = paths
+        self.submitted = time.perf_counter()
+        self.queued = True
+        EXECUTOR_QUEUED.inc()
+
+    def discard(self) -> None:
+        """Tira da fila um job que não chegou a rodar (cancelado, recusado…); idempotente."""
+        if self.queued:
+            self.queued = False
+            EXECUTOR_QUEUED.dec()
+
+    def __call__(self, *args, **kwargs):
+        labels = self.labels
+        started = time.perf_counter()
+        self.discard()
+        EXECUTOR_ACTIVE.inc()
+        QUEUE_WAIT_SECONDS.observe(started - self.submitted, **labels)
+        if self.timer is not None:
+            self.timer.record("queue", started - self.submitted)
+
+        inputs, output_path = self.paths(*args) if self.paths else ([args[0]], args[1])
+        size_in = _input_bytes(inputs)
+        if size_in is not None:
+            INPUT_BYTES.observe(size_in, **labels)
+
+        status = "error"
+        try:
+            result = self.converter(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            EXECUTOR_ACTIVE.dec()
+            elapsed = time.perf_counter() - started
+            CONVERSION_SECONDS.observe(elapsed, **labels)
+            if self.timer is not None:
+                self.timer.record("convert", elapsed)
+            CONVERSIONS.inc(status=status, **labels)
+            if status == "ok":
+                size_out = _file_size(output_path)
+                if size_out is not None:
+                    OUTPUT_BYTES.observe(size_out, **labels)
+
+
+def timed(converter: Callable, input_ext: str, target_format: str, timer=None, *,
+          category: str | None = None, paths: Callable | None = None) -> _Timed:
+    """Envolve um conversor retornado por `route_conversion` com medições.
+
+    Deve ser chamado imediatamente antes de submeter ao executor: o instante
+    da chamada marca o início da espera na fila. Quem submete chama
+    `discard()` ao final (num `finally`) para que um job que nunca rodou não
+    fique contado na fila. Se `timer` (um `timing.JobTimer`) for informado,
+    recebe as fases `queue` e `convert`.
+
+    Por padrão os argumentos são `(entrada, saída, …)`; conversores com outra
+    assinatura (o lote) passam `paths(*args) -> ([entradas], saída)`.
+    """
+    labels = {
+        "input_ext": input_ext,
+        "target_format": target_format,
+        "category": EXT_CATEGORY.get(input_ext, "") if category is None else category,
+    }
+    return _Timed(converter, labels, timer, paths)
@@ -0,0 +1,159 @@
+"""Profiling sob demanda de conversões individuais.
+
+Habilitado apenas quando `CONVERTUDO_ADMIN_TOKEN` está definido; a requisição
+precisa enviar o mesmo valor no header `X-Admin-Token`. Usa cProfile por
+padrão ou o profiler por amostragem do pyinstrument quando instalado.
+"""
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import time
+from pathlib import Path
+from typing import Callable
+
+ADMIN_TOKEN = os.environ.get("CONVERTUDO_ADMIN_TOKEN", "")
+MAX_PROFILES = int(os.environ.get("CONVERTUDO_MAX_PROFILES", "200"))
+ENGINES = ("cprofile", "sampling")
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+_profile_dir: Path | None = None
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def is_admin(token: str | None) -> bool:
+    return enabled() and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def set_profile_dir(path: Path) -> None:
+    global _profile_dir
+    _profile_dir = Path(path)
+    _profile_dir.mkdir(parents=True, exist_ok=True)
+
+
+def sampling_available() -> bool:
+    try:
+        import pyinstrument  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _paths(job_id: str) -> dict[str, Path]:
+    if _profile_dir is None:
+        raise RuntimeError("Diretório de profiles não configurado")
+    if not _JOB_ID_RE.match(job_id):
+        raise ValueError("job id inválido")
+    return {
+        "meta": _profile_dir / f"{job_id}.json",
+        "cprofile": _profile_dir / f"{job_id}.prof",
+        "sampling": _profile_dir / f"{job_id}.txt",
+    }
+
+
+def _prune() -> None:
+    metas = sorted(_profile_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for meta in metas[:max(0, len(metas) - MAX_PROFILES)]:
+        for p in _profile_dir.glob(f"{meta.stem}.*"):
+            p.unlink(missing_ok=True)
+
+
+def profiled(converter: Callable, job_id: str, engine: str = "cprofile", **fields) -> Callable:
+    """Envolve o conversor num profiler e grava o resultado indexado por `job_id`.
+
+    O profile é gravado mesmo quando a conversão falha.
+    """
+    if engine == "sampling" and not sampling_available():
+        engine = "cprofile"
+    paths = _paths(job_id)
+
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        if engine == "sampling":
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="disabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            result = converter(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            if engine == "sampling":
+                profiler.stop()
+                paths["sampling"].write_text(profiler.output_text(unicode=True), encoding="utf-8")
+            else:
+                profiler.disable()
+                profiler.dump_stats(str(paths["cprofile"]))
+            meta = {
+                "job_id": job_id,
+                "engine": engine,
+                "status": status,
+                "created": time.time(),
+                "wall_s": round(time.perf_counter() - start, 4),
+                **fields,
+            }
+            paths["meta"].write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            _prune()
+
+    return run
+
+
+def list_profiles() -> list[dict]:
+    if _profile_dir is None:
+        return []
+    profiles = []
+    for meta in sorted(_profile_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            profiles.append(json.loads(meta.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            pass
+    return profiles
+
+
+def raw_path(job_id: str) -> Path | None:
+    paths = _paths(job_id)
+    for key in ENGINES:
+        if paths[key].exists():
+            return paths[key]
+    return None
+
+
+def summary(job_id: str, top: int = 25, sort: str = "cumulative") -> dict | None:
+    """Resumo top-N do profile de um job, ou None se não existir."""
+    paths = _paths(job_id)
+    if not paths["meta"].exists():
+        return None
+    meta = json.loads(paths["meta"].read_text(encoding="utf-8"))
+
+    if paths["sampling"].exists():
+        return {**meta, "report": paths["sampling"].read_text(encoding="utf-8")}
+    if not paths["cprofile"].exists():
+        return None
+
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Ordenação inválida: {sort} (use {', '.join(SORT_KEYS)})")
+    stats = pstats.Stats(str(paths["cprofile"]))
+    index = {"ncalls": 1, "tottime": 2, "cumulative": 3}[sort]
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:top]
+
+    functions = []
+    for (filename, line, name), (cc, nc, tt, ct, _callers) in rows:
+        functions.append({
+            "function": f"{filename}:{line}({name})",
+            "ncalls": nc if nc == cc else f"{nc}/{cc}",
+            "tottime": round(tt, 6),
+            "cumtime": round(ct, 6),
+            "percall": round(ct / cc, 6) if cc else 0.0,
+        })
+    return {**meta, "sort": sort, "total_calls": stats.total_calls,
+            "total_time": round(stats.total_tt, 6), "functions": functions}
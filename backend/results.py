@@ -0,0 +1,95 @@
+"""Resultados de conversão endereçáveis por job id.
+
+Depois da conversão a saída sai do diretório do job e vai para
+`<raiz>/<job_id>/result`, com os metadados em `meta.json`. Ela fica
+disponível em `/api/jobs/{job_id}/result` por `RESULT_TTL` segundos, então um
+download interrompido pode ser retomado com `Range` em vez de refazer a
+conversão.
+"""
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+RESULT_TTL = float(os.environ.get("CONVERTUDO_RESULT_TTL", "3600"))
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ResultStore:
+    def __init__(self, root: Path, ttl: float = RESULT_TTL):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _dir(self, job_id: str) -> Path | None:
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        return self.root / job_id
+
+    def put(self, job_id: str, source: Path, filename: str, media_type: str, **fields) -> dict:
+        """Move `source` para o armazenamento de resultados e grava os metadados."""
+        job_dir = self.root / job_id
+        job_dir.mkdir(parents=True)
+        dest = job_dir / "result"
+        shutil.move(str(source), dest)
+        size = dest.stat().st_size
+        created = time.time()
+        meta = {
+            "job_id": job_id,
+            "filename": filename,
+            "media_type": media_type,
+            "size": size,
+            # O conteúdo de um job nunca muda: id + tamanho bastam para um ETag forte
+            "etag": f'"{job_id}-{size:x}"',
+            "created": created,
+            "expires_at": created + self.ttl,
+            **fields,
+        }
+        tmp = job_dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, job_dir / "meta.json")
+        return meta
+
+    def get(self, job_id: str) -> dict | None:
+        """Metadados do resultado, ou None se não existir ou tiver expirado."""
+        job_dir = self._dir(job_id)
+        if job_dir is None:
+            return None
+        try:
+            meta = json.loads((job_dir / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta["expires_at"] < time.time() or not (job_dir / "result").exists():
+            self.remove(job_id)
+            return None
+        return meta
+
+    def path(self, job_id: str) -> Path:
+        return self.root / job_id / "result"
+
+    def remove(self, job_id: str) -> None:
+        job_dir = self._dir(job_id)
+        if job_dir is not None:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def sweep(self) -> int:
+        """Remove resultados expirados. Retorna quantos foram apagados."""
+        now = time.time()
+        removed = 0
+        for job_dir in self.root.iterdir():
+            try:
+                meta = json.loads((job_dir / "meta.json").read_text(encoding="utf-8"))
+                expired = meta["expires_at"] < now
+            except (OSError, ValueError, KeyError):
+                # Sem metadados: gravação interrompida; espera um TTL antes de apagar
+                try:
+                    expired = now - job_dir.stat().st_mtime > self.ttl
+                except OSError:
+                    continue
+            if expired:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                removed += 1
+        return removed
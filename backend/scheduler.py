@@ -0,0 +1,157 @@
+"""Escalonador justo na frente do executor de conversões.
+
+O executor do asyncio é uma fila FIFO única: um cliente que envia 500 jobs
+em lote ocupa todas as threads. Este escalonador mantém uma fila por cliente
+(API key ou IP) dentro de cada classe de prioridade e só entrega ao executor
+quando há thread livre:
+
+- a classe `interactive` é sempre atendida antes da `batch`; a `batch`
+  recebe uma vaga a cada `BATCH_SHARE` despachos para não morrer de fome;
+- dentro da classe, os clientes são atendidos em round-robin;
+- dentro do cliente, o job de menor custo estimado (tamanho × peso da
+  categoria) sai primeiro.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable
+
+import metrics
+
+PRIORITIES = ("interactive", "batch")
+
+# A cada N despachos, um vai para a classe batch se houver jobs esperando
+BATCH_SHARE = max(1, int(os.environ.get("CONVERTUDO_BATCH_SHARE", "4")))
+# Clientes com mais jobs em andamento (na fila ou executando) que isso têm os
+# excedentes rebaixados para batch
+INTERACTIVE_LIMIT = int(os.environ.get("CONVERTUDO_INTERACTIVE_LIMIT", "4"))
+
+# Peso relativo de custo por categoria (1 MB de vídeo custa bem mais que 1 MB de YAML)
+CATEGORY_COST: dict[str, float] = {
+    "Vídeo": 20.0, "Áudio": 4.0, "CAD": 10.0, "3D": 4.0, "RAW": 6.0, "HDR": 4.0,
+    "Apresentação": 8.0, "Office": 8.0, "OpenDocument": 8.0, "Notebook": 6.0,
+    "Imagem": 2.0, "Adobe": 3.0, "Documento": 2.0, "BigData": 2.0, "Científico": 2.0,
+    "Médico": 2.0,
+}
+BASE_COST = 0.05  # custo fixo (MB equivalentes) de qualquer job
+
+SCHEDULER_PENDING = metrics.Gauge(
+    "convertudo_scheduler_pending",
+    "Jobs aguardando despacho para o executor por prioridade.",
+    ("priority",),
+)
+SCHEDULER_WAIT_SECONDS = metrics.Histogram(
+    "convertudo_scheduler_wait_seconds",
+    "Tempo entre a entrada no escalonador e o despacho ao executor.",
+    ("priority",),
+)
+
+
+def estimate_cost(category: str, input_bytes: int) -> float:
+    return BASE_COST + CATEGORY_COST.get(category, 1.0) * input_bytes / (1024 * 1024)
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future", "queued_at")
+
+    def __init__(self, fn: Callable, args: tuple, future: asyncio.Future, queued_at: float):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.queued_at = queued_at
+
+
+class _PriorityClass:
+    """Round-robin entre clientes; heap de custo por cliente."""
+
+    def __init__(self):
+        self.clients: OrderedDict[str, list] = OrderedDict()
+        self.size = 0
+
+    def push(self, client: str, cost: float, seq: int, job: _Job) -> None:
+        heapq.heappush(self.clients.setdefault(client, []), (cost, seq, job))
+        self.size += 1
+
+    def pop(self) -> _Job | None:
+        while self.clients:
+            client, heap = next(iter(self.clients.items()))
+            _, _, job = heapq.heappop(heap)
+            self.size -= 1
+            # Cliente vai para o fim da fila (ou sai, se esvaziou)
+            del self.clients[client]
+            if heap:
+                self.clients[client] = heap
+            if not job.future.cancelled():
+                return job
+        return None
+
+
+class FairScheduler:
+    def __init__(self, executor: Executor, workers: int):
+        self.executor = executor
+        self.workers = workers
+        self._classes = {p: _PriorityClass() for p in PRIORITIES}
+        self._pending_by_client: dict[str, int] = {}
+        self._running = 0
+        self._dispatched = 0
+        self._seq = itertools.count()
+
+    def pending(self, client: str) -> int:
+        return self._pending_by_client.get(client, 0)
+
+    async def run(self, fn: Callable, *args, client: str = "", priority: str = "interactive",
+                  cost: float = 0.0):
+        """Agenda `fn(*args)` no executor respeitando a política justa e aguarda o resultado."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridade inválida: {priority}")
+        if priority == "interactive" and self.pending(client) >= INTERACTIVE_LIMIT:
+            priority = "batch"
+
+        loop = asyncio.get_running_loop()
+        job = _Job(fn, args, loop.create_future(), loop.time())
+        self._classes[priority].push(client, cost, next(self._seq), job)
+        SCHEDULER_PENDING.set(self._classes[priority].size, priority=priority)
+        self._pending_by_client[client] = self.pending(client) + 1
+        try:
+            self._dispatch()
+            inner = await job.future
+            SCHEDULER_WAIT_SECONDS.observe(loop.time() - job.queued_at, priority=priority)
+            # Cancelar a espera não interrompe a thread: a vaga só é liberada pelo _on_done
+            return await asyncio.shield(inner)
+        finally:
+            self._pending_by_client[client] -= 1
+            if not self._pending_by_client[client]:
+                del self._pending_by_client[client]
+
+    def _next_class(self) -> str | None:
+        interactive, batch = self._classes["interactive"], self._classes["batch"]
+        if batch.size and (not interactive.size or self._dispatched % BATCH_SHARE == BATCH_SHARE - 1):
+            return "batch"
+        if interactive.size:
+            return "interactive"
+        return None
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._running < self.workers:
+            priority = self._next_class()
+            if priority is None:
+                return
+            job = self._classes[priority].pop()
+            SCHEDULER_PENDING.set(self._classes[priority].size, priority=priority)
+            if job is None:
+                continue
+            self._running += 1
+            self._dispatched += 1
+            work = self.executor.submit(job.fn, *job.args)
+            # Callback do future do executor: roda quando a função realmente termina
+            work.add_done_callback(lambda _work: loop.call_soon_threadsafe(self._on_done))
+            # O chamador recebe o future do executor e aguarda o resultado real
+            job.future.set_result(asyncio.wrap_future(work, loop=loop))
+
+    def _on_done(self) -> None:
+        self._running -= 1
+        self._dispatch()
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, Budget
+
+
+def _controller(slots: int = 1, max_waiting: int = 1) -> AdmissionController:
+    ctrl = AdmissionController(cpu_budget=8, memory_budget_mb=1024, max_waiting=max_waiting)
+    ctrl.budgets["Vídeo"] = Budget(slots=slots, cpu=1.0, memory_mb=64)
+    return ctrl
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        ctrl = _controller(slots=1, max_waiting=1)
+        first = await ctrl.acquire("Vídeo")
+        waiter = asyncio.ensure_future(ctrl.acquire("Vídeo"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as exc:
+            await ctrl.acquire("Vídeo")
+        assert exc.value.category == "Vídeo"
+        assert exc.value.retry_after >= 1
+        ctrl.release(first)
+        ctrl.release(await waiter)
+        assert ctrl._running == 0
+
+    asyncio.run(scenario())
+
+
+def test_release_admits_the_next_waiter():
+    async def scenario():
+        ctrl = _controller(slots=1, max_waiting=4)
+        grant = await ctrl.acquire("Vídeo")
+        waiter = asyncio.ensure_future(ctrl.acquire("Vídeo"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        # Como em main.py: a vaga volta no finally, inclusive quando a conversão falha
+        with pytest.raises(RuntimeError):
+            try:
+                raise RuntimeError("conversão falhou")
+            finally:
+                ctrl.release(grant)
+        second = await asyncio.wait_for(waiter, 1)
+        assert ctrl._active["Vídeo"] == 1
+        ctrl.release(second)
+        assert ctrl._active["Vídeo"] == 0
+        assert ctrl._cpu_used == 0 and ctrl._memory_used == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        ctrl = _controller(slots=1, max_waiting=4)
+        grant = await ctrl.acquire("Vídeo")
+        waiter = asyncio.ensure_future(ctrl.acquire("Vídeo"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not ctrl._waiting["Vídeo"]
+        ctrl.release(grant)
+        assert ctrl._running == 0
+
+    asyncio.run(scenario())
+
+
+def test_other_categories_are_not_blocked():
+    async def scenario():
+        ctrl = _controller(slots=1)
+        video = await ctrl.acquire("Vídeo")
+        config = await asyncio.wait_for(ctrl.acquire("Config"), 1)
+        ctrl.release(config)
+        ctrl.release(video)
+
+    asyncio.run(scenario())
+
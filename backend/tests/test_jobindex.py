@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from jobindex import LocalIndex, SQLiteIndex, cache_key
+
+
+@pytest.fixture(params=["local", "sqlite"])
+def index(request, tmp_path):
+    if request.param == "local":
+        return LocalIndex()
+    return SQLiteIndex(tmp_path / "shared" / "jobs.sqlite3")
+
+
+def test_cache_key_depends_on_options():
+    assert cache_key("abc", "png", "jpg") == cache_key("abc", "png", "jpg", {})
+    assert cache_key("abc", "png", "jpg") != cache_key("abc", "png", "jpg", {"max_width": 10})
+
+
+def test_second_claim_waits_for_the_running_job(index):
+    assert index.claim("k", "job-1") is None
+    assert index.claim("k", "job-2") == ("running", "job-1")
+
+
+def test_completed_job_is_reused_until_it_expires(index):
+    index.claim("k", "job-1")
+    index.complete("k", "job-1", time.time() + 60)
+    assert index.claim("k", "job-2") == ("done", "job-1")
+
+    index.complete("k", "job-1", time.time() - 1)
+    assert index.claim("k", "job-2") is None
+
+
+def test_expired_lease_can_be_taken_over(index):
+    assert index.claim("k", "job-1", lease_ttl=-1) is None
+    # O dono parou de renovar (nó caiu): o próximo assume a chave
+    assert index.claim("k", "job-2") is None
+    assert index.claim("k", "job-3") == ("running", "job-2")
+
+
+def test_renew_keeps_the_lease_alive(index):
+    index.claim("k", "job-1", lease_ttl=-1)
+    index.renew("k", "job-1", lease_ttl=60)
+    assert index.claim("k", "job-2") == ("running", "job-1")
+    # Só o dono renova
+    index.renew("k", "job-2", lease_ttl=-1)
+    assert index.claim("k", "job-2") == ("running", "job-1")
+
+
+def test_release_only_by_the_owner(index):
+    index.claim("k", "job-1")
+    index.release("k", "job-2")
+    assert index.claim("k", "job-3") == ("running", "job-1")
+    index.release("k", "job-1")
+    assert index.claim("k", "job-3") is None
+
+
+def test_sweep_drops_dead_rows(index):
+    index.claim("running", "job-1", lease_ttl=-1)
+    index.claim("done", "job-2")
+    index.complete("done", "job-2", time.time() - 1)
+    index.claim("alive", "job-3")
+    assert index.sweep() == 2
+    assert index.claim("alive", "job-4") == ("running", "job-3")
+
+
+def test_sqlite_index_is_shared_between_instances(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    node_a, node_b = SQLiteIndex(path), SQLiteIndex(path)
+    assert node_a.claim("k", "job-1") is None
+    assert node_b.claim("k", "job-2") == ("running", "job-1")
+    node_a.complete("k", "job-1", time.time() + 60)
+    assert node_b.claim("k", "job-2") == ("done", "job-1")
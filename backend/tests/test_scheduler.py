@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import scheduler
+from scheduler import FairScheduler
+
+
+def _blocker():
+    """Função que segura a única vaga do escalonador até `release.set()`."""
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        return "bloqueio"
+
+    return fn, started, release
+
+
+async def _wait_for(event: threading.Event) -> None:
+    assert await asyncio.to_thread(event.wait, 5)
+
+
+def _run_queued(jobs):
+    """Executa `jobs` ([(cliente, prioridade, nome)]) atrás de um bloqueio; devolve a ordem de execução."""
+    order = []
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            sched = FairScheduler(executor, workers=1)
+            fn, started, release = _blocker()
+            first = asyncio.ensure_future(sched.run(fn, client="x"))
+            await _wait_for(started)
+            tasks = [
+                asyncio.ensure_future(sched.run(order.append, name, client=client, priority=priority))
+                for client, priority, name in jobs
+            ]
+            await asyncio.sleep(0)
+            release.set()
+            await first
+            await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    return order
+
+
+def test_clients_are_served_round_robin():
+    order = _run_queued([("a", "interactive", "a1"), ("a", "interactive", "a2"), ("b", "interactive", "b1")])
+    assert order == ["a1", "b1", "a2"]
+
+
+def test_batch_gets_one_in_batch_share_dispatches(monkeypatch):
+    monkeypatch.setattr(scheduler, "BATCH_SHARE", 4)
+    jobs = [("b", "batch", "batch")] + [(f"c{i}", "interactive", f"i{i}") for i in range(4)]
+    order = _run_queued(jobs)
+    # O bloqueio foi o 1º despacho; o 4º vai para a classe batch
+    assert order == ["i0", "i1", "batch", "i2", "i3"]
+
+
+def test_cancelled_wait_keeps_the_slot_until_the_thread_finishes():
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            sched = FairScheduler(executor, workers=1)
+            fn, started, release = _blocker()
+            waiting = asyncio.ensure_future(sched.run(fn, client="a"))
+            await _wait_for(started)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            # A thread ainda converte: a vaga continua ocupada
+            assert sched._running == 1
+
+            ran = threading.Event()
+            second = asyncio.ensure_future(sched.run(ran.set, client="b"))
+            await asyncio.sleep(0.05)
+            assert not ran.is_set()
+
+            release.set()
+            await asyncio.wait_for(second, 5)
+            assert ran.is_set()
+            assert sched._running == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,19 @@
+from converters import sniff
+
+
+def _id3_tag(size: int) -> bytes:
+    syncsafe = bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + syncsafe + b"\x00" * size
+
+
+def test_id3_before_flac_is_sniffed():
+    head = _id3_tag(100) + b"fLaC" + b"\x00" * 32
+    assert sniff.sniff(head) == "flac"
+    assert sniff.resolve("flac", head, lambda ext: True) == ("flac", "flac")
+
+
+def test_id3_larger_than_head_keeps_declared_ext():
+    head = (_id3_tag(sniff.HEAD_SIZE * 4) + b"fLaC")[:sniff.HEAD_SIZE]
+    assert sniff.sniff(head) is None
+    for ext in ("flac", "ogg", "mp3"):
+        assert sniff.resolve(ext, head, lambda ext: True) == (ext, None)
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from uploads import UploadError, UploadStore, _merge, _missing
+
+DATA = bytes(range(256)) * 64  # 16 KB
+
+
+async def _stream(data: bytes, piece: int = 1000):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+def _put(store, upload_id, offset, data, sha256=True):
+    digest = hashlib.sha256(data).hexdigest() if sha256 else None
+    return asyncio.run(store.write_chunk(upload_id, offset, _stream(data), None if sha256 else len(data), digest))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(tmp_path / "uploads")
+
+
+def test_merge_joins_overlapping_and_adjacent_ranges():
+    assert _merge([(10, 20), (0, 5), (5, 8), (15, 30), (40, 50)]) == [(0, 8), (10, 30), (40, 50)]
+
+
+def test_missing_lists_the_gaps():
+    assert _missing([(0, 8), (10, 30)], 50) == [(8, 10), (30, 50)]
+    assert _missing([], 5) == [(0, 5)]
+    assert _missing([(0, 5)], 5) == []
+
+
+def test_out_of_order_chunks_complete_the_file(store, tmp_path):
+    upload_id = store.create("a.bin", len(DATA))["upload_id"]
+    third = len(DATA) // 3
+    _put(store, upload_id, 2 * third, DATA[2 * third:])
+    _put(store, upload_id, 0, DATA[:third], sha256=False)
+    status = store.status(upload_id)
+    assert not status["complete"]
+    assert status["missing"] == [[third, 2 * third]]
+
+    _put(store, upload_id, third, DATA[third:2 * third])
+    assert store.status(upload_id)["complete"]
+    size, digest = store.assemble(upload_id, tmp_path / "input.bin", hashlib.sha256(DATA).hexdigest())
+    assert size == len(DATA) and digest == hashlib.sha256(DATA).hexdigest()
+    assert (tmp_path / "input.bin").read_bytes() == DATA
+
+
+def test_bad_checksum_does_not_touch_accepted_bytes(store):
+    upload_id = store.create("a.bin", len(DATA))["upload_id"]
+    _put(store, upload_id, 0, DATA[:4096])
+    with pytest.raises(UploadError) as exc:
+        asyncio.run(store.write_chunk(upload_id, 0, _stream(b"x" * 4096), None, "0" * 64))
+    assert exc.value.status_code == 422
+    assert store.data_path(upload_id).read_bytes()[:4096] == DATA[:4096]
+    assert store.received(upload_id) == [(0, 4096)]
+    # Nenhum temporário do bloco recusado fica para trás
+    assert sorted(p.name for p in store.data_path(upload_id).parent.iterdir()) == ["chunks", "data", "session.json"]
+
+
+def test_incomplete_chunk_is_not_recorded(store):
+    upload_id = store.create("a.bin", len(DATA))["upload_id"]
+    with pytest.raises(UploadError) as exc:
+        asyncio.run(store.write_chunk(upload_id, 0, _stream(DATA[:100]), 200, None))
+    assert exc.value.status_code == 400
+    assert store.received(upload_id) == []
+
+
+def test_assemble_refuses_incomplete_upload(store, tmp_path):
+    upload_id = store.create("a.bin", len(DATA))["upload_id"]
+    _put(store, upload_id, 0, DATA[:1000])
+    with pytest.raises(UploadError) as exc:
+        store.assemble(upload_id, tmp_path / "input.bin")
+    assert exc.value.status_code == 409
+
+
+def test_chunk_after_assemble_does_not_change_the_job_input(store, tmp_path):
+    upload_id = store.create("a.bin", len(DATA))["upload_id"]
+    _put(store, upload_id, 0, DATA)
+    store.assemble(upload_id, tmp_path / "input.bin")
+    _put(store, upload_id, 0, b"y" * 100)
+    assert (tmp_path / "input.bin").read_bytes() == DATA
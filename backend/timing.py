@@ -0,0 +1,70 @@
+"""Medição por fase de cada job de conversão (Server-Timing + log JSON)."""
+import json
+import logging
+import resource
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("convertudo.jobs")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _children_usage() -> resource.struct_rusage:
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+class JobTimer:
+    """Acumula a duração de cada fase de um job.
+
+    As fases aparecem no header `Server-Timing` na ordem em que foram
+    registradas. O uso de CPU dos processos filhos (FFmpeg, LibreOffice,
+    Ghostscript…) é a diferença de `RUSAGE_CHILDREN` entre o início e o fim do
+    job; com jobs concorrentes o valor inclui filhos de outros jobs que
+    terminaram no mesmo intervalo.
+    """
+
+    def __init__(self, job_id: str, **fields):
+        self.job_id = job_id
+        self.fields = dict(fields)
+        self.phases: dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._children_start = _children_usage()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self._start) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def log(self, status: str, **fields) -> None:
+        """Emite uma linha JSON com as fases, CPU e pico de RSS dos processos filhos."""
+        end = _children_usage()
+        record = {
+            "event": "convert_job",
+            "job_id": self.job_id,
+            "status": status,
+            **self.fields,
+            **fields,
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 1),
+            "phases_ms": {k: round(v * 1000, 1) for k, v in self.phases.items()},
+            "children_cpu_user_s": round(end.ru_utime - self._children_start.ru_utime, 3),
+            "children_cpu_sys_s": round(end.ru_stime - self._children_start.ru_stime, 3),
+            # ru_maxrss é o maior RSS entre todos os filhos já finalizados (KB no Linux)
+            "children_peak_rss_kb": end.ru_maxrss,
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,283 @@
+"""Uploads retomáveis em blocos.
+
+O cliente cria uma sessão informando nome e tamanho do arquivo, envia os
+blocos com `PUT ?offset=` (em qualquer ordem e em paralelo) e finaliza a
+sessão num job de conversão. Cada bloco é recebido num arquivo temporário da
+sessão (em pedaços de até 1 MB na memória), conferido e só então copiado
+direto na posição final do arquivo; o disco é sempre acessado numa thread, fora
+do event loop. Um bloco com SHA-256 (`X-Chunk-Sha256`) que não confere não
+toca em bytes já aceitos. Sem checksum, o bloco precisa de `Content-Length` e
+chegar inteiro.
+
+O arquivo `data` pode ser compartilhado (hard link) com o job que o converte;
+a gravação de um bloco nesse estado troca antes o arquivo da sessão por uma
+cópia, para não alterar a entrada do job. Um `flock` no `data` separa as
+gravações da montagem, também entre workers.
+
+Os blocos recebidos ficam registrados como arquivos-marcador
+(`chunks/<offset>-<fim>`) ao lado dos dados: o estado sobrevive a reinícios
+do servidor e vale para vários workers compartilhando o mesmo diretório.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+MB = 1024 * 1024
+
+CHUNK_SIZE = int(float(os.environ.get("CONVERTUDO_UPLOAD_CHUNK_MB", "8")) * MB)
+MAX_CHUNK_SIZE = max(CHUNK_SIZE, 64 * MB)
+# Memória por PUT: o bloco vai para o disco em pedaços deste tamanho
+SPOOL_BUFFER = MB
+UPLOAD_TTL = float(os.environ.get("CONVERTUDO_UPLOAD_TTL", str(24 * 3600)))
+# Limites globais: sessões abertas e bytes reservados (arquivos esparsos) somados
+MAX_SESSIONS = int(os.environ.get("CONVERTUDO_UPLOAD_MAX_SESSIONS", "100"))
+MAX_RESERVED_BYTES = int(float(os.environ.get("CONVERTUDO_UPLOAD_MAX_MB", "51200")) * MB)
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_CHUNK_RE = re.compile(r"^(\d+)-(\d+)$")
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _merge(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[list[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _discard(spool, spool_path: Path) -> None:
+    spool.close()
+    spool_path.unlink(missing_ok=True)
+
+
+def _missing(received: list[tuple[int, int]], size: int) -> list[tuple[int, int]]:
+    gaps, pos = [], 0
+    for start, end in received:
+        if start > pos:
+            gaps.append((pos, start))
+        pos = max(pos, end)
+    if pos < size:
+        gaps.append((pos, size))
+    return gaps
+
+
+class UploadStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> Path:
+        if not _ID_RE.match(upload_id):
+            raise UploadError(400, "upload id inválido")
+        path = self.root / upload_id
+        if not (path / "session.json").exists():
+            raise UploadError(404, "Sessão de upload não encontrada ou expirada")
+        return path
+
+    def _reserved(self) -> tuple[int, int]:
+        """Sessões abertas e a soma dos tamanhos reservados por elas."""
+        count = reserved = 0
+        for path in self.root.iterdir():
+            try:
+                session = json.loads((path / "session.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            count += 1
+            reserved += session["size"]
+        return count, reserved
+
+    def create(self, filename: str, size: int) -> dict:
+        # Conferência aproximada entre workers: dois create simultâneos podem passar juntos
+        count, reserved = self._reserved()
+        if count >= MAX_SESSIONS:
+            raise UploadError(429, "Muitas sessões de upload abertas, tente mais tarde")
+        if reserved + size > MAX_RESERVED_BYTES:
+            raise UploadError(507, "Sem espaço reservável para novos uploads, tente mais tarde")
+        upload_id = uuid.uuid4().hex
+        path = self.root / upload_id
+        (path / "chunks").mkdir(parents=True)
+        # Reserva o tamanho final: os blocos são gravados direto na posição certa
+        with open(path / "data", "wb") as f:
+            f.truncate(size)
+        session = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "size": size,
+            "chunk_size": CHUNK_SIZE,
+            "created": time.time(),
+        }
+        tmp = path / "session.json.tmp"
+        tmp.write_text(json.dumps(session, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path / "session.json")
+        return {**session, "expires_at": session["created"] + UPLOAD_TTL}
+
+    def session(self, upload_id: str) -> dict:
+        path = self._dir(upload_id)
+        return json.loads((path / "session.json").read_text(encoding="utf-8"))
+
+    def received(self, upload_id: str) -> list[tuple[int, int]]:
+        ranges = []
+        for marker in (self._dir(upload_id) / "chunks").iterdir():
+            m = _CHUNK_RE.match(marker.name)
+            if m:
+                ranges.append((int(m.group(1)), int(m.group(2))))
+        return _merge(ranges)
+
+    def status(self, upload_id: str) -> dict:
+        session = self.session(upload_id)
+        received = self.received(upload_id)
+        missing = _missing(received, session["size"])
+        return {
+            **session,
+            "expires_at": session["created"] + UPLOAD_TTL,
+            "received_bytes": sum(e - s for s, e in received),
+            "missing": [list(r) for r in missing],
+            "complete": not missing,
+        }
+
+    async def write_chunk(self, upload_id: str, offset: int, stream, length: int | None,
+                          sha256: str | None) -> dict:
+        """Grava um bloco vindo de `stream` (iterador assíncrono de bytes) em `offset`."""
+        session = self.session(upload_id)
+        path = self._dir(upload_id)
+        size = session["size"]
+        if offset < 0 or offset >= size:
+            raise UploadError(416, f"Offset fora do arquivo (0–{size - 1})")
+        limit = min(size - offset, MAX_CHUNK_SIZE)
+        if length is not None and length > limit:
+            raise UploadError(413, f"Bloco maior que o permitido ({limit} bytes neste offset)")
+        if not sha256 and length is None:
+            raise UploadError(411, "Bloco sem X-Chunk-Sha256 precisa de Content-Length")
+
+        # Bloco num arquivo temporário: nada chega ao `data` antes de conferido, e a
+        # memória por PUT fica em SPOOL_BUFFER, seja qual for o tamanho do bloco
+        spool_path = path / f"chunk.{uuid.uuid4().hex}.tmp"
+        spool = await asyncio.to_thread(open, spool_path, "w+b")
+        try:
+            buffer = bytearray()
+            written = 0
+            digest = hashlib.sha256()
+            async for piece in stream:
+                if not piece:
+                    continue
+                if written + len(piece) > limit:
+                    raise UploadError(413, f"Bloco maior que o permitido ({limit} bytes neste offset)")
+                digest.update(piece)
+                buffer += piece
+                written += len(piece)
+                if len(buffer) >= SPOOL_BUFFER:
+                    await asyncio.to_thread(spool.write, buffer)
+                    buffer = bytearray()
+            await asyncio.to_thread(spool.write, buffer)
+
+            if written == 0:
+                raise UploadError(400, "Bloco vazio")
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise UploadError(422, "SHA-256 do bloco não confere, reenvie")
+            if not sha256 and written != length:
+                raise UploadError(400, f"Bloco incompleto: {written} de {length} bytes")
+
+            await asyncio.to_thread(self._commit, path, offset, spool, written)
+        finally:
+            await asyncio.to_thread(_discard, spool, spool_path)
+        return {"offset": offset, "length": written, "sha256": digest.hexdigest()}
+
+    def _commit(self, path: Path, offset: int, spool, length: int) -> None:
+        """Copia um bloco já conferido para o `data` e o registra como recebido (roda fora do event loop)."""
+        while True:
+            with open(path / "data", "r+b") as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                st = os.fstat(f.fileno())
+                # Ainda é o `data` da sessão e não está ligado a um job: grava nele
+                if st.st_nlink == 1 and st.st_ino == os.stat(path / "data").st_ino:
+                    spool.seek(0)
+                    pos = offset
+                    while block := spool.read(MB):
+                        os.pwrite(f.fileno(), block, pos)
+                        pos += len(block)
+                    break
+            self._unshare(path)
+        (path / "chunks" / f"{offset}-{offset + length}").touch()
+
+    @staticmethod
+    def _unshare(path: Path) -> None:
+        """Troca o `data` ligado a um job por uma cópia só da sessão."""
+        with open(path / "data", "rb") as f:
+            # Exclusivo: espera gravações em curso e não corre com assemble()
+            fcntl.flock(f, fcntl.LOCK_EX)
+            st = os.fstat(f.fileno())
+            if st.st_nlink > 1 and st.st_ino == os.stat(path / "data").st_ino:
+                tmp = path / f"data.{uuid.uuid4().hex}.tmp"
+                shutil.copyfile(path / "data", tmp)
+                os.replace(tmp, path / "data")
+
+    def head(self, upload_id: str, size: int) -> bytes:
+        """Primeiros `size` bytes do arquivo, se já foram recebidos."""
+        total = self.session(upload_id)["size"]
+        received = self.received(upload_id)
+        if not received or received[0][0] != 0 or received[0][1] < min(size, total):
+            raise UploadError(409, "Início do arquivo ainda não foi recebido")
+        with open(self.data_path(upload_id), "rb") as f:
+            return f.read(size)
+
+    def data_path(self, upload_id: str) -> Path:
+        return self._dir(upload_id) / "data"
+
+    def assemble(self, upload_id: str, dest: Path, sha256: str | None = None) -> tuple[int, str]:
+        """Verifica se todos os blocos chegaram e coloca o arquivo completo em `dest`.
+
+        Retorna o tamanho e o SHA-256 do arquivo.
+        """
+        status = self.status(upload_id)
+        if not status["complete"]:
+            missing = sum(e - s for s, e in status["missing"])
+            raise UploadError(409, f"Upload incompleto: faltam {missing} bytes")
+        data = self.data_path(upload_id)
+        digest = hashlib.sha256()
+        with open(data, "rb") as f:
+            # Exclusivo: nenhum bloco é gravado entre o hash e o link
+            fcntl.flock(f, fcntl.LOCK_EX)
+            while block := f.read(MB):
+                digest.update(block)
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise UploadError(422, "SHA-256 do arquivo não confere")
+            try:
+                # Mesmo sistema de arquivos: sem cópia. A sessão continua válida até ser
+                # removida; um PUT posterior grava numa cópia (`_commit`), não no job
+                os.link(data, dest)
+            except OSError:
+                shutil.copyfile(data, dest)
+        return status["size"], digest.hexdigest()
+
+    def remove(self, upload_id: str) -> None:
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def sweep(self) -> int:
+        """Remove sessões mais velhas que UPLOAD_TTL (pela última atividade)."""
+        now = time.time()
+        removed = 0
+        for path in self.root.iterdir():
+            try:
+                last = max(path.stat().st_mtime, (path / "chunks").stat().st_mtime)
+            except OSError:
+                last = 0
+            if now - last > UPLOAD_TTL:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
@@ -0,0 +1,221 @@
+"""Diretórios de trabalho por job com cota e coleta de órfãos.
+
+Cada job ganha um diretório próprio (`<raiz>/jobs/<job_id>/`) onde ficam a
+entrada, a saída e qualquer intermediário dos conversores
+(`.palette.png`, `.tmp.svg`, `.tmp.html`…). Apagar o diretório apaga tudo,
+mesmo quando o conversor falha no meio do caminho.
+
+O arquivo `.owner` de cada diretório guarda host e PID do processo dono. A
+varredura periódica remove diretórios de processos que morreram (crash,
+worker morto) e diretórios inativos mais velhos que `ORPHAN_AGE`.
+
+Jobs pequenos podem usar um diretório em tmpfs (`CONVERTUDO_TMPFS_DIR`, por
+exemplo `/dev/shm/convertudo`) para não tocar o disco.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+import socket
+import time
+from pathlib import Path
+
+import metrics
+
+MB = 1024 * 1024
+
+JOB_QUOTA_BYTES = int(float(os.environ.get("CONVERTUDO_JOB_QUOTA_MB", "4096")) * MB)
+MIN_FREE_BYTES = int(float(os.environ.get("CONVERTUDO_MIN_FREE_MB", "512")) * MB)
+ORPHAN_AGE = float(os.environ.get("CONVERTUDO_ORPHAN_AGE", "3600"))
+SWEEP_INTERVAL = float(os.environ.get("CONVERTUDO_SWEEP_INTERVAL", "300"))
+TMPFS_DIR = os.environ.get("CONVERTUDO_TMPFS_DIR", "")
+TMPFS_MAX_BYTES = int(float(os.environ.get("CONVERTUDO_TMPFS_MAX_MB", "64")) * MB)
+
+CHUNK_SIZE = 1 * MB
+_HOST = socket.gethostname()
+
+WORKSPACE_JOBS = metrics.Gauge(
+    "convertudo_workspace_jobs",
+    "Diretórios de job ativos neste processo.",
+    ("storage",),
+)
+WORKSPACE_SWEPT = metrics.Counter(
+    "convertudo_workspace_swept_total",
+    "Diretórios órfãos removidos pela varredura.",
+    ("reason",),
+)
+WORKSPACE_QUOTA_EXCEEDED = metrics.Counter(
+    "convertudo_workspace_quota_exceeded_total",
+    "Jobs interrompidos por exceder a cota de disco.",
+)
+
+
+class QuotaExceeded(Exception):
+    """O job passou da cota de disco (upload ou saída)."""
+
+
+class InsufficientSpace(Exception):
+    """Não há espaço livre suficiente para aceitar o job."""
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Workspace:
+    def __init__(self, root: Path, tmpfs_root: str = TMPFS_DIR,
+                 job_quota_bytes: int = JOB_QUOTA_BYTES, tmpfs_max_bytes: int = TMPFS_MAX_BYTES):
+        self.root = Path(root) / "jobs"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.tmpfs_root = None
+        if tmpfs_root:
+            self.tmpfs_root = Path(tmpfs_root) / "jobs"
+            self.tmpfs_root.mkdir(parents=True, exist_ok=True)
+        self.job_quota_bytes = job_quota_bytes
+        self.tmpfs_max_bytes = tmpfs_max_bytes
+        self._active: dict[str, Path] = {}
+
+    def roots(self) -> list[Path]:
+        return [r for r in (self.root, self.tmpfs_root) if r is not None]
+
+    def _pick_root(self, expected_bytes: int) -> Path:
+        if self.tmpfs_root is not None and 0 < expected_bytes <= self.tmpfs_max_bytes:
+            # Entrada + saída + intermediários cabem com folga?
+            if shutil.disk_usage(self.tmpfs_root).free > expected_bytes * 4:
+                return self.tmpfs_root
+        if shutil.disk_usage(self.root).free - expected_bytes * 2 < MIN_FREE_BYTES:
+            raise InsufficientSpace("Espaço em disco insuficiente no servidor, tente mais tarde")
+        return self.root
+
+    def create(self, job_id: str, expected_bytes: int = 0) -> Path:
+        """Cria o diretório do job e o marca como pertencente a este processo."""
+        root = self._pick_root(expected_bytes)
+        job_dir = root / job_id
+        job_dir.mkdir(parents=True)
+        (job_dir / ".owner").write_text(f"{_HOST} {os.getpid()}", encoding="utf-8")
+        self._active[job_id] = job_dir
+        WORKSPACE_JOBS.inc(storage=self._storage(job_dir))
+        return job_dir
+
+    def path(self, job_id: str) -> Path | None:
+        return self._active.get(job_id)
+
+    def remove(self, job_id: str) -> None:
+        job_dir = self._active.pop(job_id, None)
+        if job_dir is None:
+            return
+        WORKSPACE_JOBS.dec(storage=self._storage(job_dir))
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    def _storage(self, job_dir: Path) -> str:
+        return "tmpfs" if self.tmpfs_root is not None and job_dir.parent == self.tmpfs_root else "disk"
+
+    def check_quota(self, job_id: str) -> int:
+        """Levanta QuotaExceeded se o diretório do job passou da cota; retorna o uso."""
+        used = dir_size(self._active[job_id])
+        if used > self.job_quota_bytes:
+            WORKSPACE_QUOTA_EXCEEDED.inc()
+            raise QuotaExceeded(
+                f"Job excedeu a cota de {self.job_quota_bytes // MB} MB de disco"
+            )
+        return used
+
+    async def save_upload(self, upload, dest: Path) -> tuple[int, str]:
+        """Copia um UploadFile para `dest` em blocos, respeitando a cota do job.
+
+        Retorna o tamanho e o SHA-256 do arquivo (calculado durante a cópia).
+        Abertura, escrita e hash rodam em threads, fora do event loop.
+        """
+        written = 0
+        digest = hashlib.sha256()
+
+        def write(chunk: bytes) -> None:
+            digest.update(chunk)
+            f.write(chunk)
+
+        f = await asyncio.to_thread(open, dest, "wb")
+        try:
+            while chunk := await upload.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > self.job_quota_bytes:
+                    WORKSPACE_QUOTA_EXCEEDED.inc()
+                    raise QuotaExceeded(
+                        f"Arquivo maior que a cota de {self.job_quota_bytes // MB} MB"
+                    )
+                await asyncio.to_thread(write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        return written, digest.hexdigest()
+
+    # --- Coleta de órfãos ---
+
+    def _orphan_reason(self, job_dir: Path, now: float) -> str | None:
+        if job_dir.name in self._active:
+            return None
+        try:
+            host, pid = (job_dir / ".owner").read_text(encoding="utf-8").split()
+            pid = int(pid)
+        except (OSError, ValueError):
+            host, pid = None, None
+        if host == _HOST and pid != os.getpid():
+            if _pid_alive(pid):
+                # Job de outro worker vivo nesta máquina: pode estar convertendo há horas
+                return None
+            return "dead_owner"
+        # Só dono desconhecido, de outra máquina ou nós mesmos (job vazado): regra de idade
+        try:
+            age = now - job_dir.stat().st_mtime
+        except OSError:
+            return None
+        if age > ORPHAN_AGE:
+            return "expired"
+        return None
+
+    def sweep(self) -> int:
+        """Remove diretórios de jobs órfãos. Retorna quantos foram apagados."""
+        now = time.time()
+        removed = 0
+        for root in self.roots():
+            for job_dir in root.iterdir():
+                if not job_dir.is_dir():
+                    continue
+                reason = self._orphan_reason(job_dir, now)
+                if reason:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    WORKSPACE_SWEPT.inc(reason=reason)
+                    removed += 1
+        return removed
+
+    def sweep_legacy(self, temp_dir: Path) -> None:
+        """Remove sobras do layout antigo (`<job>_input.*`, `dl_<job>/`) mais velhas que ORPHAN_AGE."""
+        now = time.time()
+        for entry in Path(temp_dir).iterdir():
+            if not (entry.name.startswith("dl_") or "_input." in entry.name or "_output." in entry.name):
+                continue
+            try:
+                if now - entry.stat().st_mtime <= ORPHAN_AGE:
+                    continue
+            except OSError:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                entry.unlink(missing_ok=True)
+            WORKSPACE_SWEPT.inc(reason="legacy")
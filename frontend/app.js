@@ -100,6 +100,11 @@ const EXT_ICONS = {
   m3u: '🎶', m3u8: '🎶', har: '🌐',
 };
 
+// Uploads acima deste tamanho usam o protocolo retomável em blocos (/api/uploads)
+const CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024;
+const UPLOAD_PARALLEL = 4;
+const UPLOAD_RETRIES = 5;
+
 // State
 let selectedFile = null;
 let formatsData = null;
@@ -411,14 +416,22 @@ btnConvert.addEventListener('click', async () => {
   btnSpinner.classList.remove('hidden');
 
   try {
-    const formData = new FormData();
-    formData.append('file', selectedFile);
-    formData.append('target_format', targetFormat);
-
-    const resp = await fetch(`${API_BASE}/api/convert`, {
-      method: 'POST',
-      body: formData,
-    });
+    let resp;
+    if (selectedFile.size >= CHUNKED_UPLOAD_THRESHOLD) {
+      resp = await convertChunked(selectedFile, targetFormat, (done, total) => {
+        const pct = Math.floor((done / total) * 100);
+        btnText.textContent = pct < 100 ? `Enviando ${pct}%...` : 'Convertendo...';
+      });
+    } else {
+      const formData = new FormData();
+      formData.append('file', selectedFile);
+      formData.append('target_format', targetFormat);
+
+      resp = await fetch(`${API_BASE}/api/convert`, {
+        method: 'POST',
+        body: formData,
+      });
+    }
 
     if (!resp.ok) {
       let detail = `Erro ${resp.status}`;
@@ -452,6 +465,101 @@ btnConvert.addEventListener('click', async () => {
   }
 });
 
+// --- Upload em blocos (retomável) ---
+
+async function convertChunked(file, targetFormat, onProgress) {
+  const session = await openUploadSession(file);
+  const uploadId = session.upload_id;
+  const total = file.size;
+
+  // Só os intervalos que ainda faltam (retomada após queda de rede ou recarga da página)
+  const chunks = [];
+  for (const [start, end] of session.missing) {
+    for (let off = start; off < end; off += session.chunk_size) {
+      chunks.push([off, Math.min(off + session.chunk_size, end)]);
+    }
+  }
+  let done = total - chunks.reduce((acc, [s, e]) => acc + (e - s), 0);
+  onProgress(done, total);
+
+  const worker = async () => {
+    while (chunks.length) {
+      const [start, end] = chunks.shift();
+      await putChunk(uploadId, file.slice(start, end), start);
+      done += end - start;
+      onProgress(done, total);
+    }
+  };
+  await Promise.all(Array.from({ length: UPLOAD_PARALLEL }, worker));
+
+  const formData = new FormData();
+  formData.append('target_format', targetFormat);
+  const resp = await fetch(`${API_BASE}/api/uploads/${uploadId}/finalize`, {
+    method: 'POST',
+    body: formData,
+  });
+  if (resp.ok) localStorage.removeItem(uploadKey(file));
+  return resp;
+}
+
+function uploadKey(file) {
+  return `convertudo-upload:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function openUploadSession(file) {
+  const saved = localStorage.getItem(uploadKey(file));
+  if (saved) {
+    const resp = await fetch(`${API_BASE}/api/uploads/${saved}`);
+    if (resp.ok) return resp.json();
+    localStorage.removeItem(uploadKey(file));
+  }
+
+  const formData = new FormData();
+  formData.append('filename', file.name);
+  formData.append('size', file.size);
+  const resp = await fetch(`${API_BASE}/api/uploads`, { method: 'POST', body: formData });
+  if (!resp.ok) {
+    let detail = `Erro ${resp.status}`;
+    try { const err = await resp.json(); detail = err.detail || detail; } catch {}
+    throw new Error(detail);
+  }
+  const session = await resp.json();
+  localStorage.setItem(uploadKey(file), session.upload_id);
+  return { ...session, missing: [[0, file.size]] };
+}
+
+async function putChunk(uploadId, blob, offset) {
+  const body = await blob.arrayBuffer();
+  const headers = {};
+  // crypto.subtle só existe em contexto seguro (https ou localhost)
+  if (window.crypto && crypto.subtle) {
+    const digest = await crypto.subtle.digest('SHA-256', body);
+    headers['X-Chunk-Sha256'] = Array.from(new Uint8Array(digest))
+      .map(b => b.toString(16).padStart(2, '0')).join('');
+  }
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const resp = await fetch(`${API_BASE}/api/uploads/${uploadId}?offset=${offset}`, {
+        method: 'PUT',
+        headers,
+        body,
+      });
+      if (resp.ok) return;
+      // Erros do cliente (exceto checksum) não melhoram com nova tentativa
+      if (resp.status < 500 && resp.status !== 422 && resp.status !== 429) {
+        let detail = `Erro ${resp.status}`;
+        try { const err = await resp.json(); detail = err.detail || detail; } catch {}
+        throw Object.assign(new Error(detail), { fatal: true });
+      }
+    } catch (err) {
+      if (err.fatal) throw err;
+    }
+    if (attempt >= UPLOAD_RETRIES) throw new Error('Falha ao enviar o arquivo, tente novamente');
+    await new Promise(r => setTimeout(r, Math.min(30000, 500 * 2 ** attempt)));
+  }
+}
+
 // --- Reset ---
 
 btnReset.addEventListener('click', () => {